@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Task handler modules are declared here and imported on first use
+        from core.task_registry import TaskRegistry
+        TaskRegistry.autodiscover()
@@ -0,0 +1,86 @@
+# core/batch_flusher.py
+import atexit
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class BatchFlusher(ABC):
+    """
+    Aggregates updates in memory and writes them in one batch every `interval` seconds
+    from a background thread, and once more on shutdown.
+
+    Subclasses collect updates into `self._pending` under `self._lock` and implement `_write`.
+
+    Nothing is written until start() is called, which only the long-running commands do. Other
+    processes (and tests) flush explicitly, so no thread writes behind their back or at exit.
+    """
+    # Flushers writing elsewhere (e.g. the span exporter) leave the thread's connection alone
+    uses_database = True
+
+    def __init__(self, interval: float, name: str):
+        self.interval = interval
+        self.name = name
+        self._lock = threading.Lock()
+        self._pending = self._empty()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @abstractmethod
+    def _empty(self) -> Any:
+        """Return an empty pending batch."""
+
+    @abstractmethod
+    def _write(self, pending: Any) -> None:
+        """Write a pending batch to the database."""
+
+    @abstractmethod
+    def _merge(self, pending: Any) -> None:
+        """Merge a batch that failed to write back into `self._pending` (called with the lock held)."""
+
+    def start(self) -> None:
+        """Start the background flush thread, if it is not running yet, and flush at exit."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("%s: flush failed, retrying next interval: %s", self.name, e)
+            finally:
+                if self.uses_database:
+                    # The flush thread keeps no connection open between intervals
+                    connection.close()
+
+    def flush(self) -> None:
+        """Write everything collected so far."""
+        with self._lock:
+            pending, self._pending = self._pending, self._empty()
+        if not pending:
+            return
+        try:
+            self._write(pending)
+        except Exception:
+            with self._lock:
+                self._merge(pending)
+            raise
+
+    def stop(self) -> None:
+        """Stop the background thread and flush what is left (graceful shutdown)."""
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval)
+        self.flush()
@@ -0,0 +1,169 @@
+# core/context_binder.py
+import re
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Roots of the runtime data a workflow is executed against
+DATA_ROOTS = ("order", "customer", "shop")
+DEFAULT_ROOT = "order"
+
+_NUMERIC = re.compile(r"^-?\d+(\.\d+)?$")
+
+
+def _as_decimal(value: Any) -> Optional[Decimal]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    if isinstance(value, str) and _NUMERIC.match(value):
+        return Decimal(value)
+    return None
+
+
+def coerce_operands(actual: Any, expected: Any) -> Tuple[Any, Any]:
+    """
+    Type both sides of a condition. When the condition compares against a number, a numeric value
+    (Shopify sends money as strings, "49.95") and the number compare as Decimal, so 49.95 from
+    JSON equals "49.95". Anything else, e.g. a zip code compared to a string, is left as is.
+    """
+    number = _as_decimal(expected) if not isinstance(expected, str) else None
+    if number is not None:
+        actual_number = _as_decimal(actual)
+        if actual_number is not None:
+            return actual_number, number
+    return actual, expected
+
+
+def normalize_path(path: str) -> str:
+    """
+    Root a field path in the runtime data, e.g. "current_total_price" -> "order.current_total_price".
+    """
+    if path.split(".", 1)[0] in DATA_ROOTS:
+        return path
+    return f"{DEFAULT_ROOT}.{path}"
+
+
+def _split(path: str) -> Tuple[str, ...]:
+    return tuple(path.split("."))
+
+
+def _step(data: Any, key: str) -> Any:
+    if isinstance(data, dict):
+        return data.get(key)
+    # Digit segments index lists, in a dict "0" stays a key
+    if isinstance(data, list) and key.lstrip("-").isdigit() and -len(data) <= int(key) < len(data):
+        return data[int(key)]
+    return None
+
+
+@lru_cache(maxsize=1024)
+def compile_path(path: str) -> Callable[[Any], Any]:
+    """
+    Compile a dotted path (e.g. "order.line_items.0.price") into an extractor function.
+    Missing keys resolve to None.
+    """
+    keys = _split(path)
+
+    def extract(data: Any) -> Any:
+        for key in keys:
+            data = _step(data, key)
+            if data is None:
+                return None
+        return data
+
+    return extract
+
+
+def _compile_node(node: Dict[Any, Any]) -> Callable[[Any, Dict[str, Any]], None]:
+    fields = node.get(None, ())
+    children = [(key, _compile_node(child)) for key, child in node.items() if key is not None]
+
+    def extract(data: Any, context: Dict[str, Any]) -> None:
+        for field in fields:
+            context[field] = data
+        for key, child in children:
+            value = _step(data, key)
+            if value is not None:
+                child(value, context)
+
+    return extract
+
+
+class ContextBinder:
+    """
+    Binds condition fields to values of the runtime data.
+
+    All paths are merged into one key trie when the binder is built, so binding walks the payload
+    once and every shared prefix (e.g. "order") is only looked up once.
+    """
+
+    def __init__(self, bindings: Dict[str, str]):
+        self.bindings = dict(bindings)
+        trie: Dict[Any, Any] = {}
+        for field, path in self.bindings.items():
+            node = trie
+            for key in _split(normalize_path(path)):
+                node = node.setdefault(key, {})
+            node[None] = node.get(None, ()) + (field,)
+        self._extract = _compile_node(trie)
+
+    def bind(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Extract every bound field from the runtime data.
+
+        Returns:
+            Dict of field -> value, fields missing from the data are left out
+        """
+        context: Dict[str, Any] = {}
+        self._extract(data, context)
+        return context
+
+
+@lru_cache(maxsize=1024)
+def _get_binder(bindings: Tuple[Tuple[str, str], ...]) -> ContextBinder:
+    return ContextBinder(dict(bindings))
+
+
+def get_binder(bindings: Dict[str, str]) -> ContextBinder:
+    """
+    Get the compiled binder for a set of bindings. Binders are shared between workflows.
+    """
+    return _get_binder(tuple(sorted(bindings.items())))
+
+
+def condition_bindings(properties: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Collect the field -> path bindings of a condition task.
+
+    A condition can name its path explicitly ("path"), the task can map fields in "bindings",
+    otherwise the field name itself is used as the path.
+    """
+    explicit = properties.get("bindings", {})
+    bindings = {}
+    for condition in properties.get("conditions", []):
+        field = condition.get("field")
+        if field is not None:
+            bindings[field] = condition.get("path") or explicit.get(field) or field
+    return bindings
+
+
+class RuntimeData:
+    """
+    The data a workflow runs against ({"order": ..., "customer": ..., "shop": ...}).
+
+    Bound contexts are memoized per binder, so workflows sharing bindings bind an order only once.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self._bound: Dict[ContextBinder, Dict[str, Any]] = {}
+
+    def bind(self, binder: ContextBinder) -> Dict[str, Any]:
+        context = self._bound.get(binder)
+        if context is None:
+            context = self._bound[binder] = binder.bind(self.data)
+        return context
+
+    def resolve(self, path: str) -> Any:
+        return compile_path(normalize_path(path))(self.data)
@@ -0,0 +1,25 @@
+# core/db.py
+from contextlib import contextmanager
+
+from django.db import close_old_connections, connection
+
+
+@contextmanager
+def db_connection():
+    """
+    Scope the calling thread's database connection to a unit of work, the way Django does for a
+    request: unusable or expired connections are dropped before, and released after.
+
+    With the connection pool enabled, releasing hands the connection back to the pool. Inside a
+    transaction the caller owns the connection and nothing is done.
+
+    Usable as a decorator: @db_connection()
+    """
+    managed = not connection.in_atomic_block
+    if managed:
+        close_old_connections()
+    try:
+        yield
+    finally:
+        if managed:
+            close_old_connections()
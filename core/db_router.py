@@ -0,0 +1,85 @@
+# core/db_router.py
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from hephestos.settings import REPLICA_PIN_SECONDS
+
+REPLICA = "replica"
+
+_use_replica: ContextVar[bool] = ContextVar("use_replica", default=False)
+# Set whenever the current thread or task writes, reads stay on the primary until then
+_pinned_until: ContextVar[float] = ContextVar("pinned_until", default=0.0)
+
+
+def replica_configured() -> bool:
+    return REPLICA in settings.DATABASES
+
+
+def pin_to_primary(key: str, seconds: float = REPLICA_PIN_SECONDS) -> None:
+    """
+    Keep reads scoped to `key` (e.g. a shop domain) on the primary for `seconds`, so data that
+    was just ingested is visible before the replica catches up.
+
+    The pin is stored in core_replica_pin, so it holds in every process: an order ingested by the
+    subscriber is visible to the web workers serving the listing. Nothing is stored without a replica.
+    """
+    if not replica_configured():
+        return
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO core_replica_pin AS p (key, pinned_until) "
+            "VALUES (%(key)s, now() + make_interval(secs => %(seconds)s)) "
+            "ON CONFLICT (key) DO UPDATE SET pinned_until = GREATEST(p.pinned_until, EXCLUDED.pinned_until)",
+            {"key": key, "seconds": seconds},
+        )
+
+
+def is_pinned(key: Optional[str]) -> bool:
+    if key is None or not replica_configured():
+        return False
+    # Always asked of the primary, the replica may not have the pin yet
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM core_replica_pin WHERE key = %s AND pinned_until > now()", [key])
+        return cursor.fetchone() is not None
+
+
+@contextmanager
+def read_replica(key: Optional[str] = None):
+    """
+    Send the reads made inside the block to the replica, unless `key` was written recently.
+    Used by read-only paths (listings, analytics) so they never load the primary.
+    """
+    token = _use_replica.set(not is_pinned(key))
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes and ordinary reads go to "default". Reads inside read_replica() go to the "replica"
+    alias when one is configured, except right after the same thread or task wrote.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured() and time.monotonic() >= _pinned_until.get():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        _pinned_until.set(time.monotonic() + REPLICA_PIN_SECONDS)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicated from the primary, never migrated directly
+        return False if db == REPLICA else None
@@ -0,0 +1,120 @@
+# core/executor_pool.py
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db import close_old_connections
+
+
+class BoundedExecutor:
+    """
+    Shared thread pool with a global cap on in-flight calls and a per-key cap (e.g. per shop),
+    so a single key can never occupy every worker.
+
+    Slots are acquired by the submitting thread before a call is queued, which pushes back on
+    callers instead of letting the pool queue grow without bound.
+    """
+
+    def __init__(self, max_workers: int, max_per_key: int, thread_name_prefix: str = "executor"):
+        self.max_workers = max_workers
+        self.max_per_key = max_per_key
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._per_key: Dict[str, int] = {}
+
+    def _acquire(self, key: str, timeout: Optional[float]) -> bool:
+        with self._condition:
+            acquired = self._condition.wait_for(
+                lambda: self._in_flight < self.max_workers and self._per_key.get(key, 0) < self.max_per_key,
+                timeout=timeout,
+            )
+            if acquired:
+                self._in_flight += 1
+                self._per_key[key] = self._per_key.get(key, 0) + 1
+            return acquired
+
+    def _release(self, key: str) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            remaining = self._per_key[key] - 1
+            if remaining:
+                self._per_key[key] = remaining
+            else:
+                del self._per_key[key]
+            self._condition.notify_all()
+
+    def _run(self, key: str, fn: Callable[[], Any]) -> Any:
+        try:
+            return fn()
+        finally:
+            close_old_connections()
+            self._release(key)
+
+    @property
+    def idle_slots(self) -> int:
+        """Calls that can be submitted right now without waiting for a slot, ignoring per-key caps."""
+        with self._condition:
+            return self.max_workers - self._in_flight
+
+    def in_flight(self, key: str) -> int:
+        """Calls of `key` queued or running."""
+        with self._condition:
+            return self._per_key.get(key, 0)
+
+    def submit(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Optional[Future]:
+        """
+        Queue a call under the caps of `key`, waiting up to `timeout` seconds for a slot.
+
+        Returns:
+            The future of the call, or None if no slot freed up in time
+        """
+        if not self._acquire(key, timeout):
+            return None
+        # Run in a copy of the caller's context so context variables (e.g. correlation ids) carry over
+        context = contextvars.copy_context()
+        return self._pool.submit(context.run, self._run, key, fn)
+
+    def run_all(self, key: str, calls: List[Callable[[], Any]], timeout: Optional[float] = None,
+                wait_for_slots: bool = True) -> List[Dict[str, Any]]:
+        """
+        Run calls concurrently under the caps of `key` and wait for them until the deadline.
+
+        A failing call does not affect the others. Calls still running at the deadline keep their slot
+        until they finish, but are reported as timed out.
+
+        Args:
+            key: Concurrency key the calls are accounted to, e.g. the shop domain
+            calls: Zero-argument callables
+            timeout: Seconds until the deadline, None waits for every call
+            wait_for_slots: Off to not run, and report as {"status": "no_slot"}, the calls that
+                find no free slot, instead of waiting for one
+
+        Returns:
+            One result dict per call, in the same order as the calls
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        futures = []
+        for fn in calls:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            futures.append(self.submit(key, fn, remaining if wait_for_slots else 0))
+
+        pending = [future for future in futures if future is not None]
+        wait(pending, timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+
+        results = []
+        for future in futures:
+            if future is None and not wait_for_slots:
+                results.append({"status": "no_slot"})
+            elif future is None or not future.done():
+                results.append({"status": "timeout", "error": "Deadline exceeded"})
+            elif future.exception() is not None:
+                results.append({"status": "failed", "error": str(future.exception())})
+            else:
+                results.append({"status": "completed", "result": future.result()})
+        return results
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
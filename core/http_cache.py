@@ -0,0 +1,248 @@
+# core/http_cache.py
+import atexit
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional
+
+from .http_client import HttpClient, HttpResponse
+
+CACHEABLE_METHODS = ("GET", "HEAD")
+# Always part of the key, so responses are never shared between credentials
+DEFAULT_VARY_HEADERS = ("authorization", "x-shopify-access-token", "accept")
+
+
+@dataclass
+class CacheEntry:
+    response: HttpResponse
+    stored_at: float
+    max_age: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def is_fresh(self, now: float) -> bool:
+        return now - self.stored_at < self.max_age
+
+    @property
+    def size(self) -> int:
+        return len(self.response.body)
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def freshness_lifetime(headers: Dict[str, str]) -> Optional[float]:
+    """
+    Seconds a response may be served without revalidation, 0 if it must always be revalidated,
+    or None if it must not be stored at all.
+    """
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    age = float(headers.get("age", 0) or 0)
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name) is not None:
+            try:
+                return max(float(directives[name]) - age, 0)
+            except ValueError:
+                return 0
+    if headers.get("expires"):
+        try:
+            expires = parsedate_to_datetime(headers["expires"]).timestamp()
+        except (TypeError, ValueError):
+            return 0
+        return max(expires - time.time(), 0)
+    return 0
+
+
+class ResponseCache:
+    """
+    Opt-in cache for idempotent HTTP calls.
+
+    Responses are kept in a memory LRU bounded by entry count and body bytes. Entries evicted from
+    memory spill over to disk when a directory is configured. Freshness follows Cache-Control
+    (max-age, no-cache, no-store) and Expires, stale entries are revalidated with ETag/Last-Modified.
+    Concurrent identical requests are coalesced into a single in-flight call.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 disk_dir: Optional[str] = None, max_disk_entries: int = 10000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, None]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self.disk_dir = None
+        if disk_dir:
+            # Spilled entries are private to this process and removed on exit
+            self.disk_dir = os.path.join(disk_dir, str(os.getpid()))
+            os.makedirs(self.disk_dir, exist_ok=True)
+            atexit.register(shutil.rmtree, self.disk_dir, True)
+
+    @staticmethod
+    def key(method: str, url: str, headers: Optional[Dict[str, str]] = None,
+            vary_headers: Iterable[str] = ()) -> str:
+        """Cache key of a request: method, URL and the selected request headers."""
+        lowered = {name.lower(): value for name, value in (headers or {}).items()}
+        names = sorted(set(DEFAULT_VARY_HEADERS) | {name.lower() for name in vary_headers})
+        parts = [method.upper(), url] + [f"{name}:{lowered.get(name, '')}" for name in names]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def fetch(self, client: HttpClient, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+              vary_headers: Iterable[str] = (), **kwargs: Any) -> HttpResponse:
+        """
+        Send a request through the cache.
+
+        Args:
+            client: HttpClient used on a miss or for revalidation
+            method: HTTP method, only GET and HEAD are cached
+            url: Absolute URL
+            headers: Optional request headers
+            vary_headers: Extra request headers that are part of the cache key
+            **kwargs: Passed on to HttpClient.request
+
+        Returns:
+            The cached or fresh HttpResponse
+        """
+        if method.upper() not in CACHEABLE_METHODS:
+            return client.request(method, url, headers=headers, **kwargs)
+
+        key = self.key(method, url, headers, vary_headers)
+        entry = self._get(key)
+        if entry is not None and entry.is_fresh(time.monotonic()):
+            return entry.response
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            response = self._refresh(client, key, entry, method, url, headers, **kwargs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def _refresh(self, client: HttpClient, key: str, entry: Optional[CacheEntry], method: str, url: str,
+                 headers: Optional[Dict[str, str]], **kwargs: Any) -> HttpResponse:
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                request_headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                request_headers["If-Modified-Since"] = entry.last_modified
+
+        response = client.request(method, url, headers=request_headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            headers_now = {**entry.response.headers, **response.headers}
+            lifetime = freshness_lifetime(headers_now)
+            entry = replace(entry, stored_at=time.monotonic(), max_age=lifetime or 0)
+            self._put(key, entry)
+            return entry.response
+
+        lifetime = freshness_lifetime(response.headers)
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if response.status_code == 200 and lifetime is not None and (lifetime > 0 or etag or last_modified):
+            self._put(key, CacheEntry(response=response, stored_at=time.monotonic(), max_age=lifetime,
+                                      etag=etag, last_modified=last_modified))
+        else:
+            self._discard(key)
+        return response
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            on_disk = key in self._disk
+        if not on_disk:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as file:
+                entry = pickle.load(file)
+        except (OSError, pickle.PickleError, EOFError):
+            entry = None
+        # Promote back to memory, the file is no longer needed
+        self._discard(key)
+        if entry is not None:
+            self._put(key, entry)
+        return entry
+
+    def _put(self, key: str, entry: CacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        spilled = []
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous.size
+            self._memory[key] = entry
+            self._memory_bytes += entry.size
+            while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+                evicted_key, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted.size
+                if self.disk_dir:
+                    spilled.append((evicted_key, evicted))
+        for evicted_key, evicted in spilled:
+            self._spill(evicted_key, evicted)
+
+    def _spill(self, key: str, entry: CacheEntry) -> None:
+        try:
+            with open(self._disk_path(key), "wb") as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            return
+        with self._lock:
+            self._disk[key] = None
+            while len(self._disk) > self.max_disk_entries:
+                oldest, _ = self._disk.popitem(last=False)
+                self._remove_file(oldest)
+
+    def _discard(self, key: str) -> None:
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            if entry is not None:
+                self._memory_bytes -= entry.size
+            on_disk = key in self._disk
+            self._disk.pop(key, None)
+        if on_disk:
+            self._remove_file(key)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.cache")
+
+    def _remove_file(self, key: str) -> None:
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
@@ -0,0 +1,123 @@
+# core/http_client.py
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import urllib3
+
+
+class ResponseTooLarge(ValueError):
+    """Raised when a response body exceeds the configured size cap."""
+
+
+@dataclass
+class HttpResponse:
+    status_code: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    def data(self) -> Any:
+        """Decode the body as JSON when the response says it is JSON, as text otherwise."""
+        if "json" in self.headers.get("content-type", ""):
+            return json.loads(self.body) if self.body else None
+        return self.body.decode("utf-8", errors="replace")
+
+
+class HttpClient:
+    """
+    HTTP client on a shared pool of keep-alive connections.
+
+    Each host gets at most `max_connections_per_host` connections. They double as the per-host
+    concurrency limit: requests beyond it wait up to `pool_timeout` seconds for a free connection.
+    """
+
+    def __init__(self, max_connections_per_host: int = 10, max_hosts: int = 100,
+                 connect_timeout: float = 3.0, read_timeout: float = 10.0,
+                 pool_timeout: float = 5.0, max_response_bytes: int = 1024 * 1024):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_timeout = pool_timeout
+        self.max_response_bytes = max_response_bytes
+        self._pool = urllib3.PoolManager(
+            num_pools=max_hosts,
+            maxsize=max_connections_per_host,
+            block=True,
+            retries=False,
+            timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+        )
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                json_body: Any = None, connect_timeout: Optional[float] = None,
+                read_timeout: Optional[float] = None,
+                max_response_bytes: Optional[int] = None) -> HttpResponse:
+        """
+        Send a request, streaming the response body up to the size cap.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            headers: Optional request headers
+            json_body: Optional body, sent as JSON
+            connect_timeout: Override of the client's connect timeout
+            read_timeout: Override of the client's read timeout
+            max_response_bytes: Override of the client's response size cap
+
+        Returns:
+            The HttpResponse
+
+        Raises:
+            ResponseTooLarge: If the body exceeds the size cap
+            urllib3.exceptions.HTTPError: On connection errors and timeouts
+        """
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+
+        kwargs = {}
+        if connect_timeout is not None or read_timeout is not None:
+            # urllib3 takes a missing value as no timeout at all, keep the client's default instead
+            kwargs["timeout"] = urllib3.Timeout(
+                connect=self.connect_timeout if connect_timeout is None else connect_timeout,
+                read=self.read_timeout if read_timeout is None else read_timeout)
+        limit = max_response_bytes or self.max_response_bytes
+
+        response = self._pool.urlopen(method, url, body=body, headers=headers,
+                                      preload_content=False, pool_timeout=self.pool_timeout, **kwargs)
+        try:
+            length = response.headers.get("content-length")
+            if length is not None and int(length) > limit:
+                raise ResponseTooLarge(f"Response of {length} bytes exceeds the {limit} bytes cap")
+
+            chunks = []
+            size = 0
+            for chunk in response.stream(64 * 1024):
+                size += len(chunk)
+                if size > limit:
+                    raise ResponseTooLarge(f"Response exceeds the {limit} bytes cap")
+                chunks.append(chunk)
+        except BaseException:
+            # Do not hand a half-read connection back to the pool
+            response.close()
+            response.release_conn()
+            raise
+
+        response.release_conn()
+        return HttpResponse(
+            status_code=response.status,
+            headers={key.lower(): value for key, value in response.headers.items()},
+            body=b"".join(chunks),
+        )
+
+    async def arequest(self, method: str, url: str, **kwargs: Any) -> HttpResponse:
+        """
+        Async variant of `request`. Runs on a worker thread and shares the same connection pool
+        and per-host limits as the sync variant.
+        """
+        return await asyncio.to_thread(self.request, method, url, **kwargs)
+
+    def clear(self) -> None:
+        """Close every pooled connection."""
+        self._pool.clear()
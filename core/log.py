@@ -0,0 +1,173 @@
+# core/log.py
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable
+
+# Correlation ids of the work the current thread or task is doing, e.g. order_id and shop.
+# BoundedExecutor copies context into its workers, so workflow threads keep the ids.
+_log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+# Attributes every LogRecord has, anything else on a record was passed through `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+@contextmanager
+def log_context(**fields: Any):
+    """Add correlation ids to every record logged inside the block."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def bind_log_context(**fields: Any) -> None:
+    """Add correlation ids for the rest of the enclosing log_context block, e.g. once they are parsed."""
+    _log_context.set({**_log_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    """Copy the current correlation ids onto the record. Runs in the logging thread, before queueing."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep `rate` of the records below WARNING. Warnings and errors are always kept."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message, correlation ids and other `extra` fields.
+    Fields holding full payloads are left out unless `include_payloads` is set.
+    """
+
+    def __init__(self, include_payloads: bool = False, payload_fields: Iterable[str] = ("payload", "webhook_data")):
+        super().__init__()
+        self.include_payloads = include_payloads
+        self.payload_fields = frozenset(payload_fields)
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key in _RECORD_ATTRIBUTES:
+                continue
+            if key in self.payload_fields and not self.include_payloads:
+                value = "<omitted>"
+            entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    """
+    Formats and writes records on a background thread (a QueueListener), so logging never blocks
+    the caller on the stream.
+
+    The queue is bounded. When the stream cannot keep up, records are dropped instead of
+    stalling callers, and the number dropped is reported once the writer catches up. Errors
+    while queueing a record, e.g. a message that does not match its arguments, go to
+    handleError like with any stdlib handler instead of raising in the caller.
+    """
+
+    def __init__(self, stream=None, max_queue: int = 10000):
+        super().__init__(queue.Queue(max_queue))
+        self.stream = stream or sys.stdout
+        self.dropped = 0
+        self._listener = _Listener(self.queue, _StreamWriter(self))
+        self._listener.start()
+        self._closed = False
+        atexit.register(self.close)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve what may change or keep frames alive once the caller moves on. Unlike
+        # QueueHandler.prepare this does not format, the writer thread does.
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Wait until every queued record was written."""
+        if not self._closed:
+            self.queue.join()
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._listener.stop()
+        super().close()
+
+
+class _Listener(logging.handlers.QueueListener):
+    """QueueListener whose shutdown waits a bounded time for room in a full queue and for the writer."""
+
+    def enqueue_sentinel(self) -> None:
+        try:
+            self.queue.put(self._sentinel, timeout=5)
+        except queue.Full:
+            pass
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self.enqueue_sentinel()
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class _StreamWriter(logging.Handler):
+    """Writes the records of a BackgroundHandler to its stream, with its formatter. Runs in the listener thread."""
+
+    def __init__(self, owner: BackgroundHandler):
+        super().__init__()
+        self.owner = owner
+
+    def emit(self, record: logging.LogRecord) -> None:
+        owner = self.owner
+        try:
+            self._write(owner.format(record))
+            if owner.dropped:
+                dropped, owner.dropped = owner.dropped, 0
+                self._write(json.dumps({"level": "WARNING", "logger": __name__,
+                                        "message": f"Dropped {dropped} log records, the log queue was full"}))
+            if owner.queue.empty():
+                owner.stream.flush()
+        except Exception:
+            owner.handleError(record)
+
+    def _write(self, line: str) -> None:
+        self.owner.stream.write(line + "\n")
@@ -0,0 +1,78 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules a process imports before it can start working
+ENTRY_POINTS = {
+    'subscriber': 'cross_sell.management.commands.subscriber',
+    'workflow_worker': 'cross_sell.management.commands.workflow_worker',
+    'webhook_outbox': 'cross_sell.management.commands.webhook_outbox',
+    'web': 'hephestos.urls',
+}
+
+# Runs in a fresh interpreter, so nothing is imported yet
+_MEASURE = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+__import__(sys.argv[1])
+print(json.dumps({"setup": setup_done - started, "import": time.perf_counter() - setup_done}))
+'''
+
+
+def measure(module: str) -> dict:
+    """
+    Import `module` after django.setup() in a new interpreter.
+
+    Returns:
+        {"setup": seconds, "import": seconds, "modules": {name: self seconds}} from python -X importtime
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _MEASURE, module],
+                            capture_output=True, text=True, env=os.environ.copy())
+    if result.returncode:
+        raise CommandError(f'Importing {module} failed:\n{result.stderr[-2000:]}')
+    modules = {}
+    for line in result.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        if own.strip().isdigit():
+            modules[name.strip()] = int(own) / 1e6
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {**timings, 'modules': modules}
+
+
+class Command(BaseCommand):
+    help = 'Measure how long the entry points take to import, each in a fresh interpreter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('entry_points', nargs='*', metavar='ENTRY_POINT',
+                            help=f'Entry point names ({", ".join(ENTRY_POINTS)}) or module paths, default all')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per entry point, the median is reported')
+        parser.add_argument('--top', type=int, default=10, help='Slowest modules to list')
+        parser.add_argument('--budget-ms', type=float, help='Fail if an entry point takes longer than this')
+
+    def handle(self, *args, **options):
+        over_budget = []
+        for name in options['entry_points'] or list(ENTRY_POINTS):
+            module = ENTRY_POINTS.get(name, name)
+            runs = [measure(module) for _ in range(max(options['repeat'], 1))]
+            setup = statistics.median(run['setup'] for run in runs) * 1000
+            imported = statistics.median(run['import'] for run in runs) * 1000
+            total = setup + imported
+            self.stdout.write(f'{name}: {total:.1f}ms (django.setup {setup:.1f}ms, {module} {imported:.1f}ms)')
+            slowest = sorted(runs[-1]['modules'].items(), key=lambda item: item[1], reverse=True)
+            for module_name, seconds in slowest[:options['top']]:
+                self.stdout.write(f'  {seconds * 1000:8.1f}ms  {module_name}')
+            if options['budget_ms'] is not None and total > options['budget_ms']:
+                over_budget.append(f'{name} ({total:.1f}ms)')
+
+        if over_budget:
+            raise CommandError(f'Over the {options["budget_ms"]}ms budget: {", ".join(over_budget)}')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.partitioning import PARTITIONED_TABLES, ensure_partitions, archive_partitions
+from hephestos.settings import PARTITION_MONTHS_AHEAD, PARTITION_ARCHIVE_DIR
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions of the history tables, and optionally archive expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=PARTITION_MONTHS_AHEAD,
+                            help='Months to create partitions for after the current one')
+        parser.add_argument('--archive', action='store_true',
+                            help='Detach partitions past their retention and archive them as gzipped JSONL')
+        parser.add_argument('--archive-dir', default=PARTITION_ARCHIVE_DIR)
+
+    def handle(self, *args, **options):
+        for partitioned in PARTITIONED_TABLES:
+            for name in ensure_partitions(partitioned.table, partitioned.column, options['ahead']):
+                self.stdout.write(f'Created partition {name}')
+            if options['archive']:
+                for path, rows in archive_partitions(partitioned.table, partitioned.retention_months,
+                                                     options['archive_dir']):
+                    self.stdout.write(f'Archived {rows} rows to {path}')
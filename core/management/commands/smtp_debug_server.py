@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.smtp_debug import DebugSMTPServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local SMTP server that prints received messages instead of delivering them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+
+    def handle(self, *args, **options):
+        def on_message(message):
+            self.stdout.write(f'---------- connection {message.connection_id}: '
+                              f'{message.sender} -> {", ".join(message.recipients)}')
+            self.stdout.write(message.data.decode('utf-8', errors='replace'))
+
+        server = DebugSMTPServer(options['host'], options['port'], on_message=on_message)
+        self.stdout.write(f'Debug SMTP server listening on {options["host"]}:{server.port}...')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped debug SMTP server.')
+        finally:
+            server.server_close()
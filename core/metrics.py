@@ -0,0 +1,114 @@
+# core/metrics.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Bucket upper bounds in seconds: 0.1ms doubling up to ~52s, then everything above
+BUCKET_BOUNDS: List[float] = [0.0001 * 2 ** i for i in range(20)]
+
+
+def bucket_quantile(counts: List[int], q: float, largest: Optional[float] = None) -> float:
+    """
+    q-quantile of a histogram given as counts per BUCKET_BOUNDS bucket (plus the overflow bucket),
+    as the upper bound of the bucket that holds it.
+    """
+    count = sum(counts)
+    if not count:
+        return 0.0
+    rank = q * count
+    seen = 0
+    for index, bucket_count in enumerate(counts):
+        seen += bucket_count
+        if seen >= rank and bucket_count:
+            bound = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else largest or BUCKET_BOUNDS[-1]
+            return min(bound, largest) if largest is not None else bound
+    return largest or BUCKET_BOUNDS[-1]
+
+
+def bucket_index(seconds: float) -> int:
+    return bisect.bisect_left(BUCKET_BOUNDS, seconds)
+
+
+class Histogram:
+    """Fixed log-scale histogram of durations. Recording is O(log buckets) and allocation free."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        index = bucket_index(seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile, capped at the largest recorded value."""
+        with self._lock:
+            counts, largest = list(self.counts), self.max
+        return bucket_quantile(counts, q, largest)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            count, total, largest = self.count, self.total, self.max
+        return {
+            "count": count,
+            "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(self.quantile(0.5) * 1000, 3),
+            "p95_ms": round(self.quantile(0.95) * 1000, 3),
+            "p99_ms": round(self.quantile(0.99) * 1000, 3),
+            "max_ms": round(largest * 1000, 3),
+        }
+
+
+class StageTimers:
+    """
+    Durations of named pipeline stages, one histogram per stage.
+
+    Example:
+        with pipeline_timers.time("decode"):
+            payload = json.loads(data)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+
+    def histogram(self, stage: str) -> Histogram:
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram())
+        return histogram
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.histogram(stage).record(seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {stage: histogram.snapshot() for stage, histogram in sorted(histograms.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms = {}
+
+
+# Stages of the subscriber pipeline: decode, dedupe, upsert, save_event, ack, process, total
+pipeline_timers = StageTimers()
@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-19 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_workflowexecution_duration_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'core_rate_limit_bucket',
+            },
+        ),
+        migrations.AddField(
+            model_name='workflowexecution',
+            name='next_run_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,69 @@
+import re
+from datetime import date
+
+from django.db import migrations
+
+
+# Frozen copy of core.partitioning.convert_to_partitioned as it was when this migration was written,
+# so later changes to it do not change what the migration does. Partitions are only created for the
+# months already holding rows, so the result does not depend on when or with which settings it runs:
+# manage.py partitions, run after migrate by run.sh, creates the upcoming ones.
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _convert_to_partitioned(schema_editor, table, column):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    old = f"{table}_unpartitioned"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p')",
+            [old, old],
+        )
+        index_definitions = [re.sub(rf' ON (ONLY )?\S*"?{old}"? ', f' ON "{table}" ', definition)
+                             for (definition,) in cursor.fetchall()]
+        cursor.execute(f'SELECT min("{column}"), max("{column}"), max(id) FROM "{old}"')
+        first, last, last_id = cursor.fetchone()
+
+        cursor.execute(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                       f'PARTITION BY RANGE ("{column}")')
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+        if first is not None:
+            month = date(first.year, first.month, 1)
+            while month <= date(last.year, last.month, 1):
+                cursor.execute(f'CREATE TABLE "{table}_p{month:%Y_%m}" PARTITION OF "{table}" '
+                               f"FOR VALUES FROM ('{month.isoformat()} 00:00+00') "
+                               f"TO ('{_add_months(month, 1).isoformat()} 00:00+00')")
+                month = _add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+        cursor.execute(f'DROP TABLE "{old}"')
+
+        cursor.execute(f'CREATE SEQUENCE "{table}_id_seq" OWNED BY "{table}".id')
+        if last_id:
+            cursor.execute("SELECT setval(%s, %s)", [f"{table}_id_seq", last_id])
+        cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{table}_id_seq"\')')
+        cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, "{column}")')
+        for definition in index_definitions:
+            cursor.execute(definition)
+
+
+def partition_workflow_execution(apps, schema_editor):
+    _convert_to_partitioned(schema_editor, "core_workflow_execution", "start_time")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_ratelimitbucket_workflowexecution_next_run_at'),
+    ]
+
+    operations = [
+        # The table keeps its columns and indexes, so the model state does not change.
+        # Not reversible in place: a partitioned table works the same for the ORM.
+        migrations.RunPython(partition_workflow_execution, migrations.RunPython.noop),
+    ]
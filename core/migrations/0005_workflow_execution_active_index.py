@@ -0,0 +1,71 @@
+# Generated by Django 5.1 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+ACTIVE_INDEX = models.Index(condition=models.Q(('state__in', ['IN_PROGRESS', 'PAUSE'])), fields=['state', 'next_run_at'],
+                            name='workflow_execution_active_idx')
+
+
+# Frozen copy of core.partitioning.add_index_concurrently as it was when this migration was written,
+# so later changes to it do not change what the migration does
+def _add_index_concurrently(schema_editor, model, index):
+    table = model._meta.db_table
+    quote = schema_editor.quote_name
+
+    def statement(target, name, concurrently):
+        sql = index.create_sql(model, schema_editor, concurrently=concurrently)
+        sql.parts["table"] = target
+        sql.parts["name"] = quote(name)
+        return str(sql)
+
+    # On the parent only (invalid until every partition has it), then built concurrently on each
+    # partition and attached
+    schema_editor.execute(statement(f"ONLY {quote(table)}", index.name, False))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s",
+            [table],
+        )
+        partitions = [name for (name,) in cursor.fetchall()]
+    for partition in partitions:
+        child = f"{index.name}_{partition[len(table) + 1:]}"
+        schema_editor.execute(statement(quote(partition), child, True))
+        schema_editor.execute(f"ALTER INDEX {quote(index.name)} ATTACH PARTITION {quote(child)}")
+
+
+def add_active_index(apps, schema_editor):
+    _add_index_concurrently(schema_editor, apps.get_model('core', 'WorkflowExecution'), ACTIVE_INDEX)
+
+
+def remove_active_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{ACTIVE_INDEX.name}"')
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which cannot happen in a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0004_partition_workflow_execution'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='workflowexecution', index=ACTIVE_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(add_active_index, remove_active_index),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='workflowexecution',
+            name='core_workfl_status_f9b3d3_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='workflowexecution',
+            name='core_workfl_retry_c_d451a3_idx',
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1 on 2026-10-19 17:55
+
+from django.db import migrations, models
+
+SHOP_INDEX = models.Index(condition=models.Q(('state__in', ['NEW', 'RETRY', 'PAUSE', 'IN_PROGRESS'])),
+                          fields=['shop_domain', 'state', 'next_run_at'], name='workflow_execution_shop_idx')
+
+# Only unfinished executions are scheduled, finished ones keep a null shop_domain
+BACKFILL_SHOP_DOMAIN = """
+    UPDATE core_workflow_execution
+    SET shop_domain = workflow_data -> 'data' -> 'shop' ->> 'domain'
+    WHERE state IN ('NEW', 'RETRY', 'PAUSE', 'IN_PROGRESS') AND shop_domain IS NULL
+"""
+
+
+# Frozen copy of core.partitioning.add_index_concurrently as it was when this migration was written,
+# so later changes to it do not change what the migration does
+def _add_index_concurrently(schema_editor, model, index):
+    table = model._meta.db_table
+    quote = schema_editor.quote_name
+
+    def statement(target, name, concurrently):
+        sql = index.create_sql(model, schema_editor, concurrently=concurrently)
+        sql.parts["table"] = target
+        sql.parts["name"] = quote(name)
+        return str(sql)
+
+    # On the parent only (invalid until every partition has it), then built concurrently on each
+    # partition and attached
+    schema_editor.execute(statement(f"ONLY {quote(table)}", index.name, False))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s",
+            [table],
+        )
+        partitions = [name for (name,) in cursor.fetchall()]
+    for partition in partitions:
+        child = f"{index.name}_{partition[len(table) + 1:]}"
+        schema_editor.execute(statement(quote(partition), child, True))
+        schema_editor.execute(f"ALTER INDEX {quote(index.name)} ATTACH PARTITION {quote(child)}")
+
+
+def add_shop_index(apps, schema_editor):
+    _add_index_concurrently(schema_editor, apps.get_model('core', 'WorkflowExecution'), SHOP_INDEX)
+
+
+def remove_shop_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{SHOP_INDEX.name}"')
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which cannot happen in a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_workflow_execution_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workflowexecution',
+            name='shop_domain',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.RunSQL(BACKFILL_SHOP_DOMAIN, migrations.RunSQL.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='workflowexecution', index=SHOP_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(add_shop_index, remove_shop_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-19 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_workflow_execution_shop_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaPin',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('pinned_until', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'core_replica_pin',
+            },
+        ),
+    ]
@@ -62,16 +62,57 @@ class WorkflowExecution(models.Model):
     update_time = models.DateTimeField(auto_now=True)
     end_time = models.DateTimeField(blank=True, null=True)
     duration = models.DurationField(null=True)  # Calculated field
+    next_run_at = models.DateTimeField(null=True)  # When a paused execution is due to resume
+    shop_domain = models.CharField(max_length=100, null=True)  # Queue the execution is scheduled in
+    # Worker running the execution, and until when it holds it unless it renews the lease
+    leased_by = models.CharField(max_length=255, null=True)
+    lease_expires_at = models.DateTimeField(null=True)
 
     class Meta:
         db_table = 'core_workflow_execution'
         indexes = [
-            models.Index(fields=['status', 'state']),
             models.Index(fields=['start_time']),
-            models.Index(fields=['retry_count'])
+            # Running and paused executions are few, finished ones are never looked up by state
+            models.Index(fields=['state', 'next_run_at'],
+                         condition=models.Q(state__in=[ExecutionState.IN_PROGRESS, ExecutionState.PAUSE]),
+                         name='workflow_execution_active_idx'),
+            # Executions waiting for a worker (see cross_sell.worker)
+            models.Index(fields=['state', 'next_run_at'],
+                         condition=models.Q(state__in=[ExecutionState.NEW, ExecutionState.RETRY]),
+                         name='workflow_execution_pending_idx'),
+            # Per-shop queue depth and claims of the fair scheduler
+            models.Index(fields=['shop_domain', 'state', 'next_run_at'],
+                         condition=models.Q(state__in=[ExecutionState.NEW, ExecutionState.RETRY,
+                                                       ExecutionState.PAUSE, ExecutionState.IN_PROGRESS]),
+                         name='workflow_execution_shop_idx'),
         ]
 
     def save(self, *args, **kwargs):
         if self.end_time and self.start_time:
             self.duration = self.end_time - self.start_time
         super().save(*args, **kwargs)
+
+
+class RateLimitBucket(models.Model):
+    """
+    Token bucket shared by every process when RATE_LIMIT_BACKEND is "postgres".
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'core_rate_limit_bucket'
+
+
+class ReplicaPin(models.Model):
+    """
+    Keeps the replica reads of a key (a shop domain) on the primary until `pinned_until`, in every
+    process (see core.db_router.pin_to_primary). One row per key, so the table stays as small as
+    the number of shops.
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    pinned_until = models.DateTimeField()
+
+    class Meta:
+        db_table = 'core_replica_pin'
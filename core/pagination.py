@@ -0,0 +1,83 @@
+# core/pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    raw = f"{created_at.isoformat()}|{pk}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, _, pk = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").partition("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_page(queryset: QuerySet, cursor: Optional[str], time_field: str = "created_at") -> QuerySet:
+    """
+    Newest-first page of `queryset` starting after `cursor`.
+
+    Seeks on (time_field, id) instead of using OFFSET, so a deep page costs the same as the first.
+    Slice the result to the page size.
+    """
+    queryset = queryset.order_by(f"-{time_field}", "-id")
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(**{f"{time_field}__lt": created_at}) |
+                                   Q(**{time_field: created_at, "id__lt": pk}))
+    return queryset
+
+
+def _page_end(last: Optional[Dict[str, Any]], count: int, limit: int, time_field: str) -> bytes:
+    next_cursor = encode_cursor(last[time_field], last["id"]) if last is not None and count == limit else None
+    return f'], "next": {json.dumps(next_cursor)}}}'.encode("utf-8")
+
+
+def iter_json_page(rows: QuerySet, key: str, limit: int, chunk_size: int = 500,
+                   time_field: str = "created_at") -> Iterator[bytes]:
+    """
+    Synchronous stream_json_page, for responses served over WSGI.
+
+    WSGI servers consume an async iterator by buffering it whole, so the page would be read into
+    memory before the first byte is sent.
+    """
+    encoder = DjangoJSONEncoder()
+    last: Optional[Dict[str, Any]] = None
+    count = 0
+    yield f'{{"{key}": ['.encode("utf-8")
+    for row in rows[:limit].iterator(chunk_size=chunk_size):
+        yield (b"," if count else b"") + encoder.encode(row).encode("utf-8")
+        last = row
+        count += 1
+    yield _page_end(last, count, limit, time_field)
+
+
+async def stream_json_page(rows: QuerySet, key: str, limit: int, chunk_size: int = 500,
+                           time_field: str = "created_at") -> AsyncIterator[bytes]:
+    """
+    Encode a page of `.values()` rows as {key: [...], "next": cursor} one row at a time.
+
+    Rows are read through a server-side cursor in chunks of `chunk_size`, so memory use does not
+    depend on the page size. "next" is null on the last page. Serve it over ASGI, see iter_json_page.
+    """
+    encoder = DjangoJSONEncoder()
+    last: Optional[Dict[str, Any]] = None
+    count = 0
+    yield f'{{"{key}": ['.encode("utf-8")
+    async for row in rows[:limit].aiterator(chunk_size=chunk_size):
+        yield (b"," if count else b"") + encoder.encode(row).encode("utf-8")
+        last = row
+        count += 1
+    yield _page_end(last, count, limit, time_field)
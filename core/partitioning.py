@@ -0,0 +1,235 @@
+# core/partitioning.py
+import gzip
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from hephestos.settings import WEBHOOK_EVENTS_RETENTION_MONTHS, WORKFLOW_EXECUTION_RETENTION_MONTHS
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+@dataclass(frozen=True)
+class PartitionedTable:
+    table: str
+    column: str
+    retention_months: int
+
+
+# Append-only history tables, range partitioned by month on their creation time
+PARTITIONED_TABLES = [
+    PartitionedTable("cross_sell_webhook_events", "created_at", WEBHOOK_EVENTS_RETENTION_MONTHS),
+    PartitionedTable("core_workflow_execution", "start_time", WORKFLOW_EXECUTION_RETENTION_MONTHS),
+]
+
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _bounds(month: date) -> str:
+    return f"FROM ('{month.isoformat()} 00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00+00')"
+
+
+def _children(cursor, table: str) -> List[str]:
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = %s",
+        [table],
+    )
+    return [name for (name,) in cursor.fetchall()]
+
+
+def list_partitions(cursor, table: str) -> List[Tuple[str, date]]:
+    """Monthly partitions of `table` with the month they hold, oldest first. The default partition is left out."""
+    partitions = []
+    for name in _children(cursor, table):
+        match = _PARTITION_SUFFIX.search(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partition(cursor, table: str, column: str, month: date) -> Optional[str]:
+    """
+    Create the partition of `table` for `month`.
+
+    Rows of that month that already landed in the default partition are moved into the new one.
+
+    Returns:
+        The partition name, or None if it already exists
+    """
+    name = partition_name(table, month)
+    if name in {existing for existing, _ in list_partitions(cursor, table)}:
+        return None
+
+    lower, upper = f"'{month.isoformat()} 00:00+00'", f"'{add_months(month, 1).isoformat()} 00:00+00'"
+    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{table}_default" WHERE "{column}" >= {lower} AND "{column}" < {upper})')
+    if not cursor.fetchone()[0]:
+        cursor.execute(f'CREATE TABLE "{name}" PARTITION OF "{table}" FOR VALUES {_bounds(month)}')
+        return name
+
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{table}_default" WHERE "{column}" >= {lower} AND "{column}" < {upper} '
+        f'RETURNING *) INSERT INTO "{name}" SELECT * FROM moved'
+    )
+    cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES {_bounds(month)}')
+    return name
+
+
+def ensure_partitions(table: str, column: str, months_ahead: int, now: Optional[datetime] = None) -> List[str]:
+    """
+    Create the partitions of the current month and the next `months_ahead` months.
+
+    Returns:
+        Names of the partitions that were created
+    """
+    current = month_start(now or timezone.now())
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            name = create_partition(cursor, table, column, add_months(current, offset))
+            if name:
+                created.append(name)
+    return created
+
+
+def archive_partition(table: str, name: str, archive_dir: str) -> Tuple[str, int]:
+    """
+    Write a partition to `archive_dir` as gzipped JSONL, then detach and drop it.
+
+    The partition is read while still attached. The detach happens in one short transaction
+    that checks no rows were added meanwhile, and rolls back (keeping the partition) if they were.
+
+    Returns:
+        The archive path and the number of archived rows
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.jsonl.gz")
+    temp_path = f"{path}.tmp"
+    rows = 0
+    with connection.cursor() as cursor, gzip.open(temp_path, "wt", encoding="utf-8") as file:
+        with cursor.cursor.copy(f'COPY (SELECT row_to_json(p)::text FROM "{name}" AS p ORDER BY id) TO STDOUT') as copy:
+            copy.set_types(["text"])
+            for (line,) in copy.rows():
+                file.write(line)
+                file.write("\n")
+                rows += 1
+
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+            cursor.execute(f'SELECT count(*) FROM "{name}"')
+            count = cursor.fetchone()[0]
+            if count != rows:
+                raise RuntimeError(f"{name} changed while it was archived ({rows} archived, {count} now)")
+            cursor.execute(f'DROP TABLE "{name}"')
+            os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return path, rows
+
+
+def archive_partitions(table: str, retention_months: int, archive_dir: str,
+                       now: Optional[datetime] = None) -> List[Tuple[str, int]]:
+    """
+    Archive every partition of `table` that only holds rows older than `retention_months` months.
+
+    Returns:
+        The archive path and row count of each archived partition
+    """
+    cutoff = add_months(month_start(now or timezone.now()), -retention_months)
+    with connection.cursor() as cursor:
+        expired = [name for name, month in list_partitions(cursor, table) if add_months(month, 1) <= cutoff]
+    return [archive_partition(table, name, archive_dir) for name in expired]
+
+
+def convert_to_partitioned(schema_editor, table: str, column: str, months_ahead: int) -> None:
+    """
+    Rebuild `table` as a table range partitioned by month on `column`, keeping its rows and indexes.
+
+    Used by migrations. The primary key becomes (id, column), since a unique constraint of a
+    partitioned table has to include the partition key, and ids come from an owned sequence
+    because partitioned tables cannot have identity columns. Rows outside the created months
+    go to a default partition.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    old = f"{table}_unpartitioned"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p')",
+            [old, old],
+        )
+        index_definitions = [re.sub(rf' ON (ONLY )?\S*"?{old}"? ', f' ON "{table}" ', definition)
+                             for (definition,) in cursor.fetchall()]
+        cursor.execute(f'SELECT min("{column}"), max(id) FROM "{old}"')
+        first, last_id = cursor.fetchone()
+
+        cursor.execute(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                       f'PARTITION BY RANGE ("{column}")')
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+        current = month_start(timezone.now())
+        month = min(month_start(first), current) if first else current
+        while month <= add_months(current, months_ahead):
+            cursor.execute(f'CREATE TABLE "{partition_name(table, month)}" PARTITION OF "{table}" '
+                           f'FOR VALUES {_bounds(month)}')
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+        cursor.execute(f'DROP TABLE "{old}"')
+
+        cursor.execute(f'CREATE SEQUENCE "{table}_id_seq" OWNED BY "{table}".id')
+        if last_id:
+            cursor.execute("SELECT setval(%s, %s)", [f"{table}_id_seq", last_id])
+        cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{table}_id_seq"\')')
+        cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, "{column}")')
+        for definition in index_definitions:
+            cursor.execute(definition)
+
+
+def add_index_concurrently(schema_editor, model, index, unique: bool = False) -> None:
+    """
+    Build `index` on a partitioned table without blocking writes.
+
+    CREATE INDEX CONCURRENTLY does not work on a partitioned table, so the index is created on the
+    parent only (invalid until every partition has one), then built concurrently on each partition
+    and attached. Partitions created later get it automatically. Needs a non-atomic migration.
+    """
+    table = model._meta.db_table
+    quote = schema_editor.quote_name
+
+    def statement(target: str, name: str, concurrently: bool) -> str:
+        sql = index.create_sql(model, schema_editor, concurrently=concurrently)
+        sql.parts["table"] = target
+        sql.parts["name"] = quote(name)
+        sql = str(sql)
+        return sql.replace("CREATE INDEX", "CREATE UNIQUE INDEX", 1) if unique else sql
+
+    schema_editor.execute(statement(f"ONLY {quote(table)}", index.name, False))
+    with schema_editor.connection.cursor() as cursor:
+        partitions = _children(cursor, table)
+    for partition in partitions:
+        # e.g. webhook_events_unprocessed_idx_p2026_10
+        child = f"{index.name}_{partition[len(table) + 1:]}"
+        schema_editor.execute(statement(quote(partition), child, True))
+        schema_editor.execute(f"ALTER INDEX {quote(index.name)} ATTACH PARTITION {quote(child)}")
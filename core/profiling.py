@@ -0,0 +1,92 @@
+# core/profiling.py
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional, Tuple
+
+
+def _collapse(frame) -> str:
+    # Root first, in the "folded" format flame graph tools read: a;b;c
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the message pipeline.
+
+    Once armed, a background thread samples the stack of every other thread each `interval`
+    seconds until `messages` more messages were handled, then writes the stacks in folded format
+    (one "frame;frame;frame count" line per stack) to `output_dir`. Costs nothing while disarmed.
+    With `thread_prefixes`, only threads whose name starts with one of them are sampled.
+    """
+
+    def __init__(self, output_dir: str, interval: float = 0.005, thread_prefixes: Tuple[str, ...] = ()):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.thread_prefixes = thread_prefixes
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_profile: Optional[str] = None
+
+    @property
+    def armed(self) -> bool:
+        return self._remaining > 0
+
+    def arm(self, messages: int) -> None:
+        """Profile the next `messages` messages. Safe to call from a signal handler."""
+        with self._lock:
+            if self._remaining > 0 or messages < 1:
+                return
+            self._remaining = messages
+            self._samples = Counter()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def message_done(self) -> None:
+        if not self._remaining:
+            return
+        with self._lock:
+            if self._remaining == 0:
+                return
+            self._remaining -= 1
+            finished = self._remaining == 0
+        if finished:
+            self._stop.set()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()} if self.thread_prefixes else {}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_prefixes and not names.get(thread_id, "").startswith(self.thread_prefixes):
+                    continue
+                self._samples[_collapse(frame)] += 1
+        self.last_profile = self._write()
+
+    def _write(self) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self._samples.most_common():
+                file.write(f"{stack} {count}\n")
+        return path
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Wait for the current profile to be written and return its path."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.last_profile
@@ -0,0 +1,154 @@
+# core/rate_limit.py
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection
+
+from hephestos.settings import (RATE_LIMIT_BACKEND, RATE_LIMIT_SHOP_RATE, RATE_LIMIT_SHOP_BURST,
+                                RATE_LIMIT_DESTINATION_RATE, RATE_LIMIT_DESTINATION_BURST)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `capacity`.
+    Not thread-safe on its own, LocalRateLimiter guards it with a lock stripe.
+    """
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def take(self, cost: float, now: float) -> float:
+        """
+        Take `cost` tokens if available.
+
+        Returns:
+            0 if the tokens were taken, otherwise the seconds until they will be available
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def give_back(self, cost: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+
+class LocalRateLimiter:
+    """
+    Token buckets per key, shared by the threads of a process.
+
+    Buckets are spread over a fixed number of lock stripes, so threads working for different
+    keys rarely wait on each other.
+    """
+
+    def __init__(self, rate: float, burst: float, stripes: int = 64):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
+
+    def take(self, key: str, cost: float = 1) -> float:
+        with self._lock_for(key):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            return bucket.take(cost, time.monotonic())
+
+    def give_back(self, key: str, cost: float = 1) -> None:
+        with self._lock_for(key):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.give_back(cost)
+
+
+class PostgresRateLimiter:
+    """
+    Token buckets per key stored in core_rate_limit_bucket, shared by every process.
+    Refill and take happen in one atomic upsert.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+
+    def take(self, key: str, cost: float = 1) -> float:
+        # clock_timestamp(), not now(): now() is fixed for the whole transaction, so inside an atomic
+        # block no time would ever pass and buckets would not refill
+        refilled = "LEAST(%(burst)s, b.tokens + EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) * %(rate)s)"
+        params = {"key": key, "cost": cost, "rate": self.rate, "burst": self.burst}
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO core_rate_limit_bucket AS b (key, tokens, updated_at) "
+                f"VALUES (%(key)s, %(burst)s - %(cost)s, clock_timestamp()) "
+                f"ON CONFLICT (key) DO UPDATE SET tokens = {refilled} - %(cost)s, updated_at = clock_timestamp() "
+                f"WHERE {refilled} >= %(cost)s "
+                f"RETURNING tokens",
+                params,
+            )
+            if cursor.fetchone() is not None:
+                return 0.0
+            cursor.execute(
+                f"SELECT {refilled} FROM core_rate_limit_bucket AS b WHERE key = %(key)s",
+                params,
+            )
+            row = cursor.fetchone()
+        available = float(row[0]) if row else 0.0
+        return max((cost - available) / self.rate, 0.001)
+
+    def give_back(self, key: str, cost: float = 1) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE core_rate_limit_bucket SET tokens = LEAST(%s, tokens + %s) WHERE key = %s",
+                [self.burst, cost, key],
+            )
+
+
+class OutboundRateLimiter:
+    """
+    Rate limits outbound actions (http calls, emails) per shop and per destination.
+    A call has to get a token from both buckets.
+    """
+
+    def __init__(self, shop_limiter, destination_limiter):
+        self.shop_limiter = shop_limiter
+        self.destination_limiter = destination_limiter
+
+    def acquire(self, shop: Optional[str], destination: Optional[str]) -> float:
+        """
+        Returns:
+            0 if the call may go ahead, otherwise the seconds to defer it by
+        """
+        taken: List[Tuple[object, str]] = []
+        for limiter, key in ((self.shop_limiter, f"shop:{shop}" if shop else None),
+                             (self.destination_limiter, f"destination:{destination}" if destination else None)):
+            if key is None:
+                continue
+            retry_after = limiter.take(key)
+            if retry_after:
+                # Do not charge the other bucket for a call that does not happen
+                for taken_limiter, taken_key in taken:
+                    taken_limiter.give_back(taken_key)
+                return retry_after
+            taken.append((limiter, key))
+        return 0.0
+
+
+def build_rate_limiter(backend: str = RATE_LIMIT_BACKEND) -> OutboundRateLimiter:
+    limiter_class = PostgresRateLimiter if backend == "postgres" else LocalRateLimiter
+    return OutboundRateLimiter(
+        shop_limiter=limiter_class(RATE_LIMIT_SHOP_RATE, RATE_LIMIT_SHOP_BURST),
+        destination_limiter=limiter_class(RATE_LIMIT_DESTINATION_RATE, RATE_LIMIT_DESTINATION_BURST),
+    )
+
+
+outbound_limiter = build_rate_limiter()
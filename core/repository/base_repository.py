@@ -1,7 +1,26 @@
 from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Optional
+
+from django.db import transaction
+from django.db.models import Model, QuerySet
+
+BULK_CHUNK_SIZE = 1000
+ITER_CHUNK_SIZE = 2000
+
+
+def chunked(objects: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(objects)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 
 class BaseRepository(ABC):
+    """
+    Data access for one model. Subclasses set `model`; bulk writes, streaming reads and work
+    claiming share the implementations below.
+    """
+    model: type[Model]
 
     @staticmethod
     @abstractmethod
@@ -12,3 +31,69 @@ class BaseRepository(ABC):
     @abstractmethod
     def get_all():
         pass
+
+    @classmethod
+    def bulk_save(cls, objects: Iterable[Model], chunk_size: int = BULK_CHUNK_SIZE,
+                  ignore_conflicts: bool = True, **kwargs: Any) -> int:
+        """
+        Insert objects with one multi-row INSERT per chunk.
+
+        Rows that conflict with existing ones are skipped, or updated when `update_conflicts`,
+        `update_fields` and `unique_fields` are passed instead (see QuerySet.bulk_create).
+        `objects` may be a generator, only one chunk is held at a time.
+
+        Returns:
+            The number of objects sent to the database
+        """
+        if kwargs.get("update_conflicts"):
+            ignore_conflicts = False
+        count = 0
+        for chunk in chunked(objects, chunk_size):
+            cls.model.objects.bulk_create(chunk, ignore_conflicts=ignore_conflicts, **kwargs)
+            count += len(chunk)
+        return count
+
+    @classmethod
+    async def abulk_save(cls, objects: Iterable[Model], chunk_size: int = BULK_CHUNK_SIZE,
+                         ignore_conflicts: bool = True, **kwargs: Any) -> int:
+        """Async variant of `bulk_save`."""
+        if kwargs.get("update_conflicts"):
+            ignore_conflicts = False
+        count = 0
+        for chunk in chunked(objects, chunk_size):
+            await cls.model.objects.abulk_create(chunk, ignore_conflicts=ignore_conflicts, **kwargs)
+            count += len(chunk)
+        return count
+
+    @classmethod
+    def iter_chunks(cls, queryset: Optional[QuerySet] = None,
+                    chunk_size: int = ITER_CHUNK_SIZE) -> Iterator[List[Any]]:
+        """
+        Yield the rows of `queryset` (all rows by default) in lists of `chunk_size`.
+
+        Rows are fetched through a server-side cursor, so memory use is bounded by the chunk size
+        whatever the table size. Works with .values() and .values_list() querysets too.
+        """
+        queryset = cls.model.objects.all() if queryset is None else queryset
+        yield from chunked(queryset.iterator(chunk_size=chunk_size), chunk_size)
+
+    @classmethod
+    def claim_batch(cls, queryset: QuerySet, limit: int, **changes: Any) -> List[Model]:
+        """
+        Claim up to `limit` rows of `queryset` that no other worker holds.
+
+        Rows are locked with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers get disjoint
+        batches without waiting on each other, and `changes` (e.g. a new state) are applied before
+        the locks are released.
+
+        Returns:
+            The claimed objects, with `changes` applied
+        """
+        with transaction.atomic(using=queryset.db):
+            claimed = list(queryset.select_for_update(skip_locked=True)[:limit])
+            if claimed and changes:
+                cls.model.objects.using(queryset.db).filter(pk__in=[obj.pk for obj in claimed]).update(**changes)
+                for obj in claimed:
+                    for field, value in changes.items():
+                        setattr(obj, field, value)
+        return claimed
@@ -0,0 +1,101 @@
+from django.db import connection
+from django.db.models import Count, Min, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import WorkflowExecution, ExecutionState
+from core.repository.base_repository import BaseRepository
+
+
+class ExecutionRepository(BaseRepository):
+    model = WorkflowExecution
+
+    @staticmethod
+    def save(execution: WorkflowExecution) -> WorkflowExecution:
+        execution.save()
+        return execution
+
+    @staticmethod
+    def get_all():
+        return WorkflowExecution.objects.all()
+
+    @classmethod
+    def due_paused(cls, now=None):
+        """Paused executions whose next run is due (served by the partial active index)."""
+        return WorkflowExecution.objects.filter(
+            Q(next_run_at__isnull=True) | Q(next_run_at__lte=now or timezone.now()),
+            state=ExecutionState.PAUSE,
+        )
+
+    @classmethod
+    def claimable(cls, now=None):
+        """
+        Executions a worker may claim: new ones, and retries and paused ones that are due
+        (served by the partial pending and active indexes), plus running ones whose worker let
+        its lease expire, e.g. because it crashed.
+        """
+        now = now or timezone.now()
+        due = Q(next_run_at__isnull=True) | Q(next_run_at__lte=now)
+        return WorkflowExecution.objects.filter(
+            (Q(state__in=[ExecutionState.NEW, ExecutionState.RETRY, ExecutionState.PAUSE]) & due)
+            | Q(state=ExecutionState.IN_PROGRESS, lease_expires_at__lt=now)
+        ).order_by("id")
+
+    @classmethod
+    def queue_depths(cls, now=None, cap=None):
+        """
+        Claimable executions per shop, with the time the longest waiting one became due.
+
+        Counting the whole backlog takes as long as the backlog is, so callers polling it during
+        one (the workers) pass a `cap`: each shop's count stops there, and the oldest due time is
+        the oldest of the executions counted.
+
+        Returns:
+            {shop_domain: (count, oldest due time)}
+        """
+        if cap is not None:
+            return cls._capped_queue_depths(now or timezone.now(), cap)
+        rows = (cls.claimable(now).order_by()
+                .values("shop_domain")
+                .annotate(depth=Count("id"), oldest=Min(Coalesce("next_run_at", "start_time"))))
+        return {row["shop_domain"]: (row["depth"], row["oldest"]) for row in rows}
+
+    @staticmethod
+    def _capped_queue_depths(now, cap):
+        # The shops with queued executions are found by skipping through workflow_execution_shop_idx
+        # (one index probe per shop), then at most `cap` claimable executions are read per shop.
+        # Executions without a shop form one more queue.
+        queued = ", ".join(f"'{state}'" for state in (ExecutionState.NEW, ExecutionState.RETRY,
+                                                      ExecutionState.PAUSE, ExecutionState.IN_PROGRESS))
+        claimable = (f"((e.state IN ('{ExecutionState.NEW}', '{ExecutionState.RETRY}', '{ExecutionState.PAUSE}') "
+                     f"AND (e.next_run_at IS NULL OR e.next_run_at <= %(now)s)) "
+                     f"OR (e.state = '{ExecutionState.IN_PROGRESS}' AND e.lease_expires_at < %(now)s))")
+        sql = f"""
+            WITH RECURSIVE shops(shop_domain) AS (
+                (SELECT shop_domain FROM core_workflow_execution
+                 WHERE state IN ({queued}) AND shop_domain IS NOT NULL ORDER BY shop_domain LIMIT 1)
+                UNION ALL
+                SELECT (SELECT e.shop_domain FROM core_workflow_execution e
+                        WHERE e.state IN ({queued}) AND e.shop_domain > s.shop_domain
+                        ORDER BY e.shop_domain LIMIT 1)
+                FROM shops s WHERE s.shop_domain IS NOT NULL
+            )
+            SELECT s.shop_domain, count(*), min(c.due)
+            FROM shops s
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(e.next_run_at, e.start_time) AS due FROM core_workflow_execution e
+                WHERE e.shop_domain = s.shop_domain AND e.state IN ({queued}) AND {claimable}
+                LIMIT %(cap)s
+            ) c
+            GROUP BY s.shop_domain
+            UNION ALL
+            SELECT NULL, count(*), min(c.due) FROM (
+                SELECT COALESCE(e.next_run_at, e.start_time) AS due FROM core_workflow_execution e
+                WHERE e.shop_domain IS NULL AND e.state IN ({queued}) AND {claimable}
+                LIMIT %(cap)s
+            ) c
+            HAVING count(*) > 0
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {"now": now, "cap": cap})
+            return {shop: (depth, oldest) for shop, depth, oldest in cursor.fetchall()}
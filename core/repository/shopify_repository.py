@@ -0,0 +1,28 @@
+from shopify.models import Shop, Order
+from core.repository.base_repository import BaseRepository
+
+
+class ShopRepository(BaseRepository):
+    model = Shop
+
+    @staticmethod
+    def save(shop: Shop) -> Shop:
+        shop.save()
+        return shop
+
+    @staticmethod
+    def get_all():
+        return Shop.objects.all()
+
+
+class OrderRepository(BaseRepository):
+    model = Order
+
+    @staticmethod
+    def save(order: Order) -> Order:
+        order.save()
+        return order
+
+    @staticmethod
+    def get_all():
+        return Order.objects.all()
@@ -1,8 +1,12 @@
+from django.db.models import Q
+from django.utils import timezone
+
 from cross_sell.models import WebhookEvents
 from core.repository.base_repository import BaseRepository
 
 
 class WebhookRepository(BaseRepository):
+    model = WebhookEvents
 
     @staticmethod
     def save(webhook: WebhookEvents) -> WebhookEvents:
@@ -11,5 +15,15 @@ class WebhookRepository(BaseRepository):
 
     @staticmethod
     def get_all():
-        e = ''
-        return e
+        return WebhookEvents.objects.all()
+
+    @classmethod
+    def unprocessed(cls):
+        """Events still to process, oldest first (served by the partial unprocessed index)."""
+        return WebhookEvents.objects.filter(processed=False).order_by("created_at")
+
+    @classmethod
+    def claimable(cls, now=None):
+        """Unprocessed events no outbox consumer holds, including those whose lease expired."""
+        return cls.unprocessed().filter(
+            Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now or timezone.now()))
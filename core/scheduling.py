@@ -0,0 +1,64 @@
+# core/scheduling.py
+from collections import deque
+from typing import Dict, Hashable, Mapping
+
+
+class DeficitRoundRobin:
+    """
+    Deficit round robin over the queues of several tenants (e.g. shops).
+
+    Each visit adds `quantum * weight` to a queue's deficit, and the queue may take as many
+    items as its deficit covers. A tenant with a long backlog therefore gets its weighted share
+    of the slots and no more, however far ahead it is. Credit left over when the slots run out
+    carries over to the next allocation, and is dropped once a queue is empty, so idle tenants
+    cannot bank it.
+
+    Not thread-safe, allocations are made by one thread.
+    """
+
+    def __init__(self, quantum: float = 1.0):
+        self.quantum = quantum
+        self._ring: deque = deque()
+        self._deficits: Dict[Hashable, float] = {}
+
+    def allocate(self, depths: Mapping[Hashable, int], weights: Mapping[Hashable, float],
+                 slots: int) -> Dict[Hashable, int]:
+        """
+        Split `slots` between the queues with a backlog.
+
+        Args:
+            depths: Items waiting per queue
+            weights: Weight per queue, queues without one weigh 1
+            slots: Items that can be taken now
+
+        Returns:
+            Items to take per queue, only queues that get some
+        """
+        for key in list(self._ring):
+            if not depths.get(key):
+                self._ring.remove(key)
+                del self._deficits[key]
+        for key, depth in depths.items():
+            if depth > 0 and key not in self._deficits:
+                self._ring.append(key)
+                self._deficits[key] = 0.0
+
+        remaining = {key: depths[key] for key in self._ring}
+        allocation: Dict[Hashable, int] = {}
+        while slots > 0 and any(remaining.values()):
+            key = self._ring[0]
+            if remaining[key]:
+                self._deficits[key] += self.quantum * max(weights.get(key, 1), 0.01)
+                taken = min(int(self._deficits[key]), remaining[key], slots)
+                if taken:
+                    allocation[key] = allocation.get(key, 0) + taken
+                    self._deficits[key] -= taken
+                    remaining[key] -= taken
+                    slots -= taken
+                if not remaining[key]:
+                    self._deficits[key] = 0.0
+            self._ring.rotate(-1)
+        return allocation
+
+    def deficit(self, key: Hashable) -> float:
+        return self._deficits.get(key, 0.0)
@@ -0,0 +1,138 @@
+# core/smtp_debug.py
+import socketserver
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+
+@dataclass
+class ReceivedMessage:
+    sender: str
+    recipients: List[str]
+    data: bytes
+    connection_id: int = 0
+
+
+@dataclass
+class _Session:
+    sender: Optional[str] = None
+    recipients: List[str] = field(default_factory=list)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self) -> None:
+        server: DebugSMTPServer = self.server
+        connection_id = server.next_connection_id()
+        session = _Session()
+        self.reply("220 hephestos debug SMTP server")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode("utf-8", errors="replace").strip().partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                self.reply("250-hephestos")
+                self.reply("250-PIPELINING")
+                self.reply("250 8BITMIME")
+            elif command == "HELO":
+                self.reply("250 hephestos")
+            elif command == "MAIL":
+                session = _Session(sender=_address(argument))
+                self.reply("250 OK")
+            elif command == "RCPT":
+                if session.sender is None:
+                    self.reply("503 Need MAIL before RCPT")
+                    continue
+                recipient = _address(argument)
+                if server.reject and server.reject(recipient):
+                    self.reply("550 Mailbox unavailable")
+                    continue
+                session.recipients.append(recipient)
+                self.reply("250 OK")
+            elif command == "DATA":
+                if not session.recipients:
+                    self.reply("554 No valid recipients")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                server.deliver(ReceivedMessage(session.sender, session.recipients, self._read_data(),
+                                               connection_id))
+                session = _Session()
+                self.reply("250 OK")
+            elif command == "RSET":
+                session = _Session()
+                self.reply("250 OK")
+            elif command == "NOOP":
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def _read_data(self) -> bytes:
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line == b".\r\n":
+                break
+            # Undo dot-stuffing
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+
+def _address(argument: str) -> str:
+    # "FROM:<a@example.com> SIZE=123" -> "a@example.com"
+    value = argument.partition(":")[2].strip()
+    return value.split(" ")[0].strip("<>")
+
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Minimal SMTP server that keeps every message it receives instead of delivering it.
+    Used by tests and for local development (manage.py smtp_debug_server).
+
+    Supports EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP and QUIT, and advertises PIPELINING.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 1025,
+                 on_message: Optional[Callable[[ReceivedMessage], None]] = None,
+                 reject: Optional[Callable[[str], bool]] = None):
+        super().__init__((host, port), _SMTPHandler)
+        self.messages: List[ReceivedMessage] = []
+        self.on_message = on_message
+        self.reject = reject
+        self._lock = threading.Lock()
+        self._connections = 0
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def next_connection_id(self) -> int:
+        with self._lock:
+            self._connections += 1
+            return self._connections
+
+    def deliver(self, message: ReceivedMessage) -> None:
+        with self._lock:
+            self.messages.append(message)
+        if self.on_message:
+            self.on_message(message)
+
+    def start(self) -> "DebugSMTPServer":
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="smtp-debug", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,189 @@
+# core/smtp_pool.py
+import re
+import smtplib
+import threading
+import time
+from collections import deque
+from email.message import EmailMessage
+from email.policy import SMTP
+from email.utils import getaddresses, parseaddr
+from typing import Any, Dict, List, Optional
+
+_LEADING_DOT = re.compile(rb"(?m)^\.")
+
+
+def build_message(sender: str, recipient: str, subject: str, content: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(content)
+    return message
+
+
+class _Connection:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """
+    Pool of persistent SMTP connections.
+
+    A batch of messages is sent over one connection. When the server advertises PIPELINING
+    (RFC 2920) the envelope of each message (MAIL, every RCPT and DATA) goes out in a single
+    write, so a message costs two round trips instead of two plus one per recipient.
+    """
+
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = False, use_ssl: bool = False, timeout: float = 10.0, max_connections: int = 4,
+                 max_idle_seconds: float = 30.0, max_messages_per_connection: int = 500):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.max_messages_per_connection = max_messages_per_connection
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle: deque = deque()
+        self._lock = threading.Lock()
+
+    def _connect(self) -> _Connection:
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        smtp = smtp_class(self.host, self.port, timeout=self.timeout)
+        smtp.ehlo_or_helo_if_needed()
+        if self.use_tls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.username:
+            smtp.login(self.username, self.password or "")
+        return _Connection(smtp)
+
+    def _acquire(self) -> _Connection:
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    return self._connect()
+                if time.monotonic() - connection.last_used < self.max_idle_seconds:
+                    return connection
+                # Servers drop idle connections, do not risk a failed send on a stale one
+                self._close(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, connection: Optional[_Connection]) -> None:
+        try:
+            if connection is None:
+                return
+            if connection.sent >= self.max_messages_per_connection:
+                self._close(connection)
+                return
+            connection.last_used = time.monotonic()
+            with self._lock:
+                self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _close(connection: _Connection) -> None:
+        try:
+            connection.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.smtp.close()
+
+    def send_batch(self, messages: List[EmailMessage]) -> List[Dict[str, Any]]:
+        """
+        Send messages over one pooled connection.
+
+        A message that is rejected does not stop the batch. If the connection drops, the remaining
+        messages are sent over a new connection once.
+
+        Returns:
+            One result dict per message, in the same order
+        """
+        results: List[Dict[str, Any]] = []
+        connection = self._acquire()
+        reconnected = False
+        try:
+            index = 0
+            while index < len(messages):
+                try:
+                    results.append(self._send(connection, messages[index]))
+                    index += 1
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    connection.smtp.close()
+                    connection = None
+                    if reconnected:
+                        results.extend({"status": "failed", "error": str(e)} for _ in messages[index:])
+                        break
+                    reconnected = True
+                    connection = self._connect()
+        finally:
+            self._release(connection)
+        return results
+
+    def send(self, message: EmailMessage) -> Dict[str, Any]:
+        return self.send_batch([message])[0]
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection in idle:
+            self._close(connection)
+
+    def _send(self, connection: _Connection, message: EmailMessage) -> Dict[str, Any]:
+        sender = parseaddr(message["From"])[1]
+        recipients = [address for _, address in getaddresses(message.get_all("To", []) + message.get_all("Cc", []))]
+        data = message.as_bytes(policy=SMTP)
+        try:
+            if connection.smtp.has_extn("pipelining"):
+                refused = self._send_pipelined(connection.smtp, sender, recipients, data)
+            else:
+                refused = connection.smtp.sendmail(sender, recipients, data)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+            connection.smtp.rset()
+            return {"status": "failed", "error": str(e)}
+        connection.sent += 1
+        result: Dict[str, Any] = {"status": "sent"}
+        if refused:
+            result["refused"] = sorted(refused)
+        return result
+
+    @staticmethod
+    def _send_pipelined(smtp: smtplib.SMTP, sender: str, recipients: List[str], data: bytes) -> Dict[str, Any]:
+        commands = [f"MAIL FROM:<{sender}>"] + [f"RCPT TO:<{recipient}>" for recipient in recipients] + ["DATA"]
+        smtp.send("".join(f"{command}\r\n" for command in commands))
+
+        # Every pipelined command gets a reply, read them all to keep the stream in sync
+        mail_code, mail_reply = smtp.getreply()
+        refused = {}
+        for recipient in recipients:
+            code, reply = smtp.getreply()
+            if code not in (250, 251):
+                refused[recipient] = (code, reply)
+        data_code, data_reply = smtp.getreply()
+
+        if mail_code != 250:
+            if data_code == 354:
+                smtp.send(b".\r\n")
+                smtp.getreply()
+            raise smtplib.SMTPSenderRefused(mail_code, mail_reply, sender)
+        if data_code != 354:
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        if not data.endswith(b"\r\n"):
+            data += b"\r\n"
+        smtp.send(_LEADING_DOT.sub(b"..", data) + b".\r\n")
+        code, reply = smtp.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, reply)
+        return refused
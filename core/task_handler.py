@@ -1,5 +1,6 @@
 from typing import Dict, Any, Callable, Optional
 from functools import wraps
+from .rate_limit import OutboundRateLimiter, outbound_limiter
 from .task_registry import TaskRegistry
 from .task_node import TaskNode
 
@@ -7,32 +8,47 @@ class TaskHandler:
     """
     Handles task execution using handlers registered in TaskRegistry.
     """
-    def __init__(self):
+    def __init__(self, rate_limiter: Optional[OutboundRateLimiter] = None):
         self.execution_history: Dict[str, Any] = {}
+        self.rate_limiter = rate_limiter or outbound_limiter
 
-    def execute_task(self, task: TaskNode) -> Dict[str, Any]:
+    def execute_task(self, task: TaskNode, shop: Optional[str] = None, validate: bool = True) -> Dict[str, Any]:
         """
         Execute a task using the handler registered in TaskRegistry.
         
         Args:
             task: The TaskNode object to execute
+            shop: Domain of the shop the task runs for, used for rate limiting
+            validate: Check the properties first, off for workflows validated when they were saved
             
         Returns:
-            Dict containing the task execution result
+            Dict containing the task execution result. A rate limited task is not executed and
+            reports status "deferred" with the seconds to retry after.
             
         Raises:
             ValueError: If task validation fails or execution fails
         """
         # Validate task properties using TaskRegistry
-        if not TaskRegistry.validate_task(task.type, task.properties):
+        if validate and not TaskRegistry.validate_task(task.type, task.properties):
             raise ValueError(f"Invalid properties for task type: {task.type}")
+
+        destination = TaskRegistry.get_destination(task.type, task.properties)
+        if destination is not None:
+            retry_after = self.rate_limiter.acquire(shop, destination)
+            if retry_after:
+                return {
+                    "status": "deferred",
+                    "retry_after": retry_after
+                }
             
         # Get and execute handler from TaskRegistry
         handler = TaskRegistry.get_handler(task.type)
         try:
             result = handler(task.properties)
+            # Handlers report their own failures in the result
+            failed = isinstance(result, dict) and result.get("status") == "failed"
             return {
-                "status": "completed",
+                "status": "failed" if failed else "completed",
                 "result": result
             }
         except Exception as e:
@@ -41,17 +57,18 @@ class TaskHandler:
                 "error": str(e)
             }
 
-def task(task_type: str, validator: Optional[Callable] = None):
+def task(task_type: str, validator: Optional[Callable] = None, destination: Optional[Callable] = None):
     """
     Decorator for registering task handlers in TaskRegistry.
     
     Args:
         task_type: The type of task to handle
         validator: Optional validator function for task properties
+        destination: Optional function returning the outbound destination of a task, makes it rate limited
     """
     def decorator(func: Callable) -> Callable:
         # Register the handler with TaskRegistry
-        TaskRegistry.register(task_type, func, validator)
+        TaskRegistry.register(task_type, func, validator, destination)
         
         @wraps(func)
         def wrapper(properties: Dict[str, Any]) -> Any:
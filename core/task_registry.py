@@ -1,17 +1,58 @@
 # core/task_registry.py
-from typing import Callable, Dict, Any, Optional
+import threading
+from importlib import import_module
+from typing import Callable, Dict, Any, List, Optional
 from functools import wraps
 
 class TaskRegistry:
     """
     Central registry for task handlers and validators.
     Apps can register their task handlers here.
+
+    Apps list the modules defining their handlers in a `task_modules` attribute of their AppConfig.
+    Those modules are only imported the first time the registry is used, so processes that never
+    run a task do not pay for the clients the handlers are built on.
     """
     _registry: Dict[str, Callable] = {}
     _validators: Dict[str, Callable] = {}
+    _destinations: Dict[str, Callable] = {}
+    _modules: List[str] = []
+    _loaded = True
+    _load_lock = threading.RLock()
+
+    @classmethod
+    def add_module(cls, module: str) -> None:
+        """
+        Declare a module registering task handlers (with @task), imported on first use of the registry.
+        """
+        with cls._load_lock:
+            if module not in cls._modules:
+                cls._modules.append(module)
+                cls._loaded = False
+
+    @classmethod
+    def autodiscover(cls) -> None:
+        """Declare the `task_modules` of every installed app. Called from CoreConfig.ready."""
+        from django.apps import apps
+
+        for app_config in apps.get_app_configs():
+            for module in getattr(app_config, "task_modules", ()):
+                cls.add_module(module)
+
+    @classmethod
+    def _load(cls) -> None:
+        if cls._loaded:
+            return
+        with cls._load_lock:
+            if cls._loaded:
+                return
+            for module in cls._modules:
+                import_module(module)
+            cls._loaded = True
 
     @classmethod
-    def register(cls, task_type: str, handler: Callable, validator: Optional[Callable] = None) -> None:
+    def register(cls, task_type: str, handler: Callable, validator: Optional[Callable] = None,
+                 destination: Optional[Callable] = None) -> None:
         """
         Register a task handler from an app.
         
@@ -19,12 +60,16 @@ class TaskRegistry:
             task_type: The type of task to register
             handler: The function that will handle the task
             validator: Optional function to validate task properties
+            destination: Optional function returning the outbound destination of a task (e.g. a host)
+                from its properties. Tasks with a destination are rate limited.
         """
         if task_type in cls._registry:
             raise ValueError(f"Task type '{task_type}' is already registered")
         cls._registry[task_type] = handler
         if validator:
             cls._validators[task_type] = validator
+        if destination:
+            cls._destinations[task_type] = destination
 
     @classmethod
     def get_handler(cls, task_type: str) -> Callable:
@@ -40,6 +85,7 @@ class TaskRegistry:
         Raises:
             ValueError: If no handler is registered for the task type
         """
+        cls._load()
         if task_type not in cls._registry:
             raise ValueError(f"No handler registered for task type: {task_type}")
         return cls._registry[task_type]
@@ -56,15 +102,28 @@ class TaskRegistry:
         Returns:
             bool: True if validation passes, False otherwise
         """
+        cls._load()
         validator = cls._validators.get(task_type)
         if validator:
             return validator(properties)
         return True
 
+    @classmethod
+    def get_destination(cls, task_type: str, properties: Dict[str, Any]) -> Optional[str]:
+        """
+        Returns the outbound destination of a task, or None if the task type is not rate limited.
+        """
+        cls._load()
+        destination = cls._destinations.get(task_type)
+        if destination:
+            return destination(properties)
+        return None
+
     @classmethod
     def get_registered_types(cls) -> list[str]:
         """
         Returns a list of all registered task types.
         """
+        cls._load()
         return list(cls._registry.keys())
 
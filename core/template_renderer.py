@@ -0,0 +1,90 @@
+# core/template_renderer.py
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .context_binder import compile_path, normalize_path
+
+# {{customer.email}}, {{ order.name }}
+PLACEHOLDER = re.compile(r"{{\s*([\w.]+)\s*}}")
+
+Segment = Union[str, Callable[[Any], Any]]
+
+
+@lru_cache(maxsize=4096)
+def compile_template(template: str) -> Tuple[Segment, ...]:
+    """
+    Compile a template string once into literal segments and path extractors.
+
+    e.g. "Hi {{customer.first_name}}!" -> ("Hi ", <extractor customer.first_name>, "!")
+    """
+    segments: List[Segment] = []
+    position = 0
+    for match in PLACEHOLDER.finditer(template):
+        if match.start() > position:
+            segments.append(template[position:match.start()])
+        segments.append(compile_path(normalize_path(match.group(1))))
+        position = match.end()
+    if position < len(template):
+        segments.append(template[position:])
+    return tuple(segments)
+
+
+def render(segments: Tuple[Segment, ...], data: Dict[str, Any]) -> str:
+    """
+    Render compiled segments against runtime data. Missing values render as an empty string.
+    """
+    parts = []
+    for segment in segments:
+        if segment.__class__ is str:
+            parts.append(segment)
+        else:
+            value = segment(data)
+            parts.append("" if value is None else str(value))
+    return "".join(parts)
+
+
+def render_batch(template: str, items: Iterable[Dict[str, Any]]) -> List[str]:
+    """
+    Render one template for many recipients, compiling it only once.
+
+    Args:
+        template: Template string with {{path}} placeholders
+        items: Runtime data of each recipient
+
+    Returns:
+        The rendered strings, in the order of items
+    """
+    segments = compile_template(template)
+    return [render(segments, data) for data in items]
+
+
+def compile_properties(value: Any) -> Optional[Callable[[Dict[str, Any]], Any]]:
+    """
+    Compile every template string in (nested) task properties.
+
+    Returns:
+        A function rendering the properties against runtime data, or None if the properties
+        hold no placeholders and can be used as they are
+    """
+    if isinstance(value, str):
+        if "{{" not in value:
+            return None
+        segments = compile_template(value)
+        return lambda data: render(segments, data)
+
+    if isinstance(value, dict):
+        compiled = {key: compile_properties(item) for key, item in value.items()}
+        if not any(compiled.values()):
+            return None
+        return lambda data: {key: (compiled[key](data) if compiled[key] else item)
+                             for key, item in value.items()}
+
+    if isinstance(value, list):
+        compiled_items = [compile_properties(item) for item in value]
+        if not any(compiled_items):
+            return None
+        return lambda data: [(render_item(data) if render_item else item)
+                             for render_item, item in zip(compiled_items, value)]
+
+    return None
@@ -1,3 +1,694 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import logging
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from urllib3.exceptions import ReadTimeoutError
+
+from core.context_binder import ContextBinder, RuntimeData, coerce_operands, compile_path, get_binder
+from core.db_router import PrimaryReplicaRouter, pin_to_primary, read_replica
+from core.executor_pool import BoundedExecutor
+from core.http_cache import ResponseCache
+from core.http_client import HttpClient, ResponseTooLarge
+from core.models import WorkflowExecution, ExecutionState, Status
+from core.management.commands.import_time import measure
+from core.log import BackgroundHandler, ContextFilter, JsonFormatter, log_context
+from core.metrics import StageTimers
+from core.profiling import SamplingProfiler
+from core.partitioning import (add_months, archive_partitions, create_partition, ensure_partitions,
+                               list_partitions, month_start)
+from core.repository.execution_repository import ExecutionRepository
+from core.rate_limit import LocalRateLimiter, OutboundRateLimiter, PostgresRateLimiter
+from core.scheduling import DeficitRoundRobin
+from core.smtp_debug import DebugSMTPServer
+from core.smtp_pool import SMTPConnectionPool, build_message
+from core.tracing import SpanExporter, span, tracer
+from core.task_registry import TaskRegistry
+from core.template_renderer import compile_template, render_batch
+from core.workflow import compile_workflow
+
+
+class BoundedExecutorTestCase(SimpleTestCase):
+    def setUp(self):
+        self.executor = BoundedExecutor(max_workers=4, max_per_key=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_per_key_concurrency_is_capped(self):
+        lock = threading.Lock()
+        running = {"now": 0, "max": 0}
+
+        def call():
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            time.sleep(0.02)
+            with lock:
+                running["now"] -= 1
+            return True
+
+        results = self.executor.run_all("shop", [call] * 6)
+
+        self.assertEqual([r["status"] for r in results], ["completed"] * 6)
+        self.assertEqual(running["max"], 2)
+
+    def test_failures_are_isolated(self):
+        def fail():
+            raise ValueError("boom")
+
+        results = self.executor.run_all("shop", [fail, lambda: "ok"])
+
+        self.assertEqual(results[0], {"status": "failed", "error": "boom"})
+        self.assertEqual(results[1], {"status": "completed", "result": "ok"})
+
+    def test_calls_past_the_deadline_are_reported_as_timeout(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        results = self.executor.run_all("shop", [release.wait, lambda: "ok"], timeout=0.05)
+
+        self.assertEqual(results[0]["status"], "timeout")
+        self.assertEqual(results[1]["status"], "completed")
+
+
+class ContextBinderTestCase(SimpleTestCase):
+    data = {
+        "order": {"current_total_price": "49.95", "line_items": [{"quantity": 2}], "order_number": 1007},
+        "customer": {"email": "ayumu.hirano@example.com"},
+    }
+
+    def test_bind_extracts_and_types_values(self):
+        binder = ContextBinder({
+            "current_total_price": "current_total_price",
+            "quantity": "order.line_items.0.quantity",
+            "email": "customer.email",
+            "missing": "order.shipping_address.zip",
+        })
+
+        self.assertEqual(binder.bind(self.data), {
+            "current_total_price": "49.95",
+            "quantity": 2,
+            "email": "ayumu.hirano@example.com",
+        })
+
+    def test_digit_segments_are_dict_keys_unless_indexing_a_list(self):
+        data = {"order": {"note_attributes": {"0": "gift"}, "line_items": [{"sku": "007"}]}}
+
+        self.assertEqual(compile_path("order.note_attributes.0")(data), "gift")
+        self.assertEqual(compile_path("order.line_items.0.sku")(data), "007")
+
+    def test_operands_are_coerced_only_against_numbers(self):
+        self.assertEqual(coerce_operands("49.95", 49.95), (Decimal("49.95"), Decimal("49.95")))
+        self.assertEqual(coerce_operands(2, 1.5), (Decimal("2"), Decimal("1.5")))
+        self.assertEqual(coerce_operands("02134", "02134"), ("02134", "02134"))
+        self.assertEqual(coerce_operands("n/a", 50), ("n/a", 50))
+
+    def test_binders_are_shared_and_memoized_per_runtime_data(self):
+        binder = get_binder({"order_number": "order.order_number"})
+        self.assertIs(binder, get_binder({"order_number": "order.order_number"}))
+
+        data = RuntimeData(self.data)
+        self.assertIs(data.bind(binder), data.bind(binder))
+
+    def test_plan_binds_condition_context(self):
+        plan = compile_workflow({"trigger": "task0", "tasks": {"task0": {
+            "id": "task0", "type": "condition",
+            "properties": {"condition_type": "if",
+                           "conditions": [{"field": "current_total_price", "operator": ">", "value": 50}],
+                           "context": {"current_total_price": 0}},
+        }}})
+
+        properties = plan.properties_for("task0", RuntimeData(self.data))
+
+        self.assertEqual(properties["context"], {"current_total_price": "49.95"})
+        self.assertEqual(plan.properties_for("task0")["context"], {"current_total_price": 0})
+
+
+class TemplateRendererTestCase(SimpleTestCase):
+    def test_compile_template_splits_literals_and_paths(self):
+        segments = compile_template("Hi {{ customer.first_name }}, order {{name}} is on its way")
+
+        self.assertEqual(segments[0], "Hi ")
+        self.assertEqual(segments[2], ", order ")
+        self.assertIs(segments, compile_template("Hi {{ customer.first_name }}, order {{name}} is on its way"))
+
+    def test_render_batch(self):
+        recipients = [{"customer": {"email": "a@example.com"}}, {"customer": {}}]
+
+        self.assertEqual(render_batch("To: {{customer.email}}", recipients), ["To: a@example.com", "To: "])
+
+    def test_plan_renders_integration_config(self):
+        plan = compile_workflow({"trigger": "task0", "tasks": {"task0": {
+            "id": "task0", "type": "integration",
+            "properties": {"integration_type": "email",
+                           "config": {"recipient": "{{customer.email}}", "subject": "Thanks for order {{name}}"}},
+        }}})
+
+        properties = plan.properties_for("task0", RuntimeData({
+            "order": {"name": "#1007"}, "customer": {"email": "ayumu.hirano@example.com"}}))
+
+        self.assertEqual(properties["config"], {"recipient": "ayumu.hirano@example.com",
+                                                "subject": "Thanks for order #1007"})
+        self.assertEqual(plan.properties_for("task0")["config"]["recipient"], "{{customer.email}}")
+
+
+class _TestRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.client_ports.append(self.client_address[1])
+        self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        if self.path == "/slow":
+            time.sleep(0.5)
+        if self.path == "/etag" and self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = b"x" * 2048 if self.path == "/large" else json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path.startswith("/max-age"):
+            self.send_header("Cache-Control", "max-age=60")
+        elif self.path == "/etag":
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalHttpServerMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _TestRequestHandler)
+        cls.server.client_ports = []
+        cls.server.hits = {}
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+
+class HttpClientTestCase(LocalHttpServerMixin, SimpleTestCase):
+    def setUp(self):
+        self.client = HttpClient(max_connections_per_host=2, read_timeout=2, max_response_bytes=1024)
+        self.addCleanup(self.client.clear)
+        self.server.client_ports.clear()
+
+    def test_connections_are_kept_alive(self):
+        first = self.client.request("GET", f"{self.base_url}/one")
+        second = self.client.request("GET", f"{self.base_url}/two")
+
+        self.assertEqual((first.status_code, first.data()), (200, {"path": "/one"}))
+        self.assertEqual(second.data(), {"path": "/two"})
+        self.assertEqual(len(set(self.server.client_ports)), 1)
+
+    def test_json_body(self):
+        response = self.client.request("POST", f"{self.base_url}/echo", json_body={"order_id": 1})
+
+        self.assertEqual((response.status_code, response.data()), (201, {"order_id": 1}))
+
+    def test_response_size_is_capped(self):
+        with self.assertRaises(ResponseTooLarge):
+            self.client.request("GET", f"{self.base_url}/large")
+        self.assertEqual(len(self.client.request("GET", f"{self.base_url}/large",
+                                                 max_response_bytes=4096).body), 2048)
+
+    def test_read_timeout(self):
+        with self.assertRaises(ReadTimeoutError):
+            self.client.request("GET", f"{self.base_url}/slow", read_timeout=0.1)
+
+    def test_overriding_one_timeout_keeps_the_other(self):
+        client = HttpClient(read_timeout=0.1)
+        self.addCleanup(client.clear)
+        with self.assertRaises(ReadTimeoutError):
+            client.request("GET", f"{self.base_url}/slow", connect_timeout=2)
+
+    def test_async_variant(self):
+        response = asyncio.run(self.client.arequest("GET", f"{self.base_url}/async"))
+
+        self.assertEqual(response.data(), {"path": "/async"})
+
+
+class ResponseCacheTestCase(LocalHttpServerMixin, SimpleTestCase):
+    def setUp(self):
+        self.client = HttpClient()
+        self.addCleanup(self.client.clear)
+        self.server.hits.clear()
+
+    def test_fresh_responses_are_served_from_cache(self):
+        cache = ResponseCache()
+        for _ in range(3):
+            response = cache.fetch(self.client, "GET", f"{self.base_url}/max-age")
+
+        self.assertEqual(response.data(), {"path": "/max-age"})
+        self.assertEqual(self.server.hits["/max-age"], 1)
+
+    def test_key_includes_credentials(self):
+        cache = ResponseCache()
+        cache.fetch(self.client, "GET", f"{self.base_url}/max-age", headers={"Authorization": "a"})
+        cache.fetch(self.client, "GET", f"{self.base_url}/max-age", headers={"Authorization": "b"})
+
+        self.assertEqual(self.server.hits["/max-age"], 2)
+
+    def test_no_cache_responses_are_revalidated_with_etag(self):
+        cache = ResponseCache()
+        first = cache.fetch(self.client, "GET", f"{self.base_url}/etag")
+        second = cache.fetch(self.client, "GET", f"{self.base_url}/etag")
+
+        self.assertEqual(self.server.hits["/etag"], 2)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.body, first.body)
+
+    def test_concurrent_identical_requests_are_coalesced(self):
+        cache = ResponseCache()
+        threads = [threading.Thread(target=cache.fetch, args=(self.client, "GET", f"{self.base_url}/slow"))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.server.hits["/slow"], 1)
+
+    def test_evicted_entries_spill_over_to_disk(self):
+        with tempfile.TemporaryDirectory() as disk_dir:
+            cache = ResponseCache(max_entries=1, disk_dir=disk_dir)
+            cache.fetch(self.client, "GET", f"{self.base_url}/max-age/1")
+            cache.fetch(self.client, "GET", f"{self.base_url}/max-age/2")
+            response = cache.fetch(self.client, "GET", f"{self.base_url}/max-age/1")
+
+        self.assertEqual(response.data(), {"path": "/max-age/1"})
+        self.assertEqual(self.server.hits["/max-age/1"], 1)
+
+
+class SMTPConnectionPoolTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = DebugSMTPServer(port=0, reject=lambda recipient: recipient.startswith("bounce")).start()
+        self.addCleanup(self.server.stop)
+        self.pool = SMTPConnectionPool("127.0.0.1", self.server.port, max_connections=2)
+        self.addCleanup(self.pool.close_all)
+
+    def _messages(self, *recipients):
+        return [build_message("shop@example.com", recipient, "Related products", "Hi!") for recipient in recipients]
+
+    def test_batch_is_pipelined_over_one_connection(self):
+        results = self.pool.send_batch(self._messages("a@example.com", "b@example.com", "c@example.com"))
+
+        self.assertEqual([r["status"] for r in results], ["sent"] * 3)
+        self.assertEqual([m.recipients for m in self.server.messages],
+                         [["a@example.com"], ["b@example.com"], ["c@example.com"]])
+        self.assertEqual({m.connection_id for m in self.server.messages}, {1})
+        self.assertIn(b"Subject: Related products", self.server.messages[0].data)
+
+    def test_connections_are_reused_between_batches(self):
+        self.pool.send(self._messages("a@example.com")[0])
+        self.pool.send(self._messages("b@example.com")[0])
+
+        self.assertEqual({m.connection_id for m in self.server.messages}, {1})
+
+    def test_rejected_message_does_not_stop_the_batch(self):
+        results = self.pool.send_batch(self._messages("bounce@example.com", "a@example.com"))
+
+        self.assertEqual([r["status"] for r in results], ["failed", "sent"])
+        self.assertEqual([m.recipients for m in self.server.messages], [["a@example.com"]])
+
+
+class RateLimiterTestCase(SimpleTestCase):
+    def test_bucket_allows_burst_then_defers(self):
+        limiter = LocalRateLimiter(rate=1, burst=2)
+
+        self.assertEqual(limiter.take("shop:a"), 0)
+        self.assertEqual(limiter.take("shop:a"), 0)
+        self.assertGreater(limiter.take("shop:a"), 0)
+        self.assertEqual(limiter.take("shop:b"), 0)
+
+    def test_shop_token_is_given_back_when_destination_is_throttled(self):
+        shops = LocalRateLimiter(rate=1, burst=1)
+        limiter = OutboundRateLimiter(shops, LocalRateLimiter(rate=1, burst=1))
+
+        self.assertEqual(limiter.acquire("a", "api.example.com"), 0)
+        self.assertGreater(limiter.acquire("b", "api.example.com"), 0)
+        self.assertEqual(shops.take("shop:b"), 0)
+
+
+class PostgresRateLimiterTestCase(TestCase):
+    def test_buckets_are_shared_through_the_database(self):
+        limiter = PostgresRateLimiter(rate=1, burst=2)
+
+        self.assertEqual(limiter.take("shop:a"), 0)
+        self.assertEqual(PostgresRateLimiter(rate=1, burst=2).take("shop:a"), 0)
+        self.assertGreater(limiter.take("shop:a"), 0)
+        limiter.give_back("shop:a")
+        self.assertEqual(limiter.take("shop:a"), 0)
+
+    def test_buckets_refill_inside_a_transaction(self):
+        # The test runs in one transaction, in which now() never moves
+        limiter = PostgresRateLimiter(rate=50, burst=1)
+
+        self.assertEqual(limiter.take("shop:b"), 0)
+        self.assertGreater(limiter.take("shop:b"), 0)
+        time.sleep(0.05)
+        self.assertEqual(limiter.take("shop:b"), 0)
+
+
+class PartitioningTestCase(TestCase):
+    table = "core_workflow_execution"
+
+    def test_upcoming_partitions_are_created_once(self):
+        created = ensure_partitions(self.table, "start_time", months_ahead=5)
+
+        self.assertEqual(ensure_partitions(self.table, "start_time", months_ahead=5), [])
+        with connection.cursor() as cursor:
+            months = [month for _, month in list_partitions(cursor, self.table)]
+        current = month_start(timezone.now())
+        self.assertTrue(set(add_months(current, offset) for offset in range(6)) <= set(months))
+        self.assertTrue(all(name.startswith(f"{self.table}_p") for name in created))
+
+    def test_expired_partition_is_archived_and_dropped(self):
+        execution = WorkflowExecution.objects.create(state=ExecutionState.COMPLETE, status=Status.SUCCESS,
+                                                     workflow_data={"saved_template_id": 1})
+        # Lands in the default partition, then moves when its month's partition is created
+        WorkflowExecution.objects.filter(id=execution.id).update(start_time=datetime(2020, 1, 15, tzinfo=dt_timezone.utc))
+        with connection.cursor() as cursor:
+            create_partition(cursor, self.table, "start_time", date(2020, 1, 1))
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            archived = archive_partitions(self.table, retention_months=12, archive_dir=archive_dir)
+
+            self.assertEqual(len(archived), 1)
+            path, rows = archived[0]
+            with gzip.open(path, "rt") as file:
+                lines = [json.loads(line) for line in file]
+        self.assertEqual((rows, lines[0]["id"]), (1, execution.id))
+        self.assertFalse(WorkflowExecution.objects.filter(id=execution.id).exists())
+
+
+@patch("core.db_router.replica_configured", return_value=True)
+class PrimaryReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def read_in_thread(self, key=None, write_first=False):
+        # Every thread starts without the pin left by earlier writes
+        result = []
+
+        def read():
+            if write_first:
+                self.router.db_for_write(WorkflowExecution)
+            with read_replica(key):
+                result.append(self.router.db_for_read(WorkflowExecution))
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        return result[0]
+
+    def test_only_reads_in_replica_scope_go_to_replica(self, _):
+        self.assertEqual(self.read_in_thread(), "replica")
+        self.assertIsNone(self.router.db_for_read(WorkflowExecution))
+
+    def test_reads_after_a_write_stay_on_primary(self, _):
+        self.assertIsNone(self.read_in_thread(write_first=True))
+
+    def test_replica_is_never_migrated(self, _):
+        self.assertFalse(self.router.allow_migrate("replica", "core"))
+        self.assertIsNone(self.router.allow_migrate("default", "core"))
+
+
+@patch("core.db_router.replica_configured", return_value=True)
+class ReplicaPinTestCase(TransactionTestCase):
+    def read_in_thread(self, key):
+        # Another thread reads through its own connection, as another process would
+        result = []
+
+        def read():
+            try:
+                with read_replica(key):
+                    result.append(PrimaryReplicaRouter().db_for_read(WorkflowExecution))
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        return result[0]
+
+    def test_pinned_key_reads_from_primary_everywhere(self, _):
+        pin_to_primary("pinned-shop")
+
+        self.assertIsNone(self.read_in_thread("pinned-shop"))
+        self.assertEqual(self.read_in_thread("other-shop"), "replica")
+
+    def test_pin_expires(self, _):
+        pin_to_primary("pinned-shop", seconds=0)
+
+        self.assertEqual(self.read_in_thread("pinned-shop"), "replica")
+
+
+class ExecutionRepositoryTestCase(TestCase):
+    def test_bulk_save_and_iter_chunks(self):
+        saved = ExecutionRepository.bulk_save(
+            (WorkflowExecution(state=ExecutionState.NEW, status=Status.PENDING, workflow_data={"n": n})
+             for n in range(5)), chunk_size=2)
+
+        chunks = list(ExecutionRepository.iter_chunks(
+            WorkflowExecution.objects.order_by("id").values_list("workflow_data", flat=True), chunk_size=2))
+        self.assertEqual(saved, 5)
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual([data["n"] for chunk in chunks for data in chunk], [0, 1, 2, 3, 4])
+
+    def test_queue_depths_can_be_capped(self):
+        later = timezone.now() + timedelta(hours=1)
+        ExecutionRepository.bulk_save(
+            WorkflowExecution(state=state, status=Status.PENDING, shop_domain=shop, next_run_at=next_run_at,
+                              workflow_data={})
+            for shop, state, next_run_at in [("a", ExecutionState.NEW, None)] * 5
+            + [("b", ExecutionState.RETRY, None), ("b", ExecutionState.PAUSE, later), ("c", ExecutionState.COMPLETE, None)]
+            + [(None, ExecutionState.NEW, None)] * 2)
+
+        exact = ExecutionRepository.queue_depths()
+        capped = ExecutionRepository.queue_depths(cap=3)
+        self.assertEqual({shop: depth for shop, (depth, _) in exact.items()}, {"a": 5, "b": 1, None: 2})
+        self.assertEqual({shop: depth for shop, (depth, _) in capped.items()}, {"a": 3, "b": 1, None: 2})
+        self.assertEqual(capped["b"][1], exact["b"][1])
+
+
+class ClaimBatchTestCase(TransactionTestCase):
+    def test_claims_skip_rows_locked_by_another_worker(self):
+        ExecutionRepository.bulk_save(WorkflowExecution(state=ExecutionState.NEW, status=Status.PENDING,
+                                                        workflow_data={}) for _ in range(4))
+        new = WorkflowExecution.objects.filter(state=ExecutionState.NEW).order_by("id")
+        claimed_elsewhere = []
+
+        def other_worker():
+            try:
+                claimed_elsewhere.extend(ExecutionRepository.claim_batch(new, 10, state=ExecutionState.IN_PROGRESS))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            held = list(new.select_for_update()[:2])
+            thread = threading.Thread(target=other_worker)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(len(claimed_elsewhere), 2)
+        self.assertFalse({obj.id for obj in held} & {obj.id for obj in claimed_elsewhere})
+        self.assertEqual(WorkflowExecution.objects.filter(state=ExecutionState.IN_PROGRESS).count(), 2)
+
+
+class StageTimersTestCase(SimpleTestCase):
+    def test_stage_durations_are_summarised(self):
+        timers = StageTimers()
+        for _ in range(99):
+            timers.record("decode", 0.001)
+        timers.record("decode", 0.5)
+        with timers.time("ack"):
+            pass
+
+        snapshot = timers.snapshot()
+        self.assertEqual(list(snapshot), ["ack", "decode"])
+        self.assertEqual(snapshot["decode"]["count"], 100)
+        self.assertLessEqual(snapshot["decode"]["p50_ms"], 1.6)
+        self.assertEqual(snapshot["decode"]["max_ms"], 500.0)
+
+
+class SamplingProfilerTestCase(SimpleTestCase):
+    def test_profile_is_written_after_armed_messages(self):
+        stop = threading.Event()
+
+        def busy_worker():
+            while not stop.is_set():
+                sum(range(1000))
+
+        worker = threading.Thread(target=busy_worker, name="workflow-test")
+        worker.start()
+        self.addCleanup(worker.join)
+        self.addCleanup(stop.set)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            profiler = SamplingProfiler(output_dir, interval=0.001, thread_prefixes=("workflow",))
+            profiler.arm(2)
+            time.sleep(0.05)
+            profiler.message_done()
+            profiler.message_done()
+            path = profiler.wait(timeout=5)
+
+            with open(path) as file:
+                stacks = file.read()
+        self.assertIn("busy_worker", stacks)
+        self.assertFalse(profiler.armed)
+
+
+class StructuredLoggingTestCase(SimpleTestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.handler = BackgroundHandler(self.stream, max_queue=100)
+        self.handler.setFormatter(JsonFormatter())
+        self.handler.addFilter(ContextFilter())
+        self.logger = logging.getLogger("core.tests.structured")
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+        self.addCleanup(self.handler.close)
+
+    def entries(self):
+        self.handler.flush()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_records_carry_correlation_ids_and_omit_payloads(self):
+        with log_context(order_id=1007, shop="hephytest"):
+            self.logger.warning("Order %s received", "#1007", extra={"payload": {"secret": "x"}})
+
+        [entry] = self.entries()
+        self.assertEqual(entry["message"], "Order #1007 received")
+        self.assertEqual((entry["order_id"], entry["shop"], entry["payload"]), (1007, "hephytest", "<omitted>"))
+
+    def test_records_are_dropped_instead_of_blocking_when_queue_is_full(self):
+        handler = BackgroundHandler(io.StringIO(), max_queue=1)
+        self.addCleanup(handler.close)
+        blocked = threading.Event()
+        handler.format = lambda record: blocked.wait(5) and ""
+
+        for _ in range(10):
+            handler.emit(logging.LogRecord("x", logging.INFO, "", 0, "message", None, None))
+
+        self.assertGreater(handler.dropped, 0)
+        blocked.set()
+
+    def test_bad_log_call_does_not_raise_in_caller(self):
+        with patch.object(self.handler, "handleError") as handle_error:
+            self.logger.warning("a %s %s", 1)
+
+        handle_error.assert_called_once()
+        self.logger.warning("still logging")
+        self.assertEqual([entry["message"] for entry in self.entries()], ["still logging"])
+
+
+class TracingTestCase(SimpleTestCase):
+    def setUp(self):
+        patcher = patch.object(tracer, "sample_rate", 1.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tracer.clear()
+        self.addCleanup(tracer.clear)
+
+    def test_spans_link_to_their_parent_across_pool_threads(self):
+        executor = BoundedExecutor(max_workers=2, max_per_key=2)
+        self.addCleanup(executor.shutdown)
+
+        def child():
+            with span("child"):
+                pass
+
+        with span("root", order_id=1007) as root:
+            executor.run_all("hephytest", [child, child], timeout=5)
+
+        spans = tracer.recent(root.trace_id)
+        self.assertEqual([s.name for s in spans], ["root", "child", "child"])
+        self.assertEqual({s.parent_id for s in spans[1:]}, {root.span_id})
+        self.assertGreaterEqual(root.duration_ms, max(s.duration_ms for s in spans[1:]))
+
+    def test_unsampled_traces_are_not_recorded(self):
+        with patch.object(tracer, "sample_rate", 0.0):
+            with span("root"), span("child"):
+                pass
+
+        self.assertEqual(tracer.recent(), [])
+
+    def test_exporter_appends_otlp_json(self):
+        with tempfile.TemporaryDirectory() as directory:
+            exporter = SpanExporter(interval=60, name="test-span-exporter", path=f"{directory}/spans.jsonl")
+            with patch.object(tracer, "exporter", exporter):
+                with self.assertRaises(ValueError), span("root"):
+                    raise ValueError("boom")
+            exporter.stop()
+
+            with open(f"{directory}/spans.jsonl") as file:
+                [request] = [json.loads(line) for line in file]
+        [exported] = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual((exported["name"], exported["status"]), ("root", {"code": 2, "message": "ValueError: boom"}))
+
+
+class LazyImportTestCase(SimpleTestCase):
+    def test_task_modules_are_declared_and_loaded_on_first_use(self):
+        self.assertIn("cross_sell.task_provider", TaskRegistry._modules)
+        self.assertIn("condition", TaskRegistry.get_registered_types())
+
+    def test_subscriber_imports_neither_pubsub_nor_task_handlers(self):
+        modules = measure("cross_sell.management.commands.subscriber")["modules"]
+
+        self.assertIn("cross_sell.processor", modules)
+        self.assertNotIn("google.cloud.pubsub_v1", modules)
+        self.assertNotIn("cross_sell.task_provider", modules)
+
+
+class DeficitRoundRobinTestCase(SimpleTestCase):
+    def test_backlog_does_not_take_more_than_its_share(self):
+        scheduler = DeficitRoundRobin()
+
+        self.assertEqual(scheduler.allocate({"big": 1000, "small": 3}, {}, slots=4), {"big": 2, "small": 2})
+        self.assertEqual(scheduler.allocate({"big": 998, "small": 1}, {}, slots=4), {"big": 3, "small": 1})
+
+    def test_slots_follow_the_weights(self):
+        scheduler = DeficitRoundRobin()
+        totals = {"big": 0, "small": 0}
+        for _ in range(4):
+            for shop, count in scheduler.allocate({"big": 100, "small": 100}, {"big": 3}, slots=4).items():
+                totals[shop] += count
+
+        self.assertEqual(totals, {"big": 12, "small": 4})
+
+    def test_idle_queues_do_not_bank_credit(self):
+        scheduler = DeficitRoundRobin()
+        scheduler.allocate({"big": 5, "small": 1}, {"small": 10}, slots=2)
+
+        self.assertEqual(scheduler.deficit("small"), 0)
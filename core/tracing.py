@@ -0,0 +1,210 @@
+# core/tracing.py
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from core.batch_flusher import BatchFlusher
+from core.log import log_context
+from hephestos.settings import (TRACE_SAMPLE_RATE, TRACE_BUFFER_SIZE, TRACE_EXPORT_FILE, TRACE_EXPORT_ENDPOINT,
+                                TRACE_EXPORT_INTERVAL)
+
+SERVICE_NAME = "hephestos"
+
+
+class Span:
+    """
+    One timed operation of a trace. Spans of a trace share its trace_id and point to the span
+    they ran in through parent_id. Spans of unsampled traces are never recorded.
+    """
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error", "sampled")
+
+    def __init__(self, name: str, parent: Optional["Span"], sampled: bool, attributes: Dict[str, Any]):
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.sampled = sampled
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def otlp_request(spans: List[Span]) -> Dict[str, Any]:
+    """Spans as an OTLP/JSON ExportTraceServiceRequest."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+    }]}
+
+
+class SpanExporter(BatchFlusher):
+    """
+    Exports finished spans every `interval` seconds, as one OTLP/JSON request per line appended to
+    `path` (the format of the OpenTelemetry collector file exporter) and/or POSTed to the OTLP/HTTP
+    `endpoint` (e.g. http://localhost:4318/v1/traces).
+    """
+    uses_database = False
+
+    def __init__(self, interval: float, name: str, path: str = "", endpoint: str = "", max_pending: int = 10000):
+        super().__init__(interval, name)
+        self.path = path
+        self.endpoint = endpoint
+        self.max_pending = max_pending
+
+    def _empty(self) -> List[Span]:
+        return []
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            if len(self._pending) < self.max_pending:
+                self._pending.append(span)
+
+    def _merge(self, pending: List[Span]) -> None:
+        # Keep the newest spans when the target stays unavailable
+        self._pending = (pending + self._pending)[-self.max_pending:]
+
+    def _write(self, pending: List[Span]) -> None:
+        body = json.dumps(otlp_request(pending), separators=(",", ":"))
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(body + "\n")
+        if self.endpoint:
+            import urllib.request  # Only exporters posting to an endpoint need it
+
+            request = urllib.request.Request(self.endpoint, data=body.encode("utf-8"), method="POST",
+                                             headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=10):
+                pass
+
+
+class Tracer:
+    """
+    Records the spans of sampled traces into a bounded in-memory ring of the most recent ones,
+    and hands them to `exporter` if there is one.
+
+    The sampling decision is made once per trace, at its root span, so a sampled order has its
+    whole timeline.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, buffer_size: int = 10000, exporter: Optional[SpanExporter] = None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self._ring: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self._ring.append(span)
+        if self.exporter is not None:
+            self.exporter.add(span)
+
+    def recent(self, trace_id: Optional[str] = None) -> List[Span]:
+        """Spans in the ring, optionally of one trace only, ordered by start time."""
+        with self._lock:
+            spans = list(self._ring)
+        if trace_id is not None:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return sorted(spans, key=lambda span: span.start_ns)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ring.clear()
+
+    def start(self) -> None:
+        if self.exporter is not None:
+            self.exporter.start()
+
+    def stop(self) -> None:
+        if self.exporter is not None:
+            self.exporter.stop()
+
+
+# Span the current thread or task is in. BoundedExecutor copies context into its workers,
+# so spans started by workflow threads become children of the span that submitted them.
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def bind_span(**attributes: Any) -> None:
+    """Add attributes to the current span, if there is one, e.g. once they are parsed."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """
+    Time the block as a span, a child of the current span or the root of a new trace.
+
+    Root spans add their trace_id to the log context, so log records can be matched to traces.
+    """
+    parent = _current_span.get()
+    sampled = parent.sampled if parent else tracer.sample_rate >= 1 or random.random() < tracer.sample_rate
+    current = Span(name, parent, sampled, attributes)
+    token = _current_span.set(current)
+    try:
+        if parent is None and sampled:
+            with log_context(trace_id=current.trace_id):
+                yield current
+        else:
+            yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        if sampled:
+            tracer.record(current)
+
+
+def _build_exporter() -> Optional[SpanExporter]:
+    if not (TRACE_EXPORT_FILE or TRACE_EXPORT_ENDPOINT):
+        return None
+    return SpanExporter(TRACE_EXPORT_INTERVAL, "span-exporter", path=TRACE_EXPORT_FILE, endpoint=TRACE_EXPORT_ENDPOINT)
+
+
+tracer = Tracer(sample_rate=TRACE_SAMPLE_RATE, buffer_size=TRACE_BUFFER_SIZE, exporter=_build_exporter())
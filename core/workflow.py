@@ -0,0 +1,191 @@
+# core/workflow.py
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+
+from .context_binder import ContextBinder, RuntimeData, condition_bindings, get_binder
+from .models import TaskType
+from .task_registry import TaskRegistry
+from .template_renderer import compile_properties
+
+# Version of the compiled form stored in SavedTemplate.compiled_workflow, bumped when its layout changes
+COMPILED_VERSION = 1
+
+
+class WorkflowValidationError(ValidationError):
+    """Raised when a workflow definition cannot run. `messages` lists every problem found."""
+
+
+@dataclass(frozen=True)
+class WorkflowPlan:
+    """
+    Compiled, read-only form of a workflow definition.
+    Plans are built once per workflow and shared between executions, so they must not be mutated.
+    """
+    trigger: Optional[str]
+    tasks: Dict[str, Dict[str, Any]]
+    binders: Dict[str, ContextBinder] = field(default_factory=dict)
+    renderers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = field(default_factory=dict)
+    # Task ids in topological order, from the trigger, when the workflow was validated
+    order: Tuple[str, ...] = ()
+    # Validated at save time (see validate_workflow), the executor only validates templated tasks again
+    validated: bool = False
+
+    @property
+    def trigger_task(self) -> Optional[Dict[str, Any]]:
+        return self.tasks.get(self.trigger)
+
+    def properties_for(self, task_id: str, data: Optional[RuntimeData] = None) -> Dict[str, Any]:
+        """
+        Get the properties a task is executed with.
+
+        Template strings ("{{customer.email}}") are rendered against the runtime data and condition
+        tasks get their bound fields layered over the static "context" of the definition.
+        """
+        properties = self.tasks[task_id].get("properties", {})
+        if data is None:
+            return properties
+        renderer = self.renderers.get(task_id)
+        if renderer is not None:
+            properties = renderer(data.data)
+        binder = self.binders.get(task_id)
+        if binder is not None:
+            properties = {**properties, "context": {**properties.get("context", {}), **data.bind(binder)}}
+        return properties
+
+
+def _is_valid(task_type: str, properties: Dict[str, Any]) -> bool:
+    try:
+        return TaskRegistry.validate_task(task_type, properties)
+    except Exception:
+        # Validators index into properties, malformed ones make them raise
+        return False
+
+
+def _topological_order(tasks: Dict[str, Dict[str, Any]], trigger: str) -> Tuple[List[str], List[str]]:
+    """
+    Depth-first walk of the `next` edges from the trigger.
+
+    Returns:
+        The reachable task ids in topological order, and the cycles found as "a -> b -> a" paths
+    """
+    visiting, done, post_order, cycles = [], set(), [], []
+    # Iterative, so a long chain of tasks cannot hit the recursion limit
+    stack = [(trigger, iter(tasks[trigger].get("next") or []))]
+    visiting.append(trigger)
+    while stack:
+        task_id, edges = stack[-1]
+        next_id = next(edges, None)
+        if next_id is None:
+            stack.pop()
+            visiting.pop()
+            done.add(task_id)
+            post_order.append(task_id)
+        elif next_id in visiting:
+            cycles.append(" -> ".join(visiting[visiting.index(next_id):] + [next_id]))
+        elif next_id not in done:
+            visiting.append(next_id)
+            stack.append((next_id, iter(tasks[next_id].get("next") or [])))
+    return post_order[::-1], cycles
+
+
+def validate_workflow(workflow: Dict[str, Any]) -> List[str]:
+    """
+    Statically check a workflow definition: the trigger exists, every task has a registered type
+    and properties its TaskRegistry validator accepts, every `next` id exists, and the tasks form
+    an acyclic graph in which every task is reachable from the trigger.
+
+    Properties holding template strings ("{{order.name}}") are not checked here, their values are
+    only known once rendered: the executor validates them when the task runs.
+
+    Returns:
+        Task ids in topological order, starting with the trigger
+
+    Raises:
+        WorkflowValidationError: Listing every problem found
+    """
+    tasks = workflow.get("tasks") if isinstance(workflow, dict) else None
+    if not isinstance(tasks, dict) or not tasks:
+        raise WorkflowValidationError(["Workflow has no tasks"])
+
+    errors = []
+    trigger = workflow.get("trigger")
+    if not trigger:
+        errors.append("No trigger task specified")
+    elif trigger not in tasks:
+        errors.append(f"Trigger task {trigger} not found")
+
+    registered = set(TaskRegistry.get_registered_types())
+    for task_id, task_data in tasks.items():
+        if not isinstance(task_data, dict):
+            errors.append(f"Task {task_id} is not an object")
+            continue
+        task_type = task_data.get("type")
+        if task_type not in registered:
+            errors.append(f"Task {task_id} has unknown type {task_type!r}")
+        elif compile_properties(task_data.get("properties")) is None \
+                and not _is_valid(task_type, task_data.get("properties") or {}):
+            errors.append(f"Invalid properties for task {task_id} of type {task_type}")
+        for next_id in task_data.get("next") or []:
+            if next_id not in tasks:
+                errors.append(f"Task {task_id} points to missing task {next_id}")
+    if errors:
+        raise WorkflowValidationError(errors)
+
+    order, cycles = _topological_order(tasks, trigger)
+    errors.extend(f"Cycle: {cycle}" for cycle in cycles)
+    reachable = set(order)
+    errors.extend(f"Task {task_id} is unreachable from the trigger" for task_id in tasks if task_id not in reachable)
+    if errors:
+        raise WorkflowValidationError(errors)
+    return order
+
+
+def compiled_form(workflow: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a workflow definition and return the form stored in SavedTemplate.compiled_workflow:
+    the tasks in topological order, stripped of anything but their id, type, properties and next.
+
+    Raises:
+        WorkflowValidationError: If the workflow is invalid
+    """
+    order = validate_workflow(workflow)
+    tasks = workflow["tasks"]
+    return {
+        "version": COMPILED_VERSION,
+        "trigger": workflow["trigger"],
+        "order": order,
+        "tasks": {task_id: {"id": task_id,
+                            "type": tasks[task_id]["type"],
+                            "properties": tasks[task_id].get("properties") or {},
+                            "next": list(tasks[task_id].get("next") or [])}
+                  for task_id in order},
+    }
+
+
+def compile_workflow(workflow: Dict[str, Any], validated: bool = False) -> WorkflowPlan:
+    """
+    Compile a workflow definition (as stored in SavedTemplate.workflow_json) into a WorkflowPlan.
+
+    Args:
+        workflow: Workflow definition containing trigger and tasks, or its compiled form
+        validated: The workflow is a compiled form, already checked by validate_workflow
+
+    Returns:
+        The compiled WorkflowPlan
+    """
+    tasks = dict(workflow.get("tasks", {}))
+    binders = {}
+    renderers = {}
+    for task_id, task_data in tasks.items():
+        properties = task_data.get("properties", {})
+        if task_data.get("type") == TaskType.CONDITION:
+            bindings = condition_bindings(properties)
+            if bindings:
+                binders[task_id] = get_binder(bindings)
+        renderer = compile_properties(properties)
+        if renderer is not None:
+            renderers[task_id] = renderer
+    return WorkflowPlan(trigger=workflow.get("trigger"), tasks=tasks, binders=binders, renderers=renderers,
+                        order=tuple(workflow.get("order", ())) if validated else (), validated=validated)
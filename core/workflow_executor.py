@@ -1,23 +1,30 @@
 # core/workflow_executor.py
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Union
+from .context_binder import RuntimeData
 from .task_registry import TaskRegistry
 from .task_handler import TaskHandler
 from .task_node import TaskNode
+from .tracing import span
+from .workflow import WorkflowPlan, compile_workflow
 
 
-def execute_workflow(workflow: Dict[str, Any]) -> Dict[str, Any]:
+def execute_workflow(workflow: Union[Dict[str, Any], WorkflowPlan],
+                     data: Optional[RuntimeData] = None,
+                     start_task: Optional[str] = None) -> Dict[str, Any]:
     """
     Standalone function to execute a workflow.
     Creates a WorkflowExecutor instance and executes the workflow.
     
     Args:
-        workflow: Workflow definition containing tasks
+        workflow: Workflow definition containing tasks, or its compiled WorkflowPlan
+        data: Runtime data (order, customer, shop) the tasks are bound to
+        start_task: Task to resume a deferred execution from, defaults to the trigger
         
     Returns:
         Dict containing execution results and status
     """
     executor = WorkflowExecutor()
-    return executor.execute_workflow(workflow)
+    return executor.execute_workflow(workflow, data, start_task)
 
 
 class WorkflowExecutor:
@@ -29,28 +36,36 @@ class WorkflowExecutor:
         self.task_handler = TaskHandler()
         self.execution_history: Dict[str, Any] = {}
 
-    def execute_workflow(self, workflow: Dict[str, Any]) -> Dict[str, Any]:
+    def execute_workflow(self, workflow: Union[Dict[str, Any], WorkflowPlan],
+                         data: Optional[RuntimeData] = None,
+                         start_task: Optional[str] = None) -> Dict[str, Any]:
         """
         Execute a complete workflow.
         
         Args:
-            workflow: Workflow definition containing tasks
+            workflow: Workflow definition containing tasks, or its compiled WorkflowPlan
+            data: Runtime data (order, customer, shop) the tasks are bound to
+            start_task: Task to resume a deferred execution from, defaults to the trigger
             
         Returns:
-            Dict containing execution results and status
+            Dict containing execution results and status. When a task is rate limited the
+            status is "deferred", with the task to resume from and the seconds to wait.
         """
         try:
+            plan = workflow if isinstance(workflow, WorkflowPlan) else compile_workflow(workflow)
+
             # Convert workflow tasks to TaskNode objects
             tasks = {
-                task_id: TaskNode.from_dict(task_data)
-                for task_id, task_data in workflow.get("tasks", {}).items()
+                task_id: TaskNode.from_dict({**task_data, "properties": plan.properties_for(task_id, data)})
+                for task_id, task_data in plan.tasks.items()
             }
             
             # Start with the trigger task
-            current_task_id = workflow.get("trigger")
+            current_task_id = start_task or plan.trigger
             if not current_task_id:
                 raise ValueError("No trigger task specified in workflow")
                 
+            shop = data.resolve("shop.domain") if data is not None else None
             execution_path = []
             
             while current_task_id:
@@ -61,7 +76,22 @@ class WorkflowExecutor:
                 execution_path.append(current_task_id)
                 
                 # Execute the current task using TaskHandler
-                result = self.task_handler.execute_task(task)
+                with span(f"task {task.type}", task_id=current_task_id) as task_span:
+                    # Templated properties were not validated at save time, only their rendered values can be
+                    result = self.task_handler.execute_task(
+                        task, shop, validate=not plan.validated or current_task_id in plan.renderers)
+                    task_span.set(status=result.get("status"))
+
+                if result.get("status") == "deferred":
+                    task.status = "deferred"
+                    task.result = result
+                    return {
+                        "status": "deferred",
+                        "resume_task": current_task_id,
+                        "retry_after": result["retry_after"],
+                        "execution_path": execution_path,
+                        "tasks": {task_id: task.to_dict() for task_id, task in tasks.items()}
+                    }
                 
                 # Update task status and result
                 task.status = "completed" if result.get("status") != "failed" else "failed"
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CrossSellConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cross_sell'
+    # Modules registering workflow task handlers, see TaskRegistry
+    task_modules = ['cross_sell.task_provider']
+
+    def ready(self):
+        # Connect signal receivers
+        from cross_sell import signals  # noqa: F401
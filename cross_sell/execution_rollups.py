@@ -0,0 +1,77 @@
+# cross_sell/execution_rollups.py
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from django.db import connection
+
+from core.batch_flusher import BatchFlusher
+from core.metrics import BUCKET_BOUNDS, bucket_index
+from cross_sell.models import ExecutionRollup
+from hephestos.settings import EXECUTION_ROLLUP_FLUSH_INTERVAL
+
+# (saved_template_id, hour) -> [template_id, shop_domain, completed, failed, deferred, duration_total, buckets]
+Pending = Dict[Tuple[int, datetime], list]
+
+STATUS_COLUMNS = {"completed": 2, "failed": 3, "deferred": 4}
+
+
+def hour_of(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class ExecutionRollups(BatchFlusher):
+    """
+    Aggregates workflow executions per saved template and hour in memory and upserts them into
+    cross_sell_execution_rollup with one INSERT ... ON CONFLICT per interval. Latency is kept as
+    counts per histogram bucket, which add up across rows for any time range.
+    """
+
+    def _empty(self) -> Pending:
+        return {}
+
+    def record(self, saved_template_id: int, template_id: int, shop_domain: str, status: str,
+               seconds: float, executed_at: datetime) -> None:
+        """Count one execution. `status` is "completed", "failed" or "deferred"."""
+        buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        buckets[bucket_index(seconds)] = 1
+        row = [template_id, shop_domain, 0, 0, 0, seconds, buckets]
+        row[STATUS_COLUMNS.get(status, STATUS_COLUMNS["failed"])] = 1
+        with self._lock:
+            self._add((saved_template_id, hour_of(executed_at)), row)
+
+    def _add(self, key: Tuple[int, datetime], row: list) -> None:
+        current = self._pending.get(key)
+        if current is None:
+            self._pending[key] = row
+            return
+        for column in (2, 3, 4, 5):
+            current[column] += row[column]
+        current[6] = [a + b for a, b in zip(current[6], row[6])]
+
+    def _merge(self, pending: Pending) -> None:
+        for key, row in pending.items():
+            self._add(key, row)
+
+    def _write(self, pending: Pending) -> None:
+        table = ExecutionRollup._meta.db_table
+        values = ", ".join(["(%s::bigint, %s::timestamptz, %s::bigint, %s, %s::integer, %s::integer, "
+                            "%s::integer, %s::double precision, %s::integer[])"] * len(pending))
+        params: List = [param
+                        for (saved_template_id, hour), row in pending.items()
+                        for param in (saved_template_id, hour, *row)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} AS t (saved_template_id, hour, template_id, shop_domain, completed, failed, "
+                f"deferred, duration_total, latency_buckets) VALUES {values} "
+                f"ON CONFLICT (saved_template_id, hour) DO UPDATE SET "
+                f"completed = t.completed + EXCLUDED.completed, "
+                f"failed = t.failed + EXCLUDED.failed, "
+                f"deferred = t.deferred + EXCLUDED.deferred, "
+                f"duration_total = t.duration_total + EXCLUDED.duration_total, "
+                f"latency_buckets = (SELECT array_agg(a + b ORDER BY i) "
+                f"FROM unnest(t.latency_buckets, EXCLUDED.latency_buckets) WITH ORDINALITY AS u(a, b, i))",
+                params,
+            )
+
+
+execution_rollups = ExecutionRollups(interval=EXECUTION_ROLLUP_FLUSH_INTERVAL, name="execution-rollups")
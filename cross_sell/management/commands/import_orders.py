@@ -0,0 +1,151 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.repository.shopify_repository import ShopRepository, OrderRepository
+from shopify.models import Order, Shop
+from shopify.processor import parse_shop_url
+
+
+def parse_orders(lines):
+    """
+    Parse a batch of raw JSONL lines into order rows.
+
+    Runs inside the worker pool, so it only deals with plain python objects.
+    A line is either a single order payload (same shape as the orders/create webhook)
+    or a page of the Shopify REST export: {"orders": [...]}.
+
+    Returns:
+        Tuple of (rows, skipped) where each row is (shop_domain, shop_id, order_fields)
+    """
+    rows = []
+    skipped = 0
+    for line in lines:
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            skipped += 1
+            continue
+        payloads = data.get("orders", []) if "orders" in data else [data]
+        for payload in payloads:
+            shop_url = payload.get("order_status_url")
+            if payload.get("id") is None or not shop_url:
+                skipped += 1
+                continue
+            try:
+                shop_domain, shop_id = parse_shop_url(shop_url)
+            except IndexError:
+                skipped += 1
+                continue
+            rows.append((shop_domain, shop_id, {
+                "name": payload.get("name"),
+                "order_id": payload.get("id"),
+                "total_price": payload.get("current_total_price"),
+                "app_id": payload.get("app_id"),
+                "customer_email": payload.get("email"),
+                "payload": payload,
+            }))
+    return rows, skipped
+
+
+def read_batches(stream, batch_size):
+    """
+    Yield (end_offset, lines) for consecutive batches of non-empty lines.
+
+    `end_offset` is the byte offset right after the last line of the batch, which is
+    a safe point to resume the import from.
+    """
+    lines = []
+    offset = stream.tell()
+    for line in stream:
+        offset += len(line)
+        if line.strip():
+            lines.append(line)
+        if len(lines) >= batch_size:
+            yield offset, lines
+            lines = []
+    if lines:
+        yield offset, lines
+
+
+class Command(BaseCommand):
+    # Orders are bulk inserted and never go through cross_sell.processor, so importing history
+    # triggers no workflows and needs no coordination with a running subscriber
+    help = 'Stream historical orders from a JSONL export into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL file with one order (or {"orders": [...]} page) per line')
+        parser.add_argument('--offset', type=int, default=0,
+                            help='Byte offset to resume from, as printed by a previous run')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of lines parsed and written per batch')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Number of parser processes, 0 parses in the main process')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        workers = options['workers']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        self.known_shops = {domain for chunk in ShopRepository.iter_chunks(Shop.objects.values_list('domain', flat=True))
+                            for domain in chunk}
+        self.processed = 0
+        self.skipped = 0
+        self.offset = options['offset']
+
+        with open(path, 'rb') as stream:
+            stream.seek(self.offset)
+            batches = read_batches(stream, batch_size)
+            try:
+                if workers > 0:
+                    self._import_parallel(batches, workers)
+                else:
+                    for end_offset, lines in batches:
+                        self._write(end_offset, parse_orders(lines))
+            except KeyboardInterrupt:
+                raise CommandError(f'Import interrupted, resume with --offset {self.offset}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {self.processed} orders (already imported ones are left as they are), '
+            f'skipped {self.skipped} invalid, offset {self.offset}'))
+
+    def _import_parallel(self, batches, workers):
+        # Only a bounded number of batches is in flight, so memory stays flat regardless of the file
+        # size. Results are written in file order, which keeps the reported offset safe to resume from.
+        max_pending = workers * 2
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for end_offset, lines in batches:
+                pending.append((end_offset, pool.submit(parse_orders, lines)))
+                if len(pending) >= max_pending:
+                    end, future = pending.popleft()
+                    self._write(end, future.result())
+            while pending:
+                end, future = pending.popleft()
+                self._write(end, future.result())
+
+    def _write(self, end_offset, parsed):
+        rows, skipped = parsed
+        new_shops = {}
+        orders = []
+        for shop_domain, shop_id, fields in rows:
+            if shop_domain not in self.known_shops:
+                new_shops.setdefault(shop_domain, Shop(shop_id=shop_id, domain=shop_domain))
+            orders.append(Order(domain_id=shop_domain, **fields))
+
+        with transaction.atomic():
+            if new_shops:
+                ShopRepository.bulk_save(new_shops.values())
+            OrderRepository.bulk_save(orders)
+
+        self.known_shops.update(new_shops)
+        self.processed += len(orders)
+        self.skipped += skipped
+        self.offset = end_offset
+        self.stdout.write(f'offset {end_offset}: {self.processed} orders processed')
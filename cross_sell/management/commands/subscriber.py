@@ -1,86 +1,154 @@
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 import json
+import logging
+import signal
 
 from django.core.management.base import BaseCommand
-from google.cloud import pubsub_v1
-from google.api_core.exceptions import GoogleAPIError
 
+from core.db import db_connection
+from core.db_router import pin_to_primary
+from core.log import log_context, bind_log_context
+from core.metrics import pipeline_timers
+from core.profiling import SamplingProfiler
+from core.tracing import bind_span, span, tracer
 from cross_sell.processor import process
+from cross_sell.execution_rollups import execution_rollups
+from cross_sell.template_stats import template_stats
 from hephestos.settings import GOOGLE_SUBSCRIPTION_ID
 from hephestos.settings import GOOGLE_PROJECT_ID
+from hephestos.settings import SUBSCRIBER_MAX_MESSAGES, SUBSCRIBER_THREADS
+from hephestos.settings import PROFILE_DIR, PROFILE_INTERVAL, PROFILE_MESSAGES
 from cross_sell.models import WebhookEvents, ShopifyEventType
-from shopify.processor import extract_shopify_data
+from shopify.processor import extract_shopify_data, parse_shop_url
 
+logger = logging.getLogger(__name__)
 
+# kill -USR2 <pid> profiles the next PROFILE_MESSAGES messages, kill -USR1 <pid> prints stage timings
+profiler = SamplingProfiler(PROFILE_DIR, interval=PROFILE_INTERVAL, thread_prefixes=("subscriber", "workflow"))
+
+
+@db_connection()
 def callback(message):
+    try:
+        # Scope for the correlation ids bound while the message is handled
+        with log_context(), pipeline_timers.time("total"), span("pubsub.message"):
+            handle_message(message)
+    finally:
+        profiler.message_done()
+
+
+def handle_message(message):
     try:
         # Process the message
         try:
-            print(f'[{datetime.now(timezone.utc)}] Received message: {message.data.decode("utf-8")}')
-            order_create_payload = json.loads(message.data.decode("utf-8"))
+            logger.debug("Received message", extra={"bytes": len(message.data)})
+            with pipeline_timers.time("decode"):
+                order_create_payload = json.loads(message.data.decode("utf-8"))
             order_id = order_create_payload.get("id")
             created_at = order_create_payload.get("created_at")
-
-            print(f"[{datetime.now(timezone.utc)}] order_id: {order_id}, created_at: {created_at}")
+            bind_log_context(order_id=order_id)
+            bind_span(order_id=order_id)
 
             if order_id is not None and created_at is not None:
-                is_duplicate = WebhookEvents.objects.filter(order_id=order_id, created_at=created_at).exists()
-
-                print(f"[{datetime.now(timezone.utc)}] Is duplicate: {is_duplicate}")
+                with pipeline_timers.time("dedupe"):
+                    is_duplicate = WebhookEvents.objects.filter(order_id=order_id, created_at=created_at).exists()
 
                 if not is_duplicate:
                     shop_url = order_create_payload.get("order_status_url")
 
-                    print(f"[{datetime.now(timezone.utc)}] shop_url: {shop_url}")
-
                     try:
                         if shop_url:
-                            shop_domain = shop_url.split("//")[1].split(".")[0]
-                            shop_id = shop_url.split("//")[1].split("/")[1]
-
-                            print(f" [{datetime.now(timezone.utc)}] shop_domain: {shop_domain}, shop_id: {shop_id}")
+                            shop_domain, shop_id = parse_shop_url(shop_url)
+                            bind_log_context(shop=shop_domain)
 
+                            # Processed right here once acked, so it is stored as processed and the
+                            # webhook outbox consumer never picks it up
                             event = WebhookEvents(order_id=order_id,
                                                   created_at=created_at,
                                                   webhook_data=order_create_payload,
                                                   shop_domain=shop_domain,
-                                                  event_type=ShopifyEventType.ORDERS_CREATE)
-                            [shop, order] = extract_shopify_data(order_create_payload, shop_domain, shop_id)
-                            event.save()
-                            message.ack()
-                            process(order_create_payload, shop, order)
+                                                  event_type=ShopifyEventType.ORDERS_CREATE,
+                                                  processed=True)
+                            with pipeline_timers.time("upsert"), span("extract_shopify_data", shop=shop_domain):
+                                [shop, order] = extract_shopify_data(order_create_payload, shop_domain, shop_id)
+                            with pipeline_timers.time("save_event"):
+                                event.save()
+                            pin_to_primary(shop_domain)
+                            with pipeline_timers.time("ack"):
+                                message.ack()
+                            try:
+                                with pipeline_timers.time("process"), span("process"):
+                                    process(order_create_payload, shop, order)
+                            except Exception as e:
+                                WebhookEvents.objects.filter(pk=event.pk, created_at=event.created_at).update(
+                                    processing_error=str(e))
+                                raise
                     except IndexError as idx_error:
                         message.nack()
-                        print(f" [{datetime.now(timezone.utc)}] Error parsing shop URL: {idx_error}")
+                        logger.warning("Error parsing shop URL: %s", idx_error)
                 else:
-                    message.ack()
-                    print(f"[{datetime.now(timezone.utc)}] Duplicate order detected, skipping...")
+                    with pipeline_timers.time("ack"):
+                        message.ack()
+                    logger.info("Duplicate order detected, skipping")
         except (json.JSONDecodeError, KeyError):
             message.nack()
-            print(f"[{datetime.now(timezone.utc)}] Invalid JSON payload received")
+            logger.warning("Invalid JSON payload received")
             return False
     except Exception as ex:
         message.nack()
-        print(f'[{datetime.now(timezone.utc)}] Error processing message: {ex}')
+        logger.exception("Error processing message: %s", ex)
 
 
 class Command(BaseCommand):
     help = 'Subscribe to a Google Pub/Sub topic and handle message'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', type=int, default=0, metavar='N',
+                            help=f'Profile the first N messages, written to {PROFILE_DIR}')
+
     def handle(self, *args, **options):
+        # The Pub/Sub client takes longer to import than the rest of the subscriber, only load it
+        # when subscribing, not whenever the message handling is imported
+        from google.api_core.exceptions import GoogleAPIError
+        from google.cloud import pubsub_v1
+        from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
+
         subscription_id = GOOGLE_SUBSCRIPTION_ID
         project_id = GOOGLE_PROJECT_ID  # Replace with your project ID
 
         subscriber = pubsub_v1.SubscriberClient()
         subscription_path = subscriber.subscription_path(project_id, subscription_id)
-        streaming_pull_future = subscriber.subscribe(subscription_path, callback=callback)
-        print(f'Listening for messages on {subscription_path}...')
-
+        # Callback threads are capped so the database pool (DB_POOL_MAX_SIZE) always has a
+        # connection for each of them
+        streaming_pull_future = subscriber.subscribe(
+            subscription_path,
+            callback=callback,
+            flow_control=pubsub_v1.types.FlowControl(max_messages=SUBSCRIBER_MAX_MESSAGES),
+            scheduler=ThreadScheduler(ThreadPoolExecutor(max_workers=SUBSCRIBER_THREADS,
+                                                         thread_name_prefix="subscriber")),
+        )
+        logger.info("Listening for messages on %s", subscription_path)
+
+        # Stop pulling on SIGTERM (e.g. docker stop) so pending stats are flushed before exiting
+        signal.signal(signal.SIGTERM, lambda signum, frame: streaming_pull_future.cancel())
+        signal.signal(signal.SIGUSR1, lambda signum, frame: logger.warning("Stage timings", extra={"stages": pipeline_timers.snapshot()}))
+        signal.signal(signal.SIGUSR2, lambda signum, frame: profiler.arm(PROFILE_MESSAGES))
+        if options['profile']:
+            profiler.arm(options['profile'])
+
+        # Stats and spans are written in batches from background threads while the command runs
+        template_stats.start()
+        execution_rollups.start()
+        tracer.start()
         try:
             streaming_pull_future.result()
         except KeyboardInterrupt:
             streaming_pull_future.cancel()
-            print('Stopped listening due to Keyboard interrupt.')
+            logger.info("Stopped listening due to Keyboard interrupt")
         except GoogleAPIError as e:
-            print(f'Pub/Sub API error: {e}')
+            logger.error("Pub/Sub API error: %s", e)
+        finally:
+            template_stats.stop()
+            execution_rollups.stop()
+            tracer.stop()
 
@@ -0,0 +1,45 @@
+import logging
+import signal
+
+from django.core.management.base import BaseCommand
+
+from cross_sell.execution_rollups import execution_rollups
+from cross_sell.outbox import WebhookOutbox
+from cross_sell.template_stats import template_stats
+from core.tracing import tracer
+from hephestos.settings import WEBHOOK_OUTBOX_BATCH_SIZE, WEBHOOK_OUTBOX_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Process the orders received by the webhook view. Start more processes to scale out'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=WEBHOOK_OUTBOX_BATCH_SIZE,
+                            help='Most events to claim at once')
+        parser.add_argument('--poll-interval', type=float, default=WEBHOOK_OUTBOX_POLL_INTERVAL,
+                            help='Seconds to wait when there is nothing to claim')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once nothing is left to claim instead of polling')
+
+    def handle(self, *args, **options):
+        outbox = WebhookOutbox(batch_size=options['batch_size'])
+        # Finish the current batch on SIGTERM (e.g. docker stop). Events of a killed consumer are claimed
+        # again when their lease expires
+        signal.signal(signal.SIGTERM, lambda signum, frame: outbox.stop())
+        logger.info("Webhook outbox consumer started")
+
+        # Stats and spans are written in batches from background threads while the command runs
+        template_stats.start()
+        execution_rollups.start()
+        tracer.start()
+        try:
+            outbox.run(options['poll_interval'], once=options['once'])
+        except KeyboardInterrupt:
+            outbox.stop()
+            logger.info("Stopped due to Keyboard interrupt")
+        finally:
+            template_stats.stop()
+            execution_rollups.stop()
+            tracer.stop()
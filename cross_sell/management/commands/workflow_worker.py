@@ -0,0 +1,53 @@
+import logging
+import signal
+
+from django.core.management.base import BaseCommand
+
+from cross_sell.execution_rollups import execution_rollups
+from cross_sell.template_stats import template_stats
+from cross_sell.worker import WorkflowWorker
+from core.tracing import tracer
+from hephestos.settings import (WORKFLOW_WORKER_CONCURRENCY, WORKFLOW_WORKER_BATCH_SIZE,
+                                WORKFLOW_WORKER_POLL_INTERVAL, WORKFLOW_LEASE_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run queued, retried and due paused workflow executions. Start more processes to scale out'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=WORKFLOW_WORKER_CONCURRENCY,
+                            help='Executions to run at a time')
+        parser.add_argument('--batch-size', type=int, default=WORKFLOW_WORKER_BATCH_SIZE,
+                            help='Most executions to claim at once')
+        parser.add_argument('--poll-interval', type=float, default=WORKFLOW_WORKER_POLL_INTERVAL,
+                            help='Seconds to wait when there is nothing to claim')
+        parser.add_argument('--lease', type=float, default=WORKFLOW_LEASE_SECONDS,
+                            help='Seconds an execution stays claimed without a heartbeat')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once nothing is left to claim instead of polling')
+
+    def handle(self, *args, **options):
+        worker = WorkflowWorker(concurrency=options['concurrency'],
+                                batch_size=options['batch_size'],
+                                lease_seconds=options['lease'])
+        # Finish the running executions on SIGTERM (e.g. docker stop) instead of leaving them to lease expiry
+        signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+        # kill -USR1 <pid> logs the per-shop queues as this worker last saw them
+        signal.signal(signal.SIGUSR1, lambda signum, frame: logger.warning("Shop queues", extra={"shops": worker.snapshot()}))
+        logger.info("Workflow worker %s started", worker.worker_id)
+
+        # Stats and spans are written in batches from background threads while the command runs
+        template_stats.start()
+        execution_rollups.start()
+        tracer.start()
+        try:
+            worker.run(options['poll_interval'], once=options['once'])
+        except KeyboardInterrupt:
+            worker.stop()
+            logger.info("Stopped due to Keyboard interrupt")
+        finally:
+            template_stats.stop()
+            execution_rollups.stop()
+            tracer.stop()
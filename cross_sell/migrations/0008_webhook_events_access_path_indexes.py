@@ -0,0 +1,98 @@
+# Generated by Django 5.1 on 2026-10-19 17:40
+
+import django.utils.timezone
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+UNPROCESSED_INDEX = models.Index(condition=models.Q(('processed', False)), fields=['created_at'],
+                                 name='webhook_events_unprocessed_idx')
+ORDER_CREATED_CONSTRAINT = models.UniqueConstraint(fields=('order_id', 'created_at'),
+                                                   name='webhook_events_order_created_uniq')
+
+
+# Frozen copy of core.partitioning.add_index_concurrently as it was when this migration was written,
+# so later changes to it do not change what the migration does
+def _add_index_concurrently(schema_editor, model, index, unique=False):
+    table = model._meta.db_table
+    quote = schema_editor.quote_name
+
+    def statement(target, name, concurrently):
+        sql = index.create_sql(model, schema_editor, concurrently=concurrently)
+        sql.parts["table"] = target
+        sql.parts["name"] = quote(name)
+        sql = str(sql)
+        return sql.replace("CREATE INDEX", "CREATE UNIQUE INDEX", 1) if unique else sql
+
+    # On the parent only (invalid until every partition has it), then built concurrently on each
+    # partition and attached
+    schema_editor.execute(statement(f"ONLY {quote(table)}", index.name, False))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %s",
+            [table],
+        )
+        partitions = [name for (name,) in cursor.fetchall()]
+    for partition in partitions:
+        child = f"{index.name}_{partition[len(table) + 1:]}"
+        schema_editor.execute(statement(quote(partition), child, True))
+        schema_editor.execute(f"ALTER INDEX {quote(index.name)} ATTACH PARTITION {quote(child)}")
+
+
+def add_webhook_events_indexes(apps, schema_editor):
+    model = apps.get_model('cross_sell', 'WebhookEvents')
+    _add_index_concurrently(schema_editor, model, UNPROCESSED_INDEX)
+    # A unique index rather than a constraint: unique constraints cannot be added to a partitioned
+    # table without blocking writes. ON CONFLICT treats both the same.
+    _add_index_concurrently(schema_editor, model, models.Index(fields=['order_id', 'created_at'],
+                                                               name=ORDER_CREATED_CONSTRAINT.name), unique=True)
+
+
+def remove_webhook_events_indexes(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{UNPROCESSED_INDEX.name}"')
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{ORDER_CREATED_CONSTRAINT.name}"')
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which cannot happen in a transaction
+    atomic = False
+
+    dependencies = [
+        ('cross_sell', '0007_partition_webhook_events'),
+        ('shopify', '0006_remove_redundant_domain_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhookevents',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        AddIndexConcurrently(
+            model_name='savedtemplate',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['shop', 'id'], include=('template',), name='saved_template_active_shop_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='savedtemplate',
+            name='cross_sell__shop_id_6edd2d_idx',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='webhookevents', index=UNPROCESSED_INDEX),
+                migrations.AddConstraint(model_name='webhookevents', constraint=ORDER_CREATED_CONSTRAINT),
+            ],
+            database_operations=[
+                migrations.RunPython(add_webhook_events_indexes, remove_webhook_events_indexes),
+            ],
+        ),
+        # Covered by the unique (order_id, created_at) index and the partial unprocessed index
+        migrations.RemoveIndex(
+            model_name='webhookevents',
+            name='cross_sell__order_i_e3d9c8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='webhookevents',
+            name='cross_sell__process_d20617_idx',
+        ),
+    ]
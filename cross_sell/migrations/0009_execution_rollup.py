@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-19 17:46
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cross_sell', '0008_webhook_events_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecutionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('saved_template_id', models.BigIntegerField()),
+                ('template_id', models.BigIntegerField()),
+                ('shop_domain', models.CharField(max_length=100)),
+                ('hour', models.DateTimeField()),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('deferred', models.PositiveIntegerField(default=0)),
+                ('duration_total', models.FloatField(default=0)),
+                ('latency_buckets', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=21)),
+            ],
+            options={
+                'db_table': 'cross_sell_execution_rollup',
+                'indexes': [models.Index(fields=['shop_domain', 'hour'], name='execution_rollup_shop_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('saved_template_id', 'hour'), name='execution_rollup_template_hour_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,128 @@
+# Generated by Django 5.1 on 2026-10-19 17:58
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+
+# Frozen copy of core.workflow.compiled_form and of the task validators as they were when this
+# migration was written, so later changes to them do not change what it does
+_VALIDATORS = {
+    "http": lambda p: isinstance(p.get("url"), str) and p.get("method") in ["GET", "POST", "PUT", "DELETE"],
+    "integration": lambda p: p.get("integration_type") in ["email"] and isinstance(p.get("config"), dict),
+    "delay": lambda p: (isinstance(p.get("duration"), (int, float)) and p["duration"] > 0
+                        and p.get("unit") in ["seconds", "minutes", "hours"]),
+    "condition": lambda p: (p.get("condition_type") in ["if", "else-if", "switch"]
+                            and isinstance(p.get("conditions"), list) and len(p["conditions"]) > 0),
+}
+
+
+def _has_template(value):
+    if isinstance(value, str):
+        return "{{" in value
+    if isinstance(value, dict):
+        return any(_has_template(item) for item in value.values())
+    if isinstance(value, list):
+        return any(_has_template(item) for item in value)
+    return False
+
+
+def _compiled_form(workflow):
+    """The compiled form (version 1) of a workflow, or None if it is invalid."""
+    tasks = workflow.get("tasks") if isinstance(workflow, dict) else None
+    trigger = workflow.get("trigger") if isinstance(workflow, dict) else None
+    if not isinstance(tasks, dict) or trigger not in tasks:
+        return None
+    for task in tasks.values():
+        if not isinstance(task, dict) or task.get("type") not in _VALIDATORS:
+            return None
+        properties = task.get("properties") or {}
+        if not isinstance(properties, dict):
+            return None
+        # Templated properties are only validated once rendered, when the task runs
+        if not _has_template(properties) and not _VALIDATORS[task["type"]](properties):
+            return None
+        if any(next_id not in tasks for next_id in task.get("next") or []):
+            return None
+
+    # Depth-first from the trigger: no cycles, every task reachable
+    visiting, done, post_order = [trigger], set(), []
+    stack = [(trigger, iter(tasks[trigger].get("next") or []))]
+    while stack:
+        task_id, edges = stack[-1]
+        next_id = next(edges, None)
+        if next_id is None:
+            stack.pop()
+            visiting.pop()
+            done.add(task_id)
+            post_order.append(task_id)
+        elif next_id in visiting:
+            return None
+        elif next_id not in done:
+            visiting.append(next_id)
+            stack.append((next_id, iter(tasks[next_id].get("next") or [])))
+    if len(done) != len(tasks):
+        return None
+
+    order = post_order[::-1]
+    return {
+        "version": 1,
+        "trigger": trigger,
+        "order": order,
+        "tasks": {task_id: {"id": task_id,
+                            "type": tasks[task_id]["type"],
+                            "properties": tasks[task_id].get("properties") or {},
+                            "next": list(tasks[task_id].get("next") or [])}
+                  for task_id in order},
+    }
+
+
+def _fix_delay_unit(workflow):
+    # The default template used to ship with "units", which validate_delay_properties rejects
+    changed = False
+    for task in (workflow.get("tasks") or {}).values() if isinstance(workflow, dict) else ():
+        if not isinstance(task, dict):
+            continue
+        properties = task.get("properties")
+        if task.get("type") == "delay" and isinstance(properties, dict) and "units" in properties \
+                and "unit" not in properties:
+            properties["unit"] = properties.pop("units")
+            changed = True
+    return changed
+
+
+def compile_workflows(apps, schema_editor):
+    Template = apps.get_model("cross_sell", "Template")
+    SavedTemplate = apps.get_model("cross_sell", "SavedTemplate")
+
+    for template in Template.objects.all().iterator():
+        if _fix_delay_unit(template.description):
+            template.save(update_fields=["description"])
+
+    for saved in SavedTemplate.objects.all().iterator():
+        _fix_delay_unit(saved.workflow_json)
+        # Invalid ones are left uncompiled, they keep being validated when they run until fixed and saved again
+        saved.compiled_workflow = _compiled_form(saved.workflow_json)
+        saved.task_order = saved.compiled_workflow["order"] if saved.compiled_workflow else []
+        saved.save(update_fields=["workflow_json", "compiled_workflow", "task_order"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cross_sell', '0009_execution_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='savedtemplate',
+            name='compiled_workflow',
+            field=models.JSONField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='savedtemplate',
+            name='task_order',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), default=list, editable=False, size=None),
+        ),
+        migrations.RunPython(compile_workflows, migrations.RunPython.noop),
+    ]
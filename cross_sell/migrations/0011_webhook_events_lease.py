@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-19 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cross_sell', '0010_saved_template_compiled_workflow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookevents',
+            name='lease_expires_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.utils import timezone
 
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
+
+from core.metrics import BUCKET_BOUNDS
+from core.workflow import compiled_form, validate_workflow
 from shopify.models import Shop
 
 
@@ -28,19 +32,26 @@ class WebhookEvents(models.Model):
     Stores webhook events received from Shopify.
     """
     order_id = models.BigIntegerField(null=False, default=0)
-    created_at = models.DateTimeField(null=False, auto_now_add=True)
+    created_at = models.DateTimeField(null=False, default=timezone.now)  # Shopify's created_at, part of the dedupe key
     webhook_data = models.JSONField(null=False)
     event_type = models.CharField(max_length=50, choices=ShopifyEventType.choices)
     shop_domain = models.CharField(max_length=100, null=False)
     processed = models.BooleanField(default=False)
     processing_error = models.TextField(null=True)
+    # Until when a webhook_outbox consumer holds the event, another one reclaims it after that
+    lease_expires_at = models.DateTimeField(null=True)
 
     class Meta:
         db_table = 'cross_sell_webhook_events'
         indexes = [
             models.Index(fields=['shop_domain', 'created_at']),
-            models.Index(fields=['order_id']),
-            models.Index(fields=['processed'])
+            # Outbox of events still to process, tiny compared to a full index on processed
+            models.Index(fields=['created_at'], condition=models.Q(processed=False),
+                         name='webhook_events_unprocessed_idx'),
+        ]
+        constraints = [
+            # Dedupe key of incoming orders, also serves lookups by order_id
+            models.UniqueConstraint(fields=['order_id', 'created_at'], name='webhook_events_order_created_uniq'),
         ]
 
 
@@ -58,6 +69,12 @@ class Template(models.Model):
     class Meta:
         db_table = 'cross_sell_template'
 
+    def save(self, *args, **kwargs):
+        # The description of a workflow template is the workflow shops start from
+        if isinstance(self.description, dict) and "tasks" in self.description:
+            validate_workflow(self.description)
+        super().save(*args, **kwargs)
+
 
 class SavedTemplate(models.Model):
     """
@@ -66,6 +83,9 @@ class SavedTemplate(models.Model):
     template = models.ForeignKey(Template, on_delete=models.CASCADE)
     shop = models.ForeignKey(Shop, to_field='domain', on_delete=models.CASCADE, related_name='saved_templates')
     workflow_json = models.JSONField(null=False)
+    # workflow_json validated and in topological order (core.workflow.compiled_form), set on save
+    compiled_workflow = models.JSONField(null=True, editable=False)
+    task_order = ArrayField(models.CharField(max_length=100), default=list, editable=False)
     last_executed = models.DateTimeField(null=True)
     execution_count = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
@@ -75,6 +95,58 @@ class SavedTemplate(models.Model):
     class Meta:
         db_table = 'cross_sell_saved_template'
         indexes = [
-            models.Index(fields=['shop', 'is_active']),
+            # Active templates of a shop, in id order, without visiting the table for ids
+            models.Index(fields=['shop', 'id'], include=['template'], condition=models.Q(is_active=True),
+                         name='saved_template_active_shop_idx'),
             models.Index(fields=['last_executed'])
         ]
+
+    def compile(self):
+        """
+        Validate workflow_json and store its compiled form.
+
+        Raises:
+            core.workflow.WorkflowValidationError: If the workflow cannot run
+        """
+        self.compiled_workflow = compiled_form(self.workflow_json)
+        self.task_order = self.compiled_workflow["order"]
+
+    def clean(self):
+        super().clean()
+        self.compile()
+
+    def save(self, *args, **kwargs):
+        # Invalid workflows fail here once, instead of on every order
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.compile()
+        elif 'workflow_json' in update_fields:
+            self.compile()
+            kwargs['update_fields'] = {*update_fields, 'compiled_workflow', 'task_order'}
+        super().save(*args, **kwargs)
+
+
+class ExecutionRollup(models.Model):
+    """
+    Hourly execution stats of a saved template, maintained incrementally by
+    cross_sell.execution_rollups so dashboards never aggregate WorkflowExecution.
+    """
+    saved_template_id = models.BigIntegerField()
+    template_id = models.BigIntegerField()
+    shop_domain = models.CharField(max_length=100)
+    hour = models.DateTimeField()
+    completed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    deferred = models.PositiveIntegerField(default=0)
+    duration_total = models.FloatField(default=0)  # Seconds, summed over every execution
+    # Executions per latency bucket of core.metrics.BUCKET_BOUNDS (last one is the overflow)
+    latency_buckets = ArrayField(models.IntegerField(), size=len(BUCKET_BOUNDS) + 1)
+
+    class Meta:
+        db_table = 'cross_sell_execution_rollup'
+        constraints = [
+            models.UniqueConstraint(fields=['saved_template_id', 'hour'], name='execution_rollup_template_hour_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['shop_domain', 'hour'], name='execution_rollup_shop_hour_idx'),
+        ]
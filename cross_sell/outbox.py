@@ -0,0 +1,112 @@
+# cross_sell/outbox.py
+import logging
+import threading
+from datetime import timedelta
+from typing import List, Optional
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core.db_router import pin_to_primary
+from core.log import log_context
+from core.repository.workflow_repository import WebhookRepository
+from core.tracing import span
+from cross_sell.models import WebhookEvents
+from cross_sell.processor import process
+from hephestos.settings import WEBHOOK_OUTBOX_BATCH_SIZE, WEBHOOK_OUTBOX_LEASE_SECONDS
+from shopify.models import Shop
+from shopify.processor import extract_shopify_data, parse_shop_url
+
+logger = logging.getLogger(__name__)
+
+
+def handle_event(event: WebhookEvents) -> None:
+    """
+    Ingest a stored orders/create event and run the shop's workflows for it, as the subscriber
+    does for the messages it receives.
+
+    Raises:
+        ValueError: If the shop of the event cannot be determined
+    """
+    payload = event.webhook_data
+    try:
+        _, shop_id = parse_shop_url(payload.get("order_status_url") or "")
+    except IndexError:
+        # The webhook view falls back to the X-Shopify-Shop-Domain header, the shop must be known then
+        shop_id = Shop.objects.filter(domain=event.shop_domain).values_list("shop_id", flat=True).first()
+        if shop_id is None:
+            raise ValueError(f"Unknown shop {event.shop_domain}") from None
+    shop, order = extract_shopify_data(payload, event.shop_domain, shop_id)
+    pin_to_primary(event.shop_domain)
+    process(payload, shop, order)
+
+
+class WebhookOutbox:
+    """
+    Processes the webhook events stored without being processed, i.e. the ones the webhook view
+    received. The subscriber processes its own events as it stores them.
+
+    Events are claimed with SELECT ... FOR UPDATE SKIP LOCKED and leased to this consumer for
+    `lease_seconds`, so any number of consumers can run without sharing events. An event is marked
+    processed only once it was handled, so the events of a consumer that dies mid batch are claimed
+    again when their lease runs out: delivery is at least once. One that fails keeps its error in
+    `processing_error` and is not retried.
+    """
+
+    def __init__(self, batch_size: int = WEBHOOK_OUTBOX_BATCH_SIZE, lease_seconds: float = WEBHOOK_OUTBOX_LEASE_SECONDS):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self._stopped = threading.Event()
+
+    def claim(self) -> List[WebhookEvents]:
+        now = timezone.now()
+        return WebhookRepository.claim_batch(WebhookRepository.claimable(now), self.batch_size,
+                                             lease_expires_at=now + timedelta(seconds=self.lease_seconds))
+
+    def complete(self, event: WebhookEvents, error: Optional[str] = None) -> None:
+        """Mark a claimed event processed, unless its lease ran out and another consumer holds it now."""
+        completed = WebhookEvents.objects.filter(
+            pk=event.pk, created_at=event.created_at, lease_expires_at=event.lease_expires_at,
+        ).update(processed=True, processing_error=error, lease_expires_at=None)
+        if not completed:
+            logger.warning("Lease of webhook event %s expired while it was processed", event.pk)
+
+    def run_once(self) -> int:
+        """
+        Claim and process one batch of events.
+
+        Returns:
+            The number of events claimed
+        """
+        events = self.claim()
+        for event in events:
+            with log_context(order_id=event.order_id, shop=event.shop_domain), \
+                    span("outbox.event", order_id=event.order_id, shop=event.shop_domain):
+                try:
+                    handle_event(event)
+                except Exception as e:
+                    logger.exception("Processing webhook event failed: %s", e)
+                    self.complete(event, str(e))
+                else:
+                    self.complete(event)
+        return len(events)
+
+    def run(self, poll_interval: float, once: bool = False) -> None:
+        """
+        Process events until stop() is called, or until nothing is left with `once`.
+        """
+        while not self._stopped.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception as e:
+                logger.warning("Claiming webhook events failed: %s", e)
+                claimed = 0
+            finally:
+                close_old_connections()
+            if once and not claimed:
+                break
+            if not claimed:
+                self._stopped.wait(poll_interval)
+
+    def stop(self) -> None:
+        self._stopped.set()
@@ -1,32 +1,150 @@
 # this function is responsible for calling core
+import logging
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.utils import timezone
+
+from core.context_binder import RuntimeData
+from core.executor_pool import BoundedExecutor
+from core.log import log_context
+from core.tracing import span
+from core.models import WorkflowExecution, ExecutionState, Status
+from core.repository.execution_repository import ExecutionRepository
+from core.task_registry import TaskRegistry
+from core.workflow import WorkflowPlan
 from core.workflow_executor import execute_workflow
-from cross_sell.models import SavedTemplate
-from cross_sell.task_provider import execute_condition_task
+from cross_sell.execution_rollups import execution_rollups
+from cross_sell.template_cache import CachedTemplate, get_active_templates
+from cross_sell.template_stats import template_stats
+from hephestos.settings import WORKFLOW_MAX_WORKERS, WORKFLOW_MAX_PER_SHOP, WORKFLOW_ORDER_DEADLINE, WORKFLOW_QUEUE
 
+logger = logging.getLogger(__name__)
 
-def evaluate_trigger(workflow):
-    # Get the trigger task ID from the workflow
-    trigger_id = workflow.get("trigger", "task0")
-    
-    # Get the task from the tasks dictionary
-    trigger_task = workflow.get("tasks", {}).get(trigger_id)
+# Shared by every order processed in this process
+workflow_pool = BoundedExecutor(max_workers=WORKFLOW_MAX_WORKERS,
+                                max_per_key=WORKFLOW_MAX_PER_SHOP,
+                                thread_name_prefix="workflow")
+
+
+def build_runtime_data(webhook_data, shop) -> RuntimeData:
+    """
+    Build the data workflows of an order are bound to: {"order": ..., "customer": ..., "shop": ...}
+    """
+    customer = webhook_data.get("customer") or {"email": webhook_data.get("email")}
+    return RuntimeData({
+        "order": webhook_data,
+        "customer": customer,
+        "shop": {"domain": shop.domain, "shop_id": shop.shop_id, "email": shop.email},
+    })
+
+
+def evaluate_trigger(plan: WorkflowPlan, data: RuntimeData = None):
+    trigger_task = plan.trigger_task
     
     if trigger_task and trigger_task.get("type") == "condition":
         # Execute the condition task to determine if workflow should run
-        return execute_condition_task(trigger_task.get("properties", {}))
+        outcome = TaskRegistry.get_handler("condition")(plan.properties_for(plan.trigger, data))
+        if outcome.get("status") != "completed":
+            return False
+        result = outcome["result"]
+        # "if" evaluates to a bool, "else-if"/"switch" to a dict with the match
+        return bool(result.get("result")) if isinstance(result, dict) else bool(result)
     return False
 
 
+def defer_execution(template: CachedTemplate, data: RuntimeData, result) -> WorkflowExecution:
+    """
+    Persist a rate limited execution as paused, to be resumed from the throttled task
+    once its tokens are available again.
+    """
+    return WorkflowExecution.objects.create(
+        state=ExecutionState.PAUSE,
+        status=Status.PENDING,
+        shop_domain=data.resolve("shop.domain"),
+        workflow_data={
+            "saved_template_id": template.id,
+            "resume_task": result["resume_task"],
+            "data": data.data,
+        },
+        execution_history=result["execution_path"],
+        next_run_at=timezone.now() + timedelta(seconds=result["retry_after"]),
+    )
+
+
+def enqueue_executions(templates, data: RuntimeData) -> None:
+    """Store workflows as NEW executions for manage.py workflow_worker to run."""
+    ExecutionRepository.bulk_save(
+        WorkflowExecution(state=ExecutionState.NEW,
+                          status=Status.PENDING,
+                          shop_domain=data.resolve("shop.domain"),
+                          workflow_data={"saved_template_id": template.id, "data": data.data})
+        for template in templates
+    )
+
+
+def run_template(template: CachedTemplate, data: RuntimeData, start_task: str = None,
+                 persist_deferred: bool = True):
+    """
+    Run a workflow, from its trigger or from `start_task` when resuming.
+
+    A run deferred by rate limiting is stored as a paused execution, unless `persist_deferred`
+    is off because the caller already has an execution for it.
+    """
+    with log_context(template_id=template.id), span("workflow", template_id=template.id) as workflow_span:
+        status = "failed"
+        started = time.perf_counter()
+        try:
+            result = execute_workflow(template.plan, data, start_task)
+            status = result.get("status", status)
+            workflow_span.set(status=status)
+            if status == "deferred" and persist_deferred:
+                execution = defer_execution(template, data, result)
+                logger.info("Workflow deferred by rate limit",
+                            extra={"execution_id": execution.id, "retry_after": result["retry_after"]})
+            return result
+        finally:
+            now = timezone.now()
+            template_stats.record(template.id, now)
+            execution_rollups.record(template.id, template.template_id, data.resolve("shop.domain"), status,
+                                     time.perf_counter() - started, now)
+
+
 def process(webhook_data, shop, order):
-    saved_workflows = SavedTemplate.objects.filter(shop=shop.domain)
-
-    if not saved_workflows:
-        return
-    else:
-        # TODO: Make execution async and parallelize
-        for workflow in saved_workflows:
-            is_executable = evaluate_trigger(workflow.workflow_json)
-            if is_executable:
-                execute_workflow(workflow.workflow_json)
-            else:
-                continue
+    """
+    Run every active workflow of the shop whose trigger matches the order.
+
+    Matched workflows run concurrently on the shared workflow pool, bounded per shop and
+    globally, and the order as a whole is given WORKFLOW_ORDER_DEADLINE seconds. Workflows
+    that find the pool or their shop's share of it full are queued for the workflow workers,
+    which schedule them fairly between shops, so a shop with a backlog never holds the
+    subscriber's threads while they wait for its slots. With WORKFLOW_QUEUE every workflow
+    is queued.
+
+    Returns:
+        List of execution results, one per matched workflow
+    """
+    with span("evaluate_triggers", shop=shop.domain) as trigger_span:
+        saved_workflows = get_active_templates(shop.domain)
+        data = build_runtime_data(webhook_data, shop)
+        matched = [workflow for workflow in saved_workflows if evaluate_trigger(workflow.plan, data)]
+        trigger_span.set(templates=len(saved_workflows), matched=len(matched))
+    if not matched:
+        return []
+
+    if WORKFLOW_QUEUE:
+        enqueue_executions(matched, data)
+        return [{"status": "queued", "saved_template_id": workflow.id} for workflow in matched]
+
+    results = workflow_pool.run_all(
+        shop.domain,
+        [partial(run_template, workflow, data) for workflow in matched],
+        timeout=WORKFLOW_ORDER_DEADLINE,
+        wait_for_slots=False,
+    )
+    overflow = [workflow for workflow, result in zip(matched, results) if result["status"] == "no_slot"]
+    if overflow:
+        enqueue_executions(overflow, data)
+    return [{"status": "queued", "saved_template_id": workflow.id} if result["status"] == "no_slot" else result
+            for workflow, result in zip(matched, results)]
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from cross_sell.models import SavedTemplate
+from cross_sell.template_cache import template_cache
+
+
+@receiver([post_save, post_delete], sender=SavedTemplate)
+def invalidate_template_cache(sender, instance, **kwargs):
+    template_cache.invalidate(instance.shop_id)
@@ -1,6 +1,42 @@
 # cross_sell/task_provider.py
+import logging
 from typing import Dict, Any, List
+from urllib.parse import urlsplit
+from core.context_binder import coerce_operands
+from core.http_cache import ResponseCache
+from core.http_client import HttpClient
+from core.smtp_pool import SMTPConnectionPool, build_message
 from core.task_handler import task
+from hephestos.settings import (HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_MAX_HOSTS, HTTP_CONNECT_TIMEOUT,
+                                HTTP_READ_TIMEOUT, HTTP_POOL_TIMEOUT, HTTP_MAX_RESPONSE_BYTES,
+                                HTTP_CACHE_MAX_ENTRIES, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_DISK_DIR,
+                                HTTP_CACHE_MAX_DISK_ENTRIES, EMAIL_HOST, EMAIL_PORT, EMAIL_HOST_USER,
+                                EMAIL_HOST_PASSWORD, EMAIL_USE_TLS, EMAIL_USE_SSL, EMAIL_TIMEOUT,
+                                EMAIL_POOL_SIZE, DEFAULT_FROM_EMAIL)
+
+logger = logging.getLogger(__name__)
+
+# Shared by every http task in this process, so connections to merchant endpoints are kept alive
+http_client = HttpClient(max_connections_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+                         max_hosts=HTTP_MAX_HOSTS,
+                         connect_timeout=HTTP_CONNECT_TIMEOUT,
+                         read_timeout=HTTP_READ_TIMEOUT,
+                         pool_timeout=HTTP_POOL_TIMEOUT,
+                         max_response_bytes=HTTP_MAX_RESPONSE_BYTES)
+# Used by http tasks that opt in with "cache"
+response_cache = ResponseCache(max_entries=HTTP_CACHE_MAX_ENTRIES,
+                               max_bytes=HTTP_CACHE_MAX_BYTES,
+                               disk_dir=HTTP_CACHE_DISK_DIR,
+                               max_disk_entries=HTTP_CACHE_MAX_DISK_ENTRIES)
+# Shared by every email integration task in this process
+email_pool = SMTPConnectionPool(host=EMAIL_HOST,
+                                port=EMAIL_PORT,
+                                username=EMAIL_HOST_USER,
+                                password=EMAIL_HOST_PASSWORD,
+                                use_tls=EMAIL_USE_TLS,
+                                use_ssl=EMAIL_USE_SSL,
+                                timeout=EMAIL_TIMEOUT,
+                                max_connections=EMAIL_POOL_SIZE)
 
 
 def validate_http_properties(properties: Dict[str, Any]) -> bool:
@@ -12,7 +48,11 @@ def validate_http_properties(properties: Dict[str, Any]) -> bool:
         properties["method"] in ["GET", "POST", "PUT", "DELETE"]
     )
 
-@task("http", validator=validate_http_properties)
+def http_destination(properties: Dict[str, Any]) -> str:
+    """Rate limit http tasks per host."""
+    return urlsplit(properties["url"]).netloc
+
+@task("http", validator=validate_http_properties, destination=http_destination)
 def execute_http_task(properties: Dict[str, Any]) -> Dict[str, Any]:
     """
     Execute an HTTP request task.
@@ -22,28 +62,114 @@ def execute_http_task(properties: Dict[str, Any]) -> Dict[str, Any]:
             "url": str,
             "method": str,
             "headers": Dict[str, str],  # optional
-            "body": Dict[str, Any]      # optional
+            "body": Dict[str, Any],     # optional
+            "timeout": {"connect": float, "read": float},  # optional
+            "max_response_bytes": int,  # optional
+            "cache": bool | {"vary_headers": List[str]}  # optional, only GET is cached
         }
         
     Returns:
         Dict containing response data or error
     """
     try:
-        # TODO: Implement actual HTTP request logic
-        print(f"Executing HTTP {properties['method']} request to {properties['url']}")
-        return {
-            "status": "completed",
+        timeout = properties.get("timeout", {})
+        request_kwargs = dict(
+            headers=properties.get("headers"),
+            json_body=properties.get("body"),
+            connect_timeout=timeout.get("connect"),
+            read_timeout=timeout.get("read"),
+            max_response_bytes=properties.get("max_response_bytes"),
+        )
+        cache = properties.get("cache")
+        if cache:
+            vary_headers = cache.get("vary_headers", []) if isinstance(cache, dict) else []
+            response = response_cache.fetch(http_client, properties["method"], properties["url"],
+                                            vary_headers=vary_headers, **request_kwargs)
+        else:
+            response = http_client.request(properties["method"], properties["url"], **request_kwargs)
+        result = {
+            "status": "completed" if response.status_code < 400 else "failed",
             "response": {
-                "status_code": 200,  # Mock response
-                "data": "Success"
+                "status_code": response.status_code,
+                "data": response.data()
             }
         }
+        if response.status_code >= 400:
+            result["error"] = f"HTTP {response.status_code}"
+        return result
     except Exception as e:
         return {
             "status": "failed",
             "error": str(e)
         }
 
+def validate_integration_properties(properties: Dict[str, Any]) -> bool:
+    """Validate properties for integration task."""
+    return (
+        properties.get("integration_type") in INTEGRATIONS and
+        isinstance(properties.get("config"), dict)
+    )
+
+def integration_destination(properties: Dict[str, Any]) -> str:
+    """Rate limit integration tasks per provider, e.g. the SMTP relay for email."""
+    if properties["integration_type"] == "email":
+        return f"smtp:{EMAIL_HOST}"
+    return properties["integration_type"]
+
+@task("integration", validator=validate_integration_properties, destination=integration_destination)
+def execute_integration_task(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Execute an integration task with the handler of its integration type.
+    
+    Args:
+        properties: {
+            "integration_type": str,  # "email"
+            "config": Dict[str, Any]  # Integration specific, template variables already rendered
+        }
+        
+    Returns:
+        Dict containing integration results
+    """
+    try:
+        return INTEGRATIONS[properties["integration_type"]](properties["config"])
+    except Exception as e:
+        return {
+            "status": "failed",
+            "error": str(e)
+        }
+
+def send_email(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Send the email integration's message(s) over the pooled SMTP connections.
+    
+    Args:
+        config: {
+            "recipient": str,         # or
+            "recipients": List[str],  # batch send, one message per recipient
+            "subject": str,
+            "content": str,
+            "sender": str             # optional, defaults to DEFAULT_FROM_EMAIL
+        }
+        
+    Returns:
+        Dict containing the send result of each message
+    """
+    recipients = config.get("recipients") or [config["recipient"]]
+    sender = config.get("sender") or DEFAULT_FROM_EMAIL
+    messages = [build_message(sender, recipient, config["subject"], config["content"])
+                for recipient in recipients]
+    results = email_pool.send_batch(messages)
+    sent = sum(1 for result in results if result["status"] == "sent")
+    return {
+        "status": "completed" if sent == len(results) else "failed",
+        "sent": sent,
+        "messages": results
+    }
+
+INTEGRATIONS = {
+    "email": send_email,
+}
+
 def validate_delay_properties(properties: Dict[str, Any]) -> bool:
     """Validate properties for delay task."""
     return (
@@ -70,7 +196,7 @@ def execute_delay_task(properties: Dict[str, Any]) -> Dict[str, Any]:
     """
     try:
         # TODO: Implement actual delay logic
-        print(f"Delaying execution for {properties['duration']} {properties['unit']}")
+        logger.debug("Delaying execution for %s %s", properties['duration'], properties['unit'])
         return {
             "status": "completed",
             "delayed_for": f"{properties['duration']} {properties['unit']}"
@@ -151,8 +277,8 @@ def evaluate_if(condition: Dict[str, Any], context: Dict[str, Any]) -> bool:
     operator = condition["operator"]
     value = condition["value"]
     
-    # Get the actual value from context
-    actual_value = context.get(field)
+    # Get the actual value from context, typed to compare with the condition's value
+    actual_value, value = coerce_operands(context.get(field), value)
     
     # Evaluate the condition
     match operator:
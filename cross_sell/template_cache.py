@@ -0,0 +1,89 @@
+# cross_sell/template_cache.py
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from core.workflow import COMPILED_VERSION, WorkflowPlan, compile_workflow
+from cross_sell.models import SavedTemplate
+from hephestos.settings import TEMPLATE_CACHE_TTL
+
+
+@dataclass(frozen=True)
+class CachedTemplate:
+    """
+    Active SavedTemplate of a shop in its compiled form.
+    """
+    id: int
+    template_id: int
+    plan: WorkflowPlan
+
+
+class TemplateCache:
+    """
+    Per-process cache of each shop's active templates.
+
+    Entries are dropped by the SavedTemplate post_save/post_delete signals (see cross_sell.signals),
+    the TTL only bounds staleness for edits made by other processes.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, Tuple[CachedTemplate, ...]]] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, shop_domain: str) -> Tuple[CachedTemplate, ...]:
+        """
+        Get the active templates of a shop, loading and compiling them on a miss.
+        """
+        entry = self._entries.get(shop_domain)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        generation = self._generations.get(shop_domain, 0)
+        templates = self._load(shop_domain)
+        with self._lock:
+            # Do not store what was read before a concurrent invalidation
+            if self._generations.get(shop_domain, 0) == generation:
+                self._entries[shop_domain] = (time.monotonic() + self.ttl, templates)
+        return templates
+
+    def invalidate(self, shop_domain: Optional[str] = None) -> None:
+        """
+        Drop the cached templates of a shop, or of every shop if no domain is given.
+        """
+        with self._lock:
+            domains = [shop_domain] if shop_domain is not None else list(self._entries)
+            for domain in domains:
+                self._entries.pop(domain, None)
+                self._generations[domain] = self._generations.get(domain, 0) + 1
+
+    @staticmethod
+    def _load(shop_domain: str) -> Tuple[CachedTemplate, ...]:
+        saved_templates = (SavedTemplate.objects
+                           .filter(shop=shop_domain, is_active=True)
+                           .only("id", "template_id", "compiled_workflow", "workflow_json")
+                           .order_by("id"))
+        return tuple(
+            CachedTemplate(id=saved.id,
+                           template_id=saved.template_id,
+                           plan=_plan(saved))
+            for saved in saved_templates
+        )
+
+
+def _plan(saved: SavedTemplate) -> WorkflowPlan:
+    compiled = saved.compiled_workflow
+    if compiled and compiled.get("version") == COMPILED_VERSION:
+        # Validated when it was saved, tasks are not validated again on every order
+        return compile_workflow(compiled, validated=True)
+    # Saved before workflows were compiled, or by an older version
+    return compile_workflow(saved.workflow_json)
+
+
+template_cache = TemplateCache(ttl=TEMPLATE_CACHE_TTL)
+
+
+def get_active_templates(shop_domain: str) -> Tuple[CachedTemplate, ...]:
+    return template_cache.get(shop_domain)
@@ -0,0 +1,55 @@
+# cross_sell/template_stats.py
+from datetime import datetime
+from typing import Dict, Tuple
+
+from django.db import connection
+
+from core.batch_flusher import BatchFlusher
+from cross_sell.models import SavedTemplate
+from hephestos.settings import TEMPLATE_STATS_FLUSH_INTERVAL
+
+
+class TemplateStats(BatchFlusher):
+    """
+    Aggregates SavedTemplate.execution_count increments and last_executed per template
+    and flushes them with a single UPDATE ... FROM (VALUES ...) per interval, so popular
+    templates do not turn into hot rows.
+    """
+
+    def _empty(self) -> Dict[int, Tuple[int, datetime]]:
+        return {}
+
+    def record(self, saved_template_id: int, executed_at: datetime) -> None:
+        """Count one execution of a saved template."""
+        with self._lock:
+            self._add(saved_template_id, 1, executed_at)
+
+    def _add(self, saved_template_id: int, count: int, executed_at: datetime) -> None:
+        current = self._pending.get(saved_template_id)
+        if current is None:
+            self._pending[saved_template_id] = (count, executed_at)
+        else:
+            self._pending[saved_template_id] = (current[0] + count, max(current[1], executed_at))
+
+    def _merge(self, pending: Dict[int, Tuple[int, datetime]]) -> None:
+        for saved_template_id, (count, executed_at) in pending.items():
+            self._add(saved_template_id, count, executed_at)
+
+    def _write(self, pending: Dict[int, Tuple[int, datetime]]) -> None:
+        table = SavedTemplate._meta.db_table
+        values = ", ".join(["(%s::bigint, %s::integer, %s::timestamptz)"] * len(pending))
+        params = [param
+                  for saved_template_id, (count, executed_at) in pending.items()
+                  for param in (saved_template_id, count, executed_at)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS t "
+                f"SET execution_count = t.execution_count + v.count, "
+                f"last_executed = GREATEST(t.last_executed, v.executed_at) "
+                f"FROM (VALUES {values}) AS v(id, count, executed_at) "
+                f"WHERE t.id = v.id",
+                params,
+            )
+
+
+template_stats = TemplateStats(interval=TEMPLATE_STATS_FLUSH_INTERVAL, name="template-stats")
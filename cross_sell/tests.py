@@ -1,11 +1,39 @@
+import base64
+import hashlib
+import hmac
+import io
 import json
+import os
+import tempfile
+from datetime import timedelta
 from unittest.mock import patch, MagicMock
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
 from google.cloud.pubsub_v1.subscriber.message import Message
 from datetime import datetime
-from cross_sell.models import WebhookEvents  # Replace `myapp` with your actual app name
+from cross_sell.models import ExecutionRollup, WebhookEvents, SavedTemplate, Template  # Replace `myapp` with your actual app name
 from cross_sell.management.commands.subscriber import \
     callback  # Replace `module` with the file where `callback` is defined
+from core.context_binder import RuntimeData
+from core.db_router import pin_to_primary
+from core.models import WorkflowExecution, ExecutionState
+from core.repository.execution_repository import ExecutionRepository
+from core.rate_limit import LocalRateLimiter, OutboundRateLimiter
+from core.smtp_debug import DebugSMTPServer
+from core.task_handler import TaskHandler
+from core.workflow import WorkflowValidationError, validate_workflow
+from core.workflow_executor import WorkflowExecutor
+from core.smtp_pool import SMTPConnectionPool
+from cross_sell.outbox import WebhookOutbox
+from cross_sell.processor import process, defer_execution, workflow_pool
+from cross_sell.task_provider import execute_integration_task
+from cross_sell.template_cache import template_cache, get_active_templates, CachedTemplate
+from cross_sell.template_stats import TemplateStats, template_stats
+from cross_sell.worker import LeaseLost, WorkflowWorker
+from cross_sell.execution_rollups import ExecutionRollups, execution_rollups
+from shopify.models import Order, Shop
 
 sample_webhook_payload = {"id": 5369501515856, "app_id": 1354745,
                           "buyer_accepts_marketing": False,
@@ -48,6 +76,12 @@ sample_webhook_payload = {"id": 5369501515856, "app_id": 1354745,
                           }
 
 
+def flush_stats():
+    # Flushers are only started by the long-running commands, tests write what workflows recorded
+    template_stats.flush()
+    execution_rollups.flush()
+
+
 class SubscriberTestCase(TestCase):
     @patch("cross_sell.models.WebhookEvents.objects.filter")
     @patch("cross_sell.models.WebhookEvents.save", autospec=True)
@@ -71,8 +105,9 @@ class SubscriberTestCase(TestCase):
         mock_message.ack.assert_called_once()
         # Check DB lookup
         mock_filter.assert_called_once_with(order_id=5369501515856, created_at="2025-03-08T13:04:33-05:00")
-        # Ensure save() is called to store event in DB
+        # Ensure save() is called to store event in DB, as processed so the outbox leaves it alone
         mock_save.assert_called_once()
+        self.assertTrue(mock_save.call_args.args[0].processed)
 
     @patch("myapp.models.WebhookEvents.objects.filter")
     def test_callback_skips_duplicate(self, mock_filter):
@@ -92,3 +127,480 @@ class SubscriberTestCase(TestCase):
         # Ensure message is acknowledged, but no save() is performed
         mock_message.ack.assert_called_once()
         mock_filter.assert_called_once()
+
+
+class ImportOrdersTestCase(TestCase):
+    def _write_export(self, payloads):
+        export = tempfile.NamedTemporaryFile("wb", suffix=".jsonl", delete=False)
+        self.addCleanup(os.remove, export.name)
+        for payload in payloads:
+            export.write(json.dumps(payload).encode("utf-8") + b"\n")
+        export.close()
+        return export.name
+
+    def test_import_orders_bulk_inserts_orders_and_shops(self):
+        second_order = dict(sample_webhook_payload, id=5369501515857, name="#1008")
+        path = self._write_export([sample_webhook_payload, {"orders": [second_order]}, {"id": 1}])
+        stdout = io.StringIO()
+
+        call_command("import_orders", path, workers=0, batch_size=2, stdout=stdout)
+
+        self.assertIn("Processed 2 orders", stdout.getvalue())
+        self.assertIn("skipped 1 invalid", stdout.getvalue())
+        self.assertEqual(Order.objects.filter(domain="hephytest").count(), 2)
+        self.assertTrue(Shop.objects.filter(domain="hephytest", shop_id=56305123408).exists())
+
+    def test_import_orders_resumes_from_offset(self):
+        second_order = dict(sample_webhook_payload, id=5369501515857, name="#1008")
+        path = self._write_export([sample_webhook_payload, second_order])
+        first_line_length = len(json.dumps(sample_webhook_payload).encode("utf-8")) + 1
+
+        call_command("import_orders", path, workers=0, offset=first_line_length, stdout=io.StringIO())
+
+        self.assertEqual(list(Order.objects.values_list("order_id", flat=True)), [5369501515857])
+
+
+class TemplateCacheTestCase(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(shop_id=56305123408, domain="hephytest")
+        self.template = Template.objects.first() or Template.objects.create(name="Test template")
+        self.workflow_json = {"trigger": "task0", "tasks": {"task0": {"id": "task0", "type": "delay",
+                                                                      "properties": {"duration": 15, "unit": "minutes"},
+                                                                      "next": []}}}
+        template_cache.invalidate()
+        self.addCleanup(template_cache.invalidate)
+
+    def test_only_active_templates_are_cached(self):
+        active = SavedTemplate.objects.create(template=self.template, shop=self.shop,
+                                              workflow_json=self.workflow_json)
+        SavedTemplate.objects.create(template=self.template, shop=self.shop,
+                                     workflow_json=self.workflow_json, is_active=False)
+
+        templates = get_active_templates("hephytest")
+        self.assertEqual([t.id for t in templates], [active.id])
+        self.assertEqual(templates[0].plan.trigger, "task0")
+        with self.assertNumQueries(0):
+            get_active_templates("hephytest")
+
+    def test_save_and_delete_invalidate_cache(self):
+        saved = SavedTemplate.objects.create(template=self.template, shop=self.shop,
+                                             workflow_json=self.workflow_json)
+        self.assertEqual(len(get_active_templates("hephytest")), 1)
+
+        saved.is_active = False
+        saved.save()
+        self.assertEqual(get_active_templates("hephytest"), ())
+
+        saved.is_active = True
+        saved.save()
+        self.assertEqual(len(get_active_templates("hephytest")), 1)
+        saved.delete()
+        self.assertEqual(get_active_templates("hephytest"), ())
+
+
+class WorkflowCompilationTestCase(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(shop_id=56305123408, domain="hephytest")
+        self.template = Template.objects.create(name="Test template")
+        template_cache.invalidate()
+        self.addCleanup(template_cache.invalidate)
+
+    @staticmethod
+    def workflow(**tasks):
+        return {"trigger": "task0", "tasks": {
+            task_id: {"id": task_id, "type": "delay", "properties": {"duration": 1, "unit": "seconds"}, "next": next_ids}
+            for task_id, next_ids in tasks.items()}}
+
+    def test_save_stores_topological_order(self):
+        saved = SavedTemplate.objects.create(template=self.template, shop=self.shop,
+                                             workflow_json=self.workflow(task0=["task2", "task1"], task1=["task3"],
+                                                                         task2=["task1"], task3=[]))
+        saved.refresh_from_db()
+        self.assertEqual(saved.task_order, ["task0", "task2", "task1", "task3"])
+        self.assertEqual(saved.compiled_workflow["order"], saved.task_order)
+
+        plan = get_active_templates("hephytest")[0].plan
+        self.assertTrue(plan.validated)
+        self.assertEqual(plan.order, ("task0", "task2", "task1", "task3"))
+
+    def test_invalid_workflows_are_rejected_on_save(self):
+        invalid = {
+            "dangling next": self.workflow(task0=["task9"]),
+            "cycle": self.workflow(task0=["task1"], task1=["task0"]),
+            "unreachable": self.workflow(task0=[], task1=[]),
+            "trigger not found": self.workflow(task1=[]),
+        }
+        for problem, workflow_json in invalid.items():
+            with self.subTest(problem), self.assertRaises(WorkflowValidationError):
+                SavedTemplate.objects.create(template=self.template, shop=self.shop, workflow_json=workflow_json)
+
+        units = self.workflow(task0=[])
+        units["tasks"]["task0"]["properties"] = {"duration": 15, "units": "minutes"}
+        with self.assertRaisesMessage(WorkflowValidationError, "Invalid properties for task task0 of type delay"):
+            SavedTemplate(template=self.template, shop=self.shop, workflow_json=units).clean()
+        self.assertFalse(SavedTemplate.objects.exists())
+
+    def test_templated_properties_are_validated_when_rendered(self):
+        workflow_json = self.workflow(task0=[])
+        workflow_json["tasks"]["task0"]["properties"] = {"duration": "{{note_attributes.delay}}", "unit": "minutes"}
+        SavedTemplate.objects.create(template=self.template, shop=self.shop, workflow_json=workflow_json)
+
+        plan = get_active_templates("hephytest")[0].plan
+        self.assertTrue(plan.validated)
+        result = WorkflowExecutor().execute_workflow(plan, RuntimeData({"note_attributes": {"delay": "soon"}}))
+        self.assertEqual(result["status"], "failed")
+
+    def test_uncompiled_templates_load_in_one_query(self):
+        saved = SavedTemplate.objects.create(template=self.template, shop=self.shop,
+                                             workflow_json=self.workflow(task0=[]))
+        SavedTemplate.objects.filter(pk=saved.pk).update(compiled_workflow=None)
+
+        with self.assertNumQueries(1):
+            [cached] = get_active_templates("hephytest")
+        self.assertFalse(cached.plan.validated)
+
+    def test_default_template_is_valid(self):
+        default = Template.objects.get(name="1. Default Template - 15m delay notification")
+        self.assertEqual(validate_workflow(default.description), ["task0", "task1", "task2"])
+
+
+class ProcessTestCase(TestCase):
+    workflow_json = {"trigger": "task0", "tasks": {"task0": {
+        "id": "task0", "type": "condition",
+        "properties": {"condition_type": "if",
+                       "conditions": [{"field": "current_total_price", "operator": ">", "value": 40}],
+                       "context": {"current_total_price": 0}},
+        "next": [],
+    }}}
+
+    def setUp(self):
+        self.shop = Shop.objects.create(shop_id=56305123408, domain="hephytest")
+        template = Template.objects.create(name="Test template")
+        SavedTemplate.objects.create(template=template, shop=self.shop, workflow_json=self.workflow_json)
+        template_cache.invalidate()
+        self.addCleanup(template_cache.invalidate)
+        self.addCleanup(flush_stats)
+
+    def test_trigger_is_evaluated_against_order_payload(self):
+        results = process(sample_webhook_payload, self.shop, None)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["result"]["status"], "completed")
+
+        cheap_order = dict(sample_webhook_payload, current_total_price="9.99")
+        self.assertEqual(process(cheap_order, self.shop, None), [])
+        # Recorded for the flush threads of the commands, none was started here
+        self.assertIsNone(template_stats._thread)
+        self.assertIsNone(execution_rollups._thread)
+
+    def test_workflows_without_a_free_slot_are_queued(self):
+        with patch.object(workflow_pool, "max_per_key", 0):
+            results = process(sample_webhook_payload, self.shop, None)
+
+        self.assertEqual([result["status"] for result in results], ["queued"])
+        execution = WorkflowExecution.objects.get()
+        self.assertEqual((execution.state, execution.shop_domain), (ExecutionState.NEW, "hephytest"))
+
+
+class WorkflowWorkerMixin:
+    def setUp(self):
+        self.shop = Shop.objects.create(shop_id=56305123408, domain="hephytest")
+        self.template = SavedTemplate.objects.create(template=Template.objects.create(name="Test template"),
+                                                     shop=self.shop, workflow_json=ProcessTestCase.workflow_json)
+        template_cache.invalidate()
+        self.addCleanup(template_cache.invalidate)
+        self.addCleanup(flush_stats)
+
+    def queue(self, count=1):
+        with patch("cross_sell.processor.WORKFLOW_QUEUE", True):
+            for _ in range(count):
+                results = process(sample_webhook_payload, self.shop, None)
+        self.assertEqual(results, [{"status": "queued", "saved_template_id": self.template.id}])
+
+
+class WorkflowWorkerTestCase(WorkflowWorkerMixin, TestCase):
+    def test_queued_execution_is_claimed_run_and_released(self):
+        self.queue()
+        worker = WorkflowWorker(concurrency=2, worker_id="worker-1")
+
+        [execution] = worker.claim(10)
+        self.assertEqual((execution.state, execution.leased_by), (ExecutionState.IN_PROGRESS, "worker-1"))
+        self.assertEqual(worker.claim(10), [])
+
+        worker.execute(execution)
+        execution.refresh_from_db()
+        self.assertEqual((execution.state, execution.status), (ExecutionState.COMPLETE, "SUCCESS"))
+        self.assertEqual((execution.leased_by, execution.execution_history), (None, ["task0"]))
+
+    def test_expired_lease_is_reclaimed_and_fences_out_the_old_worker(self):
+        self.queue()
+        crashed = WorkflowWorker(lease_seconds=60, worker_id="crashed")
+        [execution] = crashed.claim(10)
+        WorkflowExecution.objects.filter(pk=execution.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        [reclaimed] = WorkflowWorker(worker_id="worker-2").claim(10)
+
+        self.assertEqual((reclaimed.pk, reclaimed.leased_by), (execution.pk, "worker-2"))
+        with self.assertRaises(LeaseLost):
+            crashed.execute(execution)
+
+
+    def test_claims_are_shared_fairly_between_shops(self):
+        Shop.objects.create(shop_id=1, domain="flashsale", workflow_weight=2)
+        ExecutionRepository.bulk_save(
+            WorkflowExecution(state=ExecutionState.NEW, status="PENDING", shop_domain=shop, workflow_data={})
+            for shop in ["flashsale"] * 50 + ["hephytest"] * 2)
+        worker = WorkflowWorker(concurrency=8, worker_id="worker-1")
+
+        self.assertEqual(worker.allocate(3), {"flashsale": 2, "hephytest": 1})
+        queues = worker.snapshot()
+        self.assertEqual((queues["flashsale"]["depth"], queues["flashsale"]["weight"]), (50, 2))
+
+        response = self.client.get("/cross-sell/analytics/queues")
+        self.assertEqual([(queue["shop_domain"], queue["depth"]) for queue in response.json()["shops"]],
+                         [("flashsale", 50), ("hephytest", 2)])
+        response = self.client.get("/cross-sell/analytics/queues", {"cap": 10})
+        self.assertEqual([(queue["shop_domain"], queue["depth"], queue["capped"]) for queue in response.json()["shops"]],
+                         [("flashsale", 10, True), ("hephytest", 2, False)])
+
+
+class WorkflowWorkerPoolTestCase(WorkflowWorkerMixin, TransactionTestCase):
+    def test_run_once_drains_the_queue(self):
+        self.queue(count=5)
+
+        WorkflowWorker(concurrency=2, batch_size=2, lease_seconds=3).run(poll_interval=0.05, once=True)
+
+        self.assertEqual(WorkflowExecution.objects.filter(state=ExecutionState.COMPLETE, status="SUCCESS").count(), 5)
+
+
+class TemplateStatsTestCase(TestCase):
+    def test_flush_applies_aggregated_counts_in_one_update(self):
+        shop = Shop.objects.create(shop_id=56305123408, domain="hephytest")
+        template = Template.objects.create(name="Test template")
+        first = SavedTemplate.objects.create(template=template, shop=shop, workflow_json=ProcessTestCase.workflow_json)
+        second = SavedTemplate.objects.create(template=template, shop=shop, workflow_json=ProcessTestCase.workflow_json)
+        stats = TemplateStats(interval=60, name="test-template-stats")
+        now = timezone.now()
+
+        with self.assertNumQueries(0):
+            stats._add(first.id, 1, now - timedelta(minutes=1))
+            stats._add(first.id, 1, now)
+            stats._add(second.id, 1, now)
+        with self.assertNumQueries(1):
+            stats.flush()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.execution_count, first.last_executed), (2, now))
+        self.assertEqual((second.execution_count, second.last_executed), (1, now))
+
+
+class ExecutionRollupsTestCase(TestCase):
+    def setUp(self):
+        self.rollups = ExecutionRollups(interval=60, name="test-execution-rollups")
+        self.hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+
+    def tearDown(self):
+        self.rollups.stop()
+
+    def test_flushes_are_merged_into_the_hourly_row(self):
+        self.rollups.record(7, 1, "hephytest", "completed", 0.01, self.hour)
+        self.rollups.record(7, 1, "hephytest", "failed", 0.02, self.hour + timedelta(minutes=5))
+        with self.assertNumQueries(1):
+            self.rollups.flush()
+        self.rollups.record(7, 1, "hephytest", "deferred", 0.01, self.hour + timedelta(minutes=10))
+        self.rollups.flush()
+
+        rollup = ExecutionRollup.objects.get(saved_template_id=7, hour=self.hour)
+        self.assertEqual((rollup.completed, rollup.failed, rollup.deferred), (1, 1, 1))
+        self.assertAlmostEqual(rollup.duration_total, 0.04)
+        self.assertEqual(sum(rollup.latency_buckets), 3)
+        self.assertEqual(len(rollup.latency_buckets), ExecutionRollup._meta.get_field("latency_buckets").size)
+
+    def test_analytics_endpoint_groups_by_template(self):
+        for seconds in (0.01, 0.01, 0.01, 1.5):
+            self.rollups.record(7, 1, "hephytest", "completed", seconds, self.hour)
+        self.rollups.record(7, 1, "hephytest", "failed", 0.01, self.hour)
+        self.rollups.record(8, 1, "other", "completed", 0.01, self.hour)
+        self.rollups.flush()
+
+        response = self.client.get("/cross-sell/analytics/executions", {"shop": "hephytest"})
+
+        self.assertEqual(response.status_code, 200)
+        [result] = response.json()["results"]
+        self.assertEqual((result["saved_template_id"], result["executions"], result["success_rate"]), (7, 5, 0.8))
+        self.assertLessEqual(result["p50_ms"], 12.8)
+        self.assertGreaterEqual(result["p99_ms"], 1500)
+
+    def test_analytics_endpoint_rejects_invalid_dates(self):
+        response = self.client.get("/cross-sell/analytics/executions", {"since": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+
+class EmailIntegrationTestCase(TestCase):
+    def test_email_integration_sends_one_message_per_recipient(self):
+        server = DebugSMTPServer(port=0).start()
+        self.addCleanup(server.stop)
+        pool = SMTPConnectionPool("127.0.0.1", server.port)
+        self.addCleanup(pool.close_all)
+
+        with patch("cross_sell.task_provider.email_pool", pool):
+            result = execute_integration_task({"integration_type": "email", "config": {
+                "recipients": ["a@example.com", "b@example.com"],
+                "subject": "Check out these related products!",
+                "content": "We noticed you purchased some items.",
+            }})
+
+        self.assertEqual((result["status"], result["sent"]), ("completed", 2))
+        self.assertEqual([m.recipients for m in server.messages], [["a@example.com"], ["b@example.com"]])
+
+
+class RateLimitedExecutionTestCase(TestCase):
+    workflow_json = {"trigger": "task0", "tasks": {"task0": {
+        "id": "task0", "type": "http",
+        "properties": {"url": "http://127.0.0.1:9/hook", "method": "POST"},
+        "next": [],
+    }}}
+
+    def test_throttled_task_is_deferred_and_paused(self):
+        shop = Shop.objects.create(shop_id=56305123408, domain="hephytest")
+        template = SavedTemplate.objects.create(template=Template.objects.create(name="Test template"),
+                                                shop=shop, workflow_json=self.workflow_json)
+        data = RuntimeData({"order": sample_webhook_payload, "shop": {"domain": "hephytest"}})
+        executor = WorkflowExecutor()
+        executor.task_handler = TaskHandler(rate_limiter=OutboundRateLimiter(
+            LocalRateLimiter(rate=1, burst=1), LocalRateLimiter(rate=1, burst=1)))
+        executor.task_handler.rate_limiter.shop_limiter.take("shop:hephytest")
+
+        result = executor.execute_workflow(self.workflow_json, data)
+        self.assertEqual((result["status"], result["resume_task"]), ("deferred", "task0"))
+
+        cached = CachedTemplate(id=template.id, template_id=template.template_id, plan=None)
+        execution = defer_execution(cached, data, result)
+        execution.refresh_from_db()
+        self.assertEqual(execution.state, ExecutionState.PAUSE)
+        self.assertEqual(execution.workflow_data["resume_task"], "task0")
+        self.assertGreater(execution.next_run_at, execution.start_time)
+
+
+@patch("cross_sell.views.SHOPIFY_SHARED_SECRET", "test-secret")
+class WebhookIngestionTestCase(TestCase):
+    def post(self, body, signature=None):
+        signature = signature or base64.b64encode(
+            hmac.new(b"test-secret", body, hashlib.sha256).digest()).decode()
+        return self.client.post("/cross-sell/webhook", body, content_type="application/json",
+                                headers={"X-Shopify-Topic": "orders/create",
+                                         "X-Shopify-Hmac-Sha256": signature,
+                                         "X-Shopify-Shop-Domain": "hephytest.myshopify.com"})
+
+    def test_signed_webhook_is_written_to_outbox(self):
+        response = self.post(json.dumps(sample_webhook_payload).encode())
+
+        self.assertEqual(response.status_code, 200)
+        event = WebhookEvents.objects.get()
+        self.assertEqual((event.order_id, event.shop_domain, event.processed), (5369501515856, "hephytest", False))
+
+    def test_redelivered_webhook_is_stored_once(self):
+        body = json.dumps(sample_webhook_payload).encode()
+        self.post(body)
+        self.post(body)
+
+        event = WebhookEvents.objects.get()
+        self.assertEqual(event.created_at, datetime.fromisoformat(sample_webhook_payload["created_at"]))
+
+    def test_invalid_signature_is_rejected(self):
+        response = self.post(json.dumps(sample_webhook_payload).encode(), signature="bm9wZQ==")
+
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(WebhookEvents.objects.exists())
+
+    def test_outbox_runs_workflows_of_webhook_orders(self):
+        shop = Shop.objects.create(shop_id=56305123408, domain="hephytest")
+        saved = SavedTemplate.objects.create(template=Template.objects.create(name="Test template"),
+                                             shop=shop, workflow_json=ProcessTestCase.workflow_json)
+        template_cache.invalidate()
+        self.addCleanup(template_cache.invalidate)
+        self.addCleanup(flush_stats)
+        self.post(json.dumps(sample_webhook_payload).encode())
+
+        outbox = WebhookOutbox()
+        self.assertEqual(outbox.run_once(), 1)
+        self.assertEqual(outbox.run_once(), 0)
+
+        event = WebhookEvents.objects.get()
+        self.assertEqual((event.processed, event.processing_error), (True, None))
+        self.assertTrue(Order.objects.filter(order_id=5369501515856).exists())
+        flush_stats()
+        saved.refresh_from_db()
+        self.assertEqual(saved.execution_count, 1)
+
+    def test_outbox_records_failed_events(self):
+        payload = dict(sample_webhook_payload, order_status_url=None)
+        self.post(json.dumps(payload).encode())
+
+        with self.assertLogs("cross_sell.outbox", "ERROR"):
+            WebhookOutbox().run_once()
+
+        event = WebhookEvents.objects.get()
+        self.assertEqual((event.processed, event.processing_error), (True, "Unknown shop hephytest"))
+
+    def test_outbox_reclaims_events_of_a_consumer_that_died(self):
+        self.post(json.dumps(sample_webhook_payload).encode())
+        # Claimed by a consumer that never gets to process them
+        self.assertEqual(len(WebhookOutbox().claim()), 1)
+
+        outbox = WebhookOutbox()
+        self.assertEqual(outbox.claim(), [])
+        WebhookEvents.objects.update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        with patch("cross_sell.outbox.handle_event") as handle_event:
+            self.assertEqual(outbox.run_once(), 1)
+
+        handle_event.assert_called_once()
+        event = WebhookEvents.objects.get()
+        self.assertEqual((event.processed, event.lease_expires_at), (True, None))
+
+
+class WebhookListingTestCase(TestCase):
+    def setUp(self):
+        WebhookEvents.objects.bulk_create(
+            WebhookEvents(order_id=order_id, webhook_data={}, shop_domain="hephytest" if order_id % 2 else "other",
+                          event_type="orders/create", processed=order_id > 3)
+            for order_id in range(1, 6))
+
+    async def get(self, **params):
+        response = await self.async_client.get("/cross-sell/webhook", params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b"".join([chunk async for chunk in response.streaming_content]))
+
+    async def test_pages_follow_the_cursor_until_exhausted(self):
+        first = await self.get(limit=2)
+        second = await self.get(limit=2, cursor=first["next"])
+        third = await self.get(limit=2, cursor=second["next"])
+
+        order_ids = [event["order_id"] for page in (first, second, third) for event in page["events"]]
+        self.assertEqual(order_ids, [5, 4, 3, 2, 1])
+        self.assertIsNone(third["next"])
+
+    async def test_filters_on_shop_and_processed(self):
+        page = await self.get(shop="hephytest", processed="false")
+
+        self.assertEqual([event["order_id"] for event in page["events"]], [3, 1])
+
+    @patch("core.db_router.replica_configured", return_value=True)
+    async def test_shop_listing_checks_the_replica_pin(self, _):
+        # Pinned, so the listing reads the primary, the only database of the tests
+        await sync_to_async(pin_to_primary)("hephytest")
+
+        page = await self.get(shop="hephytest")
+
+        self.assertEqual([event["order_id"] for event in page["events"]], [5, 3, 1])
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.client.get("/cross-sell/webhook", {"cursor": "nope"}).status_code, 400)
+
+    def test_wsgi_requests_stream_synchronously(self):
+        response = self.client.get("/cross-sell/webhook", {"limit": 2})
+
+        # Served over WSGI, an async iterator would be buffered whole instead of streamed
+        self.assertFalse(response.is_async)
+        page = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([event["order_id"] for event in page["events"]], [5, 4])
@@ -4,5 +4,7 @@ from . import views
 
 urlpatterns = {
     path("webhook", views.webhook, name="webhook"),
+    path("analytics/executions", views.execution_analytics, name="execution_analytics"),
+    path("analytics/queues", views.queue_analytics, name="queue_analytics"),
     path("", views.index, name="index")
 }
@@ -1,12 +1,32 @@
-from core.repository.workflow_repository import WebhookRepository
-from django.http import HttpResponse
-from django.views.decorators.csrf import csrf_exempt
-import json
-from django.http import JsonResponse
-import hmac
+import base64
 import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import router
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+
+from core.db_router import pin_to_primary, read_replica
+from core.metrics import BUCKET_BOUNDS, bucket_quantile
+from core.repository.execution_repository import ExecutionRepository
+from core.pagination import keyset_page, iter_json_page, stream_json_page, InvalidCursor
+from core.repository.workflow_repository import WebhookRepository
 from hephestos.settings import SHOPIFY_SHARED_SECRET
-from cross_sell.models import *
+from cross_sell.execution_rollups import hour_of
+from cross_sell.models import ExecutionRollup, WebhookEvents, ShopifyEventType
+from shopify.processor import parse_shop_url
+
+EVENTS_PAGE_SIZE = 100
+EVENTS_MAX_PAGE_SIZE = 10000
+QUEUE_DEPTH_CAP = 1000
+QUEUE_DEPTH_MAX_CAP = 100000
+ANALYTICS_DEFAULT_WINDOW = timedelta(hours=24)
 
 
 # Create your views here.
@@ -16,50 +36,192 @@ def index(request):
 
 
 @csrf_exempt
-def webhook(request):
-    # verify webhook signature
-
+async def webhook(request):
     if request.method == "POST" and request.content_type == "application/json":
-        event_type = request.headers.get('X-Shopify-Topic')
+        # Shopify drops webhooks that are slow to answer, so only verify and persist here.
+        # The event is processed from the outbox by manage.py webhook_outbox.
+        if not verify_webhook_signature(request):
+            return JsonResponse({'error': 'Invalid signature'}, status=401)
 
-        if event_type != str(ShopifyEventType.ORDERS_CREATE.value):
+        if request.headers.get('X-Shopify-Topic') != ShopifyEventType.ORDERS_CREATE:
             return JsonResponse({'status': 'success'}, status=200)
-        # TODO: verify not working right now
-        # if not verify_webhook_signature(request):
-        #     return JsonResponse({'error': 'Invalid signature'}, status=400)
-
-        # persist data
-        body_data = json.loads(request.body.decode('utf-8'))
-        webhook_data = ""
-        WebhookRepository.save(webhook_data)
 
-        # send this data for further processing
+        try:
+            event = build_webhook_event(request.body, request.headers.get('X-Shopify-Shop-Domain'))
+        except (json.JSONDecodeError, UnicodeDecodeError, ValueError):
+            return JsonResponse({'error': 'Invalid payload'}, status=400)
+        if event is not None:
+            await WebhookRepository.abulk_save([event])
+            await sync_to_async(pin_to_primary)(event.shop_domain)
 
         return JsonResponse({'status': 'success'}, status=200)
     elif request.method == "GET":
-
-        items = (WebhookRepository.get_all()).values()
-        json_data = list(items)
-
-        return JsonResponse(json_data, safe=False)
+        # The listing checks the shop's replica pin with a blocking query, keep it off the event loop
+        return await sync_to_async(list_webhook_events)(request)
     # unidentified webhook received log this to errors
     else:
         return JsonResponse({'status': 'success'}, status=200)
 
 
+def list_webhook_events(request):
+    """
+    Newest-first page of webhook events, streamed as JSON.
+
+    Query parameters: shop, order_id, processed (true/false), limit and cursor (the "next" value of
+    the previous page).
+    """
+    with read_replica(request.GET.get("shop")):
+        # Rows are read while the response streams, after this view returns, so bind the alias now
+        events = WebhookRepository.get_all().using(router.db_for_read(WebhookEvents))
+    try:
+        if request.GET.get("shop"):
+            events = events.filter(shop_domain=request.GET["shop"])
+        if request.GET.get("order_id"):
+            events = events.filter(order_id=int(request.GET["order_id"]))
+        if request.GET.get("processed"):
+            events = events.filter(processed=request.GET["processed"].lower() in ("1", "true"))
+        limit = min(max(int(request.GET.get("limit", EVENTS_PAGE_SIZE)), 1), EVENTS_MAX_PAGE_SIZE)
+        events = keyset_page(events, request.GET.get("cursor"))
+    except (ValueError, InvalidCursor) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # Each server type only streams its own kind of iterator, the other one is buffered whole
+    stream = stream_json_page if isinstance(request, ASGIRequest) else iter_json_page
+    return StreamingHttpResponse(stream(events.values(), "events", limit), content_type="application/json")
+
+
+def _parse_time(value, default: datetime) -> datetime:
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid datetime: {value}")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, timezone.utc)
+
+
+def _summarize(key, rollups) -> dict:
+    completed = sum(rollup.completed for rollup in rollups)
+    failed = sum(rollup.failed for rollup in rollups)
+    deferred = sum(rollup.deferred for rollup in rollups)
+    total = completed + failed + deferred
+    buckets = [sum(counts) for counts in zip(*(rollup.latency_buckets for rollup in rollups))]
+    return {
+        **key,
+        "executions": total,
+        "completed": completed,
+        "failed": failed,
+        "deferred": deferred,
+        "success_rate": round(completed / (completed + failed), 4) if completed + failed else None,
+        "mean_ms": round(sum(rollup.duration_total for rollup in rollups) / total * 1000, 3) if total else 0.0,
+        **{f"p{int(q * 100)}_ms": round(bucket_quantile(buckets, q, BUCKET_BOUNDS[-1]) * 1000, 3)
+           for q in (0.5, 0.95, 0.99)},
+    }
+
+
+def execution_analytics(request):
+    """
+    Workflow execution stats from the hourly rollups, as JSON.
+
+    Query parameters: shop, saved_template_id, since and until (ISO datetimes, default the last 24 hours)
+    and group_by ("template", the default, or "hour"). Latency percentiles are bucket upper bounds.
+    """
+    try:
+        until = _parse_time(request.GET.get("until"), timezone.now())
+        since = _parse_time(request.GET.get("since"), until - ANALYTICS_DEFAULT_WINDOW)
+        group_by = request.GET.get("group_by", "template")
+        if group_by not in ("template", "hour"):
+            raise ValueError(f"Invalid group_by: {group_by}")
+        with read_replica(request.GET.get("shop")):
+            rollups = ExecutionRollup.objects.filter(hour__gte=hour_of(since), hour__lt=until)
+            if request.GET.get("shop"):
+                rollups = rollups.filter(shop_domain=request.GET["shop"])
+            if request.GET.get("saved_template_id"):
+                rollups = rollups.filter(saved_template_id=int(request.GET["saved_template_id"]))
+            rollups = list(rollups.order_by("hour"))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    groups = {}
+    for rollup in rollups:
+        if group_by == "hour":
+            key = (rollup.hour,)
+        else:
+            key = (rollup.saved_template_id, rollup.template_id, rollup.shop_domain)
+        groups.setdefault(key, []).append(rollup)
+
+    if group_by == "hour":
+        results = [_summarize({"hour": hour.isoformat()}, group) for (hour,), group in groups.items()]
+    else:
+        results = [_summarize({"saved_template_id": saved_template_id, "template_id": template_id,
+                               "shop_domain": shop_domain}, group)
+                   for (saved_template_id, template_id, shop_domain), group in groups.items()]
+    return JsonResponse({"since": since.isoformat(), "until": until.isoformat(), "results": results})
+
+
+def queue_analytics(request):
+    """
+    Workflow executions waiting for a worker, per shop: how many, and for how long the oldest
+    has been due. Read from the primary, since replica lag would hide the newest backlog.
+
+    Query parameters: cap, the most executions counted per shop (default QUEUE_DEPTH_CAP), so a
+    large backlog is not read whole. "capped" marks the shops whose depth is at least that.
+    """
+    try:
+        cap = min(max(int(request.GET.get("cap", QUEUE_DEPTH_CAP)), 1), QUEUE_DEPTH_MAX_CAP)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    now = timezone.now()
+    depths = ExecutionRepository.queue_depths(now, cap=cap)
+    shops = [{"shop_domain": shop,
+              "depth": depth,
+              "capped": depth >= cap,
+              "oldest_wait_seconds": round(max((now - oldest).total_seconds(), 0), 3)}
+             for shop, (depth, oldest) in depths.items()]
+    shops.sort(key=lambda queue: queue["depth"], reverse=True)
+    return JsonResponse({"time": now.isoformat(), "cap": cap, "shops": shops})
+
+
+def build_webhook_event(body, header_domain=None):
+    """
+    Build the outbox row for an orders/create payload, reading only the keys needed for routing.
+
+    Returns:
+        The unsaved WebhookEvents, or None if the payload has no order id or creation time
+    """
+    payload = json.loads(body)
+    if not isinstance(payload, dict):
+        raise ValueError("Webhook payload is not an object")
+    order_id = payload.get("id")
+    created_at = payload.get("created_at")
+    if order_id is None or created_at is None:
+        return None
+
+    try:
+        shop_domain, _ = parse_shop_url(payload.get("order_status_url") or "")
+    except IndexError:
+        # e.g. "hephytest.myshopify.com" -> "hephytest"
+        shop_domain = (header_domain or "").split(".")[0]
+    if not shop_domain:
+        raise ValueError("Webhook payload has no shop domain")
+
+    return WebhookEvents(order_id=order_id,
+                         created_at=created_at,
+                         webhook_data=payload,
+                         shop_domain=shop_domain,
+                         event_type=ShopifyEventType.ORDERS_CREATE)
+
+
 def verify_webhook_signature(request):
-    # Get the signature from the header
+    """Check the X-Shopify-Hmac-Sha256 header against the HMAC-SHA256 of the raw request body."""
     received_signature = request.headers.get('X-Shopify-Hmac-Sha256')
+    if not received_signature or not SHOPIFY_SHARED_SECRET:
+        return False
 
-    # Compute the HMAC-SHA256 hash of the request body
     computed_signature = hmac.new(
         SHOPIFY_SHARED_SECRET.encode('utf-8'),
-        request.get_data(),
+        request.body,
         hashlib.sha256
     ).digest()
 
-    # Encode the computed signature to base64
-    computed_signature_base64 = computed_signature.hex()
-
-    # Compare the computed signature with the received signature
-    return hmac.compare_digest(received_signature, computed_signature_base64)
+    # Shopify sends the digest base64 encoded, compare in constant time
+    return hmac.compare_digest(received_signature.encode('utf-8'), base64.b64encode(computed_signature))
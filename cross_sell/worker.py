@@ -0,0 +1,267 @@
+# cross_sell/worker.py
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from core.context_binder import RuntimeData
+from core.executor_pool import BoundedExecutor
+from core.log import log_context
+from core.metrics import StageTimers
+from core.models import WorkflowExecution, ExecutionState, Status
+from core.repository.execution_repository import ExecutionRepository
+from core.scheduling import DeficitRoundRobin
+from cross_sell.processor import run_template
+from cross_sell.template_cache import CachedTemplate, get_active_templates
+from hephestos.settings import (WORKFLOW_WORKER_CONCURRENCY, WORKFLOW_WORKER_BATCH_SIZE, WORKFLOW_MAX_PER_SHOP,
+                                WORKFLOW_LEASE_SECONDS, WORKFLOW_MAX_RETRIES, WORKFLOW_RETRY_BACKOFF)
+from shopify.models import Shop
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """Raised when an execution was reclaimed by another worker while this one ran it."""
+
+
+class WorkflowWorker:
+    """
+    Runs queued WorkflowExecution rows: new ones, retries and paused ones that are due.
+
+    Executions are claimed in batches with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+    workers can poll the same table without a broker and without running an execution twice.
+    A claimed execution is leased to this worker for `lease_seconds`, renewed by a heartbeat
+    thread while it runs. If the worker dies the lease runs out and another worker reclaims it.
+    Every state change of a claimed execution is conditional on still holding its lease.
+
+    Executions queue per shop (WorkflowExecution.shop_domain). The free slots are split between
+    the shops with a backlog by deficit round robin, weighted by Shop.workflow_weight, so a shop
+    with a flash sale backlog does not delay the workflows of the others.
+    """
+
+    def __init__(self, concurrency: int = WORKFLOW_WORKER_CONCURRENCY, batch_size: int = WORKFLOW_WORKER_BATCH_SIZE,
+                 lease_seconds: float = WORKFLOW_LEASE_SECONDS, max_retries: int = WORKFLOW_MAX_RETRIES,
+                 retry_backoff: float = WORKFLOW_RETRY_BACKOFF, worker_id: Optional[str] = None):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.pool = BoundedExecutor(max_workers=concurrency, max_per_key=min(WORKFLOW_MAX_PER_SHOP, concurrency),
+                                    thread_name_prefix="worker")
+        self.scheduler = DeficitRoundRobin()
+        # Time from due to claimed, per shop
+        self.wait_timers = StageTimers()
+        self._queues: Dict[Optional[str], Dict[str, Any]] = {}
+        self._running: Dict[int, WorkflowExecution] = {}
+        self._running_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat_stopped = threading.Event()
+
+    def claim(self, limit: int, shop_domain: Optional[str] = None, any_shop: bool = True) -> List[WorkflowExecution]:
+        """Claim up to `limit` executions, of any shop or only of `shop_domain` when `any_shop` is off."""
+        now = timezone.now()
+        queryset = ExecutionRepository.claimable(now)
+        if not any_shop:
+            queryset = queryset.filter(shop_domain=shop_domain) if shop_domain is not None \
+                else queryset.filter(shop_domain__isnull=True)
+        executions = ExecutionRepository.claim_batch(
+            queryset, limit,
+            state=ExecutionState.IN_PROGRESS,
+            status=Status.RUNNING,
+            leased_by=self.worker_id,
+            lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+        )
+        for execution in executions:
+            due = max(filter(None, (execution.next_run_at, execution.start_time)))
+            self.wait_timers.record(execution.shop_domain or "", max((now - due).total_seconds(), 0))
+        return executions
+
+    def allocate(self, limit: int) -> Dict[Optional[str], int]:
+        """
+        Split `limit` claims between the shops with claimable executions.
+
+        A shop is never given more than its free slots in the pool (WORKFLOW_MAX_PER_SHOP), so
+        submitting what was claimed does not wait.
+        """
+        now = timezone.now()
+        # No shop can be given more than its free slots, counting further only costs time
+        depths = ExecutionRepository.queue_depths(now, cap=max(self.batch_size, self.pool.max_per_key))
+        weights = dict(Shop.objects.filter(domain__in=[shop for shop in depths if shop])
+                       .values_list("domain", "workflow_weight"))
+        self._queues = {shop: {"depth": depth,
+                               "oldest_wait_ms": round(max((now - oldest).total_seconds(), 0) * 1000, 3),
+                               "weight": weights.get(shop, 1)}
+                        for shop, (depth, oldest) in depths.items()}
+        capacity = {shop: min(depth, self.pool.max_per_key - self.pool.in_flight(shop or ""))
+                    for shop, (depth, _) in depths.items()}
+        return self.scheduler.allocate(capacity, weights, limit)
+
+    def run_once(self) -> int:
+        """
+        Claim as many executions as there are idle slots, shared fairly between shops, and
+        submit them to the pool.
+
+        Returns:
+            The number of executions claimed
+        """
+        limit = min(self.batch_size, self.pool.idle_slots)
+        if limit <= 0:
+            return 0
+        claimed = 0
+        for shop, count in self.allocate(limit).items():
+            for execution in self.claim(count, shop, any_shop=False):
+                self.submit(execution)
+                claimed += 1
+        return claimed
+
+    def submit(self, execution: WorkflowExecution) -> None:
+        with self._running_lock:
+            self._running[execution.pk] = execution
+        self.pool.submit(execution.shop_domain or "", lambda: self._run(execution))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-shop queue depth (counted up to the batch size), oldest wait, weight, scheduler deficit
+        and claim wait times, as last seen.
+        """
+        waits = self.wait_timers.snapshot()
+        return {shop or "": {**queue,
+                             "deficit": round(self.scheduler.deficit(shop), 3),
+                             "running": self.pool.in_flight(shop or ""),
+                             "wait": waits.get(shop or "", {})}
+                for shop, queue in self._queues.items()}
+
+    def _run(self, execution: WorkflowExecution) -> None:
+        try:
+            with log_context(execution_id=execution.pk):
+                self.execute(execution)
+        except LeaseLost:
+            logger.warning("Lease lost, execution was reclaimed by another worker", extra={"execution_id": execution.pk})
+        except Exception as e:
+            logger.exception("Execution failed: %s", e, extra={"execution_id": execution.pk})
+            try:
+                self._fail(execution, str(e))
+            except LeaseLost:
+                pass
+        finally:
+            with self._running_lock:
+                self._running.pop(execution.pk, None)
+            # Pool threads keep no connection between executions, so none outlives the worker
+            # (with DB_POOL this returns it to the pool)
+            connection.close()
+
+    def execute(self, execution: WorkflowExecution) -> Dict:
+        """Run one claimed execution and record its outcome."""
+        workflow_data = execution.workflow_data
+        data = RuntimeData(workflow_data.get("data") or {})
+        template = self._template(workflow_data.get("saved_template_id"), data.resolve("shop.domain"))
+        if template is None:
+            self._finish(execution, status=Status.FAILED, error_message="Template is no longer active")
+            return {"status": "failed", "error": "Template is no longer active"}
+
+        result = run_template(template, data, start_task=workflow_data.get("resume_task"), persist_deferred=False)
+        history = execution.execution_history + result.get("execution_path", [])
+        if result["status"] == "deferred":
+            self._update(execution,
+                         state=ExecutionState.PAUSE,
+                         status=Status.PENDING,
+                         workflow_data={**workflow_data, "resume_task": result["resume_task"]},
+                         execution_history=history,
+                         next_run_at=timezone.now() + timedelta(seconds=result["retry_after"]))
+        elif result["status"] == "failed":
+            self._fail(execution, result.get("error"), execution_history=history)
+        else:
+            self._finish(execution, status=Status.SUCCESS, execution_history=history)
+        return result
+
+    @staticmethod
+    def _template(saved_template_id: Optional[int], shop_domain: Optional[str]) -> Optional[CachedTemplate]:
+        if saved_template_id is None or not shop_domain:
+            return None
+        return next((template for template in get_active_templates(shop_domain)
+                     if template.id == saved_template_id), None)
+
+    def _fail(self, execution: WorkflowExecution, error: Optional[str], **changes) -> None:
+        if execution.retry_count >= self.max_retries:
+            self._finish(execution, status=Status.FAILED, error_message=error, **changes)
+            return
+        self._update(execution,
+                     state=ExecutionState.RETRY,
+                     status=Status.PENDING,
+                     retry=True,
+                     retry_count=execution.retry_count + 1,
+                     error_message=error,
+                     next_run_at=timezone.now() + timedelta(seconds=self.retry_backoff * 2 ** execution.retry_count),
+                     **changes)
+
+    def _finish(self, execution: WorkflowExecution, **changes) -> None:
+        end_time = timezone.now()
+        self._update(execution, state=ExecutionState.COMPLETE, end_time=end_time,
+                     duration=end_time - execution.start_time, **changes)
+
+    def _update(self, execution: WorkflowExecution, **changes) -> None:
+        """Apply changes and release the lease, if this worker still holds it."""
+        updated = WorkflowExecution.objects.filter(pk=execution.pk, leased_by=self.worker_id).update(
+            leased_by=None, lease_expires_at=None, update_time=timezone.now(), **changes)
+        if not updated:
+            raise LeaseLost(execution.pk)
+
+    def heartbeat(self) -> int:
+        """
+        Renew the leases of the executions running in this worker.
+
+        Returns:
+            The number of leases renewed
+        """
+        with self._running_lock:
+            running = list(self._running)
+        if not running:
+            return 0
+        return WorkflowExecution.objects.filter(pk__in=running, leased_by=self.worker_id).update(
+            lease_expires_at=timezone.now() + timedelta(seconds=self.lease_seconds))
+
+    def _heartbeat_loop(self) -> None:
+        while not self._heartbeat_stopped.wait(self.lease_seconds / 3):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.warning("Lease renewal failed: %s", e)
+            finally:
+                connection.close()
+
+    @property
+    def running(self) -> int:
+        with self._running_lock:
+            return len(self._running)
+
+    def run(self, poll_interval: float, once: bool = False) -> None:
+        """
+        Claim and run executions until stop() is called, or until nothing is left with `once`.
+        """
+        threading.Thread(target=self._heartbeat_loop, name="worker-heartbeat", daemon=True).start()
+        try:
+            while not self._stopped.is_set():
+                try:
+                    claimed = self.run_once()
+                except Exception as e:
+                    logger.warning("Claiming executions failed: %s", e)
+                    claimed = 0
+                finally:
+                    close_old_connections()
+                if once and not claimed and not self.running:
+                    break
+                if not claimed:
+                    self._stopped.wait(poll_interval)
+        finally:
+            # Let running executions finish, their leases stay renewed until then
+            self.pool.shutdown(wait=True)
+            self._heartbeat_stopped.set()
+
+    def stop(self) -> None:
+        self._stopped.set()
@@ -134,4 +134,178 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 GOOGLE_SUBSCRIPTION_ID = 'shopify'
-GOOGLE_PROJECT_ID = 'quantum-reducer-434016-m2'
\ No newline at end of file
+GOOGLE_PROJECT_ID = 'quantum-reducer-434016-m2'
+
+# Workflow settings
+# Seconds a shop's active templates stay cached in a process. Local edits invalidate the cache
+# immediately, the TTL bounds how long edits made by other processes can go unnoticed.
+TEMPLATE_CACHE_TTL = env.float('TEMPLATE_CACHE_TTL', default=30)
+# Matched workflows of an order run concurrently on a shared pool. WORKFLOW_MAX_WORKERS caps the
+# pool, WORKFLOW_MAX_PER_SHOP caps a single shop and WORKFLOW_ORDER_DEADLINE (seconds) bounds an order.
+WORKFLOW_MAX_WORKERS = env.int('WORKFLOW_MAX_WORKERS', default=16)
+WORKFLOW_MAX_PER_SHOP = env.int('WORKFLOW_MAX_PER_SHOP', default=4)
+WORKFLOW_ORDER_DEADLINE = env.float('WORKFLOW_ORDER_DEADLINE', default=30)
+# Workflows that find no free slot in that pool are stored as NEW executions for manage.py workflow_worker,
+# which shares its slots fairly between shops. With WORKFLOW_QUEUE, every matched workflow is stored
+# instead of running in the subscriber. Workers run WORKFLOW_WORKER_CONCURRENCY executions at a time,
+# hold each under a lease of WORKFLOW_LEASE_SECONDS renewed while it runs, and retry failed ones up
+# to WORKFLOW_MAX_RETRIES times, WORKFLOW_RETRY_BACKOFF seconds apart (doubling each time).
+WORKFLOW_QUEUE = env.bool('WORKFLOW_QUEUE', default=False)
+WORKFLOW_WORKER_CONCURRENCY = env.int('WORKFLOW_WORKER_CONCURRENCY', default=8)
+WORKFLOW_WORKER_BATCH_SIZE = env.int('WORKFLOW_WORKER_BATCH_SIZE', default=50)
+WORKFLOW_WORKER_POLL_INTERVAL = env.float('WORKFLOW_WORKER_POLL_INTERVAL', default=1)
+WORKFLOW_LEASE_SECONDS = env.float('WORKFLOW_LEASE_SECONDS', default=60)
+WORKFLOW_MAX_RETRIES = env.int('WORKFLOW_MAX_RETRIES', default=3)
+WORKFLOW_RETRY_BACKOFF = env.float('WORKFLOW_RETRY_BACKOFF', default=30)
+# Orders received by the webhook view are processed by manage.py webhook_outbox, which claims up to
+# WEBHOOK_OUTBOX_BATCH_SIZE events at a time and polls every WEBHOOK_OUTBOX_POLL_INTERVAL seconds when idle.
+# A batch is leased for WEBHOOK_OUTBOX_LEASE_SECONDS, which must cover processing all of it, after
+# which the events left unprocessed (e.g. by a crashed consumer) are claimed again.
+WEBHOOK_OUTBOX_BATCH_SIZE = env.int('WEBHOOK_OUTBOX_BATCH_SIZE', default=20)
+WEBHOOK_OUTBOX_POLL_INTERVAL = env.float('WEBHOOK_OUTBOX_POLL_INTERVAL', default=1)
+WEBHOOK_OUTBOX_LEASE_SECONDS = env.float('WEBHOOK_OUTBOX_LEASE_SECONDS', default=300)
+# Seconds between batched writes of SavedTemplate execution stats
+TEMPLATE_STATS_FLUSH_INTERVAL = env.float('TEMPLATE_STATS_FLUSH_INTERVAL', default=5)
+# Seconds between batched upserts of the hourly execution rollups behind the analytics endpoint
+EXECUTION_ROLLUP_FLUSH_INTERVAL = env.float('EXECUTION_ROLLUP_FLUSH_INTERVAL', default=10)
+
+# Outbound HTTP settings (http tasks)
+# Keep-alive connections per host, which also caps concurrent requests to a host
+HTTP_MAX_CONNECTIONS_PER_HOST = env.int('HTTP_MAX_CONNECTIONS_PER_HOST', default=10)
+HTTP_MAX_HOSTS = env.int('HTTP_MAX_HOSTS', default=100)
+HTTP_CONNECT_TIMEOUT = env.float('HTTP_CONNECT_TIMEOUT', default=3)
+HTTP_READ_TIMEOUT = env.float('HTTP_READ_TIMEOUT', default=10)
+# Seconds a request waits for a free connection to its host
+HTTP_POOL_TIMEOUT = env.float('HTTP_POOL_TIMEOUT', default=5)
+HTTP_MAX_RESPONSE_BYTES = env.int('HTTP_MAX_RESPONSE_BYTES', default=1024 * 1024)
+# Response cache for http tasks with "cache" enabled. Entries evicted from memory spill over to
+# HTTP_CACHE_DISK_DIR when it is set.
+HTTP_CACHE_MAX_ENTRIES = env.int('HTTP_CACHE_MAX_ENTRIES', default=1024)
+HTTP_CACHE_MAX_BYTES = env.int('HTTP_CACHE_MAX_BYTES', default=64 * 1024 * 1024)
+HTTP_CACHE_DISK_DIR = env('HTTP_CACHE_DISK_DIR', default=None)
+HTTP_CACHE_MAX_DISK_ENTRIES = env.int('HTTP_CACHE_MAX_DISK_ENTRIES', default=10000)
+
+# Outbound rate limits (http and integration tasks)
+# Token buckets per shop and per destination (host, SMTP relay): RATE tokens/second, up to BURST.
+# "local" keeps buckets per process, "postgres" shares them between processes.
+RATE_LIMIT_BACKEND = env('RATE_LIMIT_BACKEND', default='local')
+RATE_LIMIT_SHOP_RATE = env.float('RATE_LIMIT_SHOP_RATE', default=10)
+RATE_LIMIT_SHOP_BURST = env.float('RATE_LIMIT_SHOP_BURST', default=50)
+RATE_LIMIT_DESTINATION_RATE = env.float('RATE_LIMIT_DESTINATION_RATE', default=50)
+RATE_LIMIT_DESTINATION_BURST = env.float('RATE_LIMIT_DESTINATION_BURST', default=100)
+
+# Email settings (email integration tasks)
+# Defaults point at the local debugging server: python manage.py smtp_debug_server
+EMAIL_HOST = env('EMAIL_HOST', default='localhost')
+EMAIL_PORT = env.int('EMAIL_PORT', default=1025)
+EMAIL_HOST_USER = env('EMAIL_HOST_USER', default=None)
+EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default=None)
+EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', default=False)
+EMAIL_USE_SSL = env.bool('EMAIL_USE_SSL', default=False)
+EMAIL_TIMEOUT = env.float('EMAIL_TIMEOUT', default=10)
+# Persistent SMTP connections per process
+EMAIL_POOL_SIZE = env.int('EMAIL_POOL_SIZE', default=4)
+DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default='no-reply@hephestos.local')
+
+# History tables (webhook events, workflow executions) are partitioned by month.
+# python manage.py partitions creates PARTITION_MONTHS_AHEAD months in advance, and with --archive
+# moves partitions older than the retention to PARTITION_ARCHIVE_DIR as gzipped JSONL.
+PARTITION_MONTHS_AHEAD = env.int('PARTITION_MONTHS_AHEAD', default=3)
+PARTITION_ARCHIVE_DIR = env('PARTITION_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+WEBHOOK_EVENTS_RETENTION_MONTHS = env.int('WEBHOOK_EVENTS_RETENTION_MONTHS', default=6)
+WORKFLOW_EXECUTION_RETENTION_MONTHS = env.int('WORKFLOW_EXECUTION_RETENTION_MONTHS', default=12)
+
+# Pub/Sub subscriber
+# Messages leased at once, and the threads running callbacks on them
+SUBSCRIBER_MAX_MESSAGES = env.int('SUBSCRIBER_MAX_MESSAGES', default=100)
+SUBSCRIBER_THREADS = env.int('SUBSCRIBER_THREADS', default=10)
+
+# Database connections
+# DB_POOL shares a psycopg connection pool between threads. The default size
+# gives every subscriber callback thread and workflow worker a connection, plus two spare.
+# Without the pool each thread keeps its own connection for DB_CONN_MAX_AGE seconds.
+DB_POOL = env.bool('DB_POOL', default=False)
+DB_POOL_MIN_SIZE = env.int('DB_POOL_MIN_SIZE', default=2)
+DB_POOL_MAX_SIZE = env.int('DB_POOL_MAX_SIZE', default=SUBSCRIBER_THREADS + WORKFLOW_MAX_WORKERS + 2)
+# Seconds to wait for a free connection, and before an idle connection above the minimum is closed
+DB_POOL_TIMEOUT = env.float('DB_POOL_TIMEOUT', default=10)
+DB_POOL_MAX_IDLE = env.float('DB_POOL_MAX_IDLE', default=300)
+DB_CONN_MAX_AGE = env.int('DB_CONN_MAX_AGE', default=60)
+
+# Connections are checked before use in both modes
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if DB_POOL:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_idle': DB_POOL_MAX_IDLE,
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+
+# Read replica
+# When DATABASE_REPLICA_HOST is set, read-only paths (webhook listing, analytics) read from it.
+# Reads stay on the primary for REPLICA_PIN_SECONDS after a write, so fresh ingestion is visible. A
+# shop pinned by ingestion (core_replica_pin) is pinned in every process, a thread's own writes only in it.
+DATABASE_REPLICA_HOST = env('DATABASE_REPLICA_HOST', default=None)
+REPLICA_PIN_SECONDS = env.float('REPLICA_PIN_SECONDS', default=5)
+if DATABASE_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DATABASE_REPLICA_HOST,
+        'PORT': env('DATABASE_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        # Tests read the replica through the test database
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+
+# Subscriber profiling
+# Sampling profiles (folded stacks, readable by flame graph tools) are written to PROFILE_DIR.
+# Arm with kill -USR2 <subscriber pid> or manage.py subscriber --profile N.
+PROFILE_DIR = env('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILE_MESSAGES = env.int('PROFILE_MESSAGES', default=100)
+# Seconds between stack samples
+PROFILE_INTERVAL = env.float('PROFILE_INTERVAL', default=0.005)
+
+# Tracing
+# Spans of TRACE_SAMPLE_RATE of the orders are kept in an in-memory ring of TRACE_BUFFER_SIZE
+# spans and exported as OTLP/JSON every TRACE_EXPORT_INTERVAL seconds, appended to
+# TRACE_EXPORT_FILE and/or POSTed to TRACE_EXPORT_ENDPOINT (e.g. http://localhost:4318/v1/traces).
+TRACE_SAMPLE_RATE = env.float('TRACE_SAMPLE_RATE', default=0.01)
+TRACE_BUFFER_SIZE = env.int('TRACE_BUFFER_SIZE', default=10000)
+TRACE_EXPORT_FILE = env('TRACE_EXPORT_FILE', default='')
+TRACE_EXPORT_ENDPOINT = env('TRACE_EXPORT_ENDPOINT', default='')
+TRACE_EXPORT_INTERVAL = env.float('TRACE_EXPORT_INTERVAL', default=5)
+
+# Logging
+# Structured JSON lines, written to stdout from a background thread. LOG_SAMPLE_RATE keeps that
+# share of DEBUG/INFO records (warnings and errors are always kept). Full payloads are only
+# logged with LOG_PAYLOADS.
+LOG_LEVEL = env('LOG_LEVEL', default='INFO')
+LOG_SAMPLE_RATE = env.float('LOG_SAMPLE_RATE', default=1.0)
+LOG_PAYLOADS = env.bool('LOG_PAYLOADS', default=False)
+LOG_QUEUE_SIZE = env.int('LOG_QUEUE_SIZE', default=10000)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'context': {'()': 'core.log.ContextFilter'},
+        'sampling': {'()': 'core.log.SamplingFilter', 'rate': LOG_SAMPLE_RATE},
+    },
+    'formatters': {
+        'json': {'()': 'core.log.JsonFormatter', 'include_payloads': LOG_PAYLOADS},
+    },
+    'handlers': {
+        'background': {
+            '()': 'core.log.BackgroundHandler',
+            'max_queue': LOG_QUEUE_SIZE,
+            'formatter': 'json',
+            'filters': ['sampling', 'context'],
+        },
+    },
+    'root': {'handlers': ['background'], 'level': LOG_LEVEL},
+}
@@ -6,8 +6,17 @@
 # Run Django migrations
 python manage.py migrate
 
+# Create the upcoming monthly partitions of the history tables
+python manage.py partitions
+
 # Start Django server
 python manage.py runserver 0.0.0.0:8000 &
 
+# Start a workflow worker (resumes rate limited executions, and runs queued ones with WORKFLOW_QUEUE)
+python manage.py workflow_worker &
+
+# Process the orders received by the webhook view
+python manage.py webhook_outbox &
+
 # Start the Pub/Sub subscriber
 python manage.py subscriber
\ No newline at end of file
@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-19 17:40
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Duplicates of the indexes behind Shop.domain unique and Order (domain, order_id) unique_together
+    atomic = False
+
+    dependencies = [
+        ('shopify', '0005_customer_created_at_customer_total_orders_and_more'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='shopify_ord_domain__7a0acb_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='shop',
+            name='shopify_sho_domain_a6c880_idx',
+        ),
+    ]
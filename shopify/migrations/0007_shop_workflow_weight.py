@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-19 17:55
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify', '0006_remove_redundant_domain_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='workflow_weight',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
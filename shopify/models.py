@@ -1,3 +1,4 @@
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import JSONField
 from django.utils import timezone
@@ -14,11 +15,12 @@ class Shop(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Share of the workflow workers the shop gets while other shops also have executions waiting
+    workflow_weight = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
 
     class Meta:
         db_table = 'shopify_shop'
         indexes = [
-            models.Index(fields=['domain']),
             models.Index(fields=['email']),
             models.Index(fields=['is_active'])
         ]
@@ -69,7 +71,6 @@ class Order(models.Model):
     class Meta:
         db_table = 'shopify_order'
         indexes = [
-            models.Index(fields=['domain', 'order_id']),
             models.Index(fields=['customer_email']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at'])
@@ -1,5 +1,23 @@
+import logging
+
 from shopify.models import Order, Customer, Shop
 
+logger = logging.getLogger(__name__)
+
+
+def parse_shop_url(shop_url):
+    """
+    Derive the shop domain and shop id from an order's `order_status_url`.
+
+    e.g. https://hephytest.myshopify.com/56305123408/orders/... -> ("hephytest", "56305123408")
+
+    Raises:
+        IndexError: If the url does not have the expected shape
+    """
+    shop_domain = shop_url.split("//")[1].split(".")[0]
+    shop_id = shop_url.split("//")[1].split("/")[1]
+    return shop_domain, shop_id
+
 
 def extract_shopify_data(webhook_payload, shop_domain, shop_id):
 
@@ -8,7 +26,7 @@ def extract_shopify_data(webhook_payload, shop_domain, shop_id):
                 email="test@gmail.com")
     if not Shop.objects.filter(domain=shop_domain).exists():
         shop.save()
-        print(f'Saved Shop object.')
+        logger.debug('Saved Shop object')
 
     order = Order(name=webhook_payload.get("name"),
                   order_id=webhook_payload.get("id"),
@@ -19,7 +37,7 @@ def extract_shopify_data(webhook_payload, shop_domain, shop_id):
                   customer_email=webhook_payload.get("email"))
     if not Order.objects.filter(order_id=webhook_payload.get("id"), domain=shop_domain).exists():
         order.save()
-        print(f'Saved Order object.')
+        logger.debug('Saved Order object')
 
     return [shop, order]
 